@@ -0,0 +1,80 @@
+"""Compare the frame cost of each anti-aliasing mode on the same scene.
+
+run from within the TGRA_PA5 folder:
+    python -m benchmarks.aa_modes --frames 300 --samples 2 4 8
+"""
+import argparse
+import time
+
+import glfw
+import numpy as np
+from OpenGL.GL import *
+
+import config as GLOBAL
+from game.game_loop import GameLoop
+
+
+def measure(game: GameLoop, frames: int, warmup: int) -> dict[str, float]:
+    """Render the (frozen) scene a number of times, returns timings in ms"""
+
+    graph = game.graph
+    for _ in range(warmup):
+        graph.render(game.scene.player, game.scene.entities)
+    glFinish()
+
+    cpu_times = []
+    frame_times = []
+    gpu_times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        graph.render(game.scene.player, game.scene.entities)
+        submitted = time.perf_counter()
+        glFinish() # wait for the gpu so the frame time covers all of it
+        finished = time.perf_counter()
+
+        cpu_times.append(submitted - start)
+        frame_times.append(finished - start)
+        gpu_times.append(graph.gpu_timer.last_time)
+        glfw.poll_events()
+
+    return {
+        "cpu_ms": 1000 * float(np.mean(cpu_times)),
+        "gpu_ms": 1000 * float(np.mean(gpu_times)),
+        "frame_ms": 1000 * float(np.mean(frame_times)),
+        "frame_p95_ms": 1000 * float(np.percentile(frame_times, 95)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=30)
+    parser.add_argument("--samples", type=int, nargs="+", default=[GLOBAL.MSAA_SAMPLES])
+    args = parser.parse_args()
+
+    game = GameLoop()
+
+    # same camera and full resolution for every mode
+    game.graph.resolution_scaler = None
+    view = GLOBAL.TEST_VIEWS[0]
+    game.scene.player.rotation = np.array(view["rot"], dtype=np.float32)
+    game.scene.player.position = np.array(view["pos"], dtype=np.float32)
+    game.scene.player.update()
+
+    modes = [("none", 0)] + [("msaa", samples) for samples in args.samples] + [("fxaa", 0)]
+
+    print(f"{'mode':<10}{'cpu ms':>10}{'gpu ms':>10}{'frame ms':>10}{'p95 ms':>10}")
+    try:
+        for mode, samples in modes:
+            game.graph.set_anti_aliasing(mode, samples)
+            result = measure(game, args.frames, args.warmup)
+            name = f"msaa x{samples}" if mode == "msaa" else mode
+            print(
+                f"{name:<10}{result['cpu_ms']:>10.3f}{result['gpu_ms']:>10.3f}"
+                f"{result['frame_ms']:>10.3f}{result['frame_p95_ms']:>10.3f}")
+    finally:
+        game.quit()
+
+
+if __name__ == "__main__":
+    main()
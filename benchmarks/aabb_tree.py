@@ -0,0 +1,159 @@
+"""The dynamic AABB tree against a brute-force scan of every box.
+
+Boxes are scattered over a world a few times the size of the ground, sized
+like walls and maxwells. For each count the same ray, sphere and box queries
+go to the tree and to a numpy scan over all the boxes, which also serves as
+a check that the tree finds the same things. Times are per query, in us.
+
+run from within the TGRA_PA5 folder:
+    python -m benchmarks.aabb_tree
+    python -m benchmarks.aabb_tree --counts 100 1000 10000 100000 --rays 4096
+"""
+import argparse
+import time
+
+import numpy as np
+
+import config as GLOBAL
+from game.aabb_tree import AABBTree, _inverse, _slabs
+
+
+class Proxy:
+    """Stands in for an entity, the tree only needs something hashable"""
+    __slots__ = ("index",)
+
+
+    def __init__(self, index: int):
+        self.index = index
+
+
+def scatter(count: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    half = 2 * GLOBAL.GROUND_W
+    centers = rng.uniform(low=(-half, -2.0, -half), high=(half, 8.0, half), size=(count, 3))
+    half_extents = rng.uniform(low=0.1, high=GLOBAL.GROUND_W / GLOBAL.GRID_SIZE / 2, size=(count, 3))
+    return centers - half_extents, centers + half_extents
+
+
+def brute_raycast(lower: np.ndarray, upper: np.ndarray, origin: np.ndarray, inverse: np.ndarray) -> tuple[int, float]:
+    enter, leave = _slabs(origin, inverse, lower, upper)
+    enter = np.maximum(enter, 0.0)
+    enter[enter > leave] = np.inf
+    best = int(np.argmin(enter))
+    return (best, float(enter[best])) if np.isfinite(enter[best]) else (-1, np.inf)
+
+
+def brute_sphere(lower: np.ndarray, upper: np.ndarray, center: np.ndarray, radius: float) -> np.ndarray:
+    closest = np.maximum(lower, np.minimum(center, upper))
+    return np.flatnonzero(np.sum((center - closest) ** 2, axis=1) <= radius ** 2)
+
+
+def brute_box(lower: np.ndarray, upper: np.ndarray, box_min: np.ndarray, box_max: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.all(lower <= box_max, axis=1) & np.all(upper >= box_min, axis=1))
+
+
+def per_query_us(function, queries: int) -> float:
+    start = time.perf_counter()
+    function()
+    return 1e6 * (time.perf_counter() - start) / queries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--rays", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=256, help="sphere / box queries")
+    parser.add_argument("--moves", type=int, default=2000, help="tree updates timed")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    half = 2 * GLOBAL.GROUND_W
+
+    print(f"{'boxes':>8}{'case':>16}{'tree us':>12}{'brute us':>12}{'speedup':>10}")
+    for count in args.counts:
+        lower, upper = scatter(count, rng)
+        proxies = [Proxy(i) for i in range(count)]
+
+        tree = AABBTree()
+        start = time.perf_counter()
+        for proxy, box_min, box_max in zip(proxies, lower, upper):
+            tree.insert(proxy, (box_min, box_max))
+        build = 1e6 * (time.perf_counter() - start) / count
+
+        # rays from head height in random directions, like sight lines
+        origins = rng.uniform(low=(-half, 0.0, -half), high=(half, 3.0, half), size=(args.rays, 3))
+        directions = rng.normal(size=(args.rays, 3))
+        directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+        inverse = _inverse(directions)
+        centers = rng.uniform(low=(-half, 0.0, -half), high=(half, 3.0, half), size=(args.queries, 3))
+        radius = GLOBAL.PLAYER_RADIUS
+
+        brute_hits = []
+        cases = {
+            "raycast": (
+                lambda: [tree.raycast(origin, direction) for origin, direction in zip(origins, directions)],
+                lambda: brute_hits.extend(
+                    brute_raycast(lower, upper, origin, inv) for origin, inv in zip(origins, inverse)),
+                args.rays),
+            "raycast_batch": (
+                lambda: tree.raycast_batch(origins, directions),
+                lambda: [brute_raycast(lower, upper, origin, inv) for origin, inv in zip(origins, inverse)],
+                args.rays),
+            "sphere": (
+                lambda: [tree.query_sphere(center, radius) for center in centers],
+                lambda: [brute_sphere(lower, upper, center, radius) for center in centers],
+                args.queries),
+            "box": (
+                lambda: [tree.query_box(center - radius, center + radius) for center in centers],
+                lambda: [brute_box(lower, upper, center - radius, center + radius) for center in centers],
+                args.queries),
+        }
+
+        print(f"{count:>8}{'build/insert':>16}{build:>12.2f}{'-':>12}{'-':>10}")
+        for name, (tree_case, brute_case, queries) in cases.items():
+            tree_us = per_query_us(tree_case, queries)
+            brute_us = per_query_us(brute_case, queries)
+            print(f"{count:>8}{name:>16}{tree_us:>12.2f}{brute_us:>12.2f}{brute_us / tree_us:>9.1f}x")
+
+        # same answers as the scan
+        hits, ts = tree.raycast_batch(origins, directions)
+        brute_t = np.array([t for _, t in brute_hits])
+        if not np.allclose(ts, brute_t):
+            print(f"MISMATCH raycast_batch: {np.sum(~np.isclose(ts, brute_t))} rays differ")
+        for center in centers[:16]:
+            found = sorted(proxy.index for proxy in tree.query_sphere(center, radius))
+            if found != list(brute_sphere(lower, upper, center, radius)):
+                print("MISMATCH sphere query")
+                break
+
+        # small moves mostly stay inside the fat boxes, the rest reinsert
+        moved = rng.integers(count, size=args.moves)
+        steps = rng.normal(scale=0.1, size=(args.moves, 3))
+        reinserted = 0
+        start = time.perf_counter()
+        for index, step in zip(moved, steps):
+            lower[index] += step
+            upper[index] += step
+            reinserted += tree.update(proxies[index], (lower[index], upper[index]), step)
+        update = 1e6 * (time.perf_counter() - start) / args.moves
+        print(f"{count:>8}{'update':>16}{update:>12.2f}{'-':>12}{'-':>10}"
+              f"   {100 * reinserted / args.moves:.0f}% reinserted, height {tree.tree_height}")
+
+        # everything moving at once, like props dropped together, rebuilds the tree
+        steps = rng.normal(scale=1.0, size=(count, 3))
+        lower += steps
+        upper += steps
+        start = time.perf_counter()
+        escaped = tree.update_many(proxies, lower, upper, steps)
+        bulk = 1e6 * (time.perf_counter() - start) / count
+        print(f"{count:>8}{'update_many':>16}{bulk:>12.2f}{'-':>12}{'-':>10}"
+              f"   {100 * escaped / count:.0f}% escaped, {tree.rebuilds} rebuilds, height {tree.tree_height}")
+        for center in centers[:16]:
+            found = sorted(proxy.index for proxy in tree.query_sphere(center, radius))
+            if found != list(brute_sphere(lower, upper, center, radius)):
+                print("MISMATCH sphere query after the rebuild")
+                break
+
+
+if __name__ == "__main__":
+    main()
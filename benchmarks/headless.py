@@ -0,0 +1,98 @@
+"""Step the simulation without a window, audio or renderer, for load testing.
+
+run from within the TGRA_PA5 folder:
+    python -m benchmarks.headless --entities 10000 --ticks 2000
+    python -m benchmarks.headless --entities 1000 --type billboard --measured-dt
+"""
+import argparse
+import time
+
+import numpy as np
+
+import config as GLOBAL
+from game.scene import Scene
+from game.model_classes.cube import Cube
+from game.model_classes.light import Light
+from game.model_classes.billboard import AnimatedBillboard
+
+
+ENTITY_KINDS = ("cube", "light", "billboard", "obj")
+
+
+def spawn_entities(scene: Scene, kind: str, count: int, rng: np.random.Generator) -> None:
+    """Scatter synthetic entities over the ground"""
+
+    half = GLOBAL.GROUND_W / 2
+    positions = rng.uniform(low=(-half, 0.0, -half), high=(half, 4.0, half), size=(count, 3))
+
+    for position in positions:
+        match kind:
+            case "cube":
+                # "MAXWELL" cubes spin every tick and fall as rigid bodies, filed as walls
+                # since those are the cubes the renderer has a mesh for
+                scene.spawn(GLOBAL.ENTITY_TYPE["3D_WALL"], Cube(
+                    position=position, rotation=[0, 0, 0], scale=[1, 1, 1]))
+            case "light":
+                scene.spawn(GLOBAL.ENTITY_TYPE["POINTLIGHT"], Light(
+                    position=position, color=rng.uniform(0.1, 1.0, 3), strength=20))
+            case "billboard":
+                billboard = scene.entities[GLOBAL.ENTITY_TYPE["BILLBOARD"]][0]
+                scene.spawn(GLOBAL.ENTITY_TYPE["BILLBOARD"], AnimatedBillboard(
+                    position=position, scale=[1.0, 4.0, 4.0],
+                    texture_paths=billboard.texture_paths, frame_rate=billboard.frame_rate))
+            case "obj":
+                # drawn with the maxwell .obj
+                scene.spawn(GLOBAL.ENTITY_TYPE["MAXWELL"], Cube(
+                    position=position, rotation=[0, 0, 0], scale=[0.1, 0.1, 0.1]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=1000, help="synthetic entities to add")
+    parser.add_argument("--type", choices=ENTITY_KINDS, default="cube")
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--dt", type=float, default=1.0 / GLOBAL.SIM_RATE, help="fixed tick length")
+    parser.add_argument("--measured-dt", action="store_true",
+                        help="tick with the real time since the last tick instead of --dt")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scene = Scene(seed=args.seed, audio=False)
+    spawn_entities(scene, args.type, args.entities, np.random.default_rng(args.seed))
+
+    # systems that skip a tick report the time of their last run, zero it so skips count as free
+    system_times = {system.name: np.zeros(args.ticks) for system in scene.scheduler.systems}
+    tick_times = np.empty(args.ticks)
+
+    start = last_tick = time.perf_counter()
+    for tick in range(args.ticks):
+        now = time.perf_counter()
+        delta_time = now - last_tick if args.measured_dt else args.dt
+        last_tick = now
+
+        scene.store_previous()
+        scene.update(tick + 1, delta_time)
+
+        tick_times[tick] = time.perf_counter() - now
+        for system in scene.scheduler.systems:
+            if system.pending == 0.0:
+                system_times[system.name][tick] = system.last_time
+    elapsed = time.perf_counter() - start
+
+    entity_count = sum(len(entities) for entities in scene.entities.values())
+    print(f"{entity_count} entities, {args.ticks} ticks in {elapsed:.3f}s: {args.ticks / elapsed:.1f} ticks/s")
+    print(f"{'system':<12}{'mean ms':>10}{'p95 ms':>10}{'share':>8}")
+    for name, times in system_times.items():
+        print(
+            f"{name:<12}{1000 * times.mean():>10.4f}{1000 * np.percentile(times, 95):>10.4f}"
+            f"{100 * times.sum() / tick_times.sum():>7.1f}%")
+    print(f"{'tick':<12}{1000 * tick_times.mean():>10.4f}{1000 * np.percentile(tick_times, 95):>10.4f}")
+    bodies = scene.bodies.stats
+    print(f"bodies: {bodies['awake'] / args.ticks:.0f} awake / {bodies['asleep'] / args.ticks:.0f} asleep per tick,"
+          f" {bodies['fell_asleep']} fell asleep, {bodies['contacts']} wall contacts")
+    print()
+    print(scene.scheduler.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Micro-benchmarks for the math, collision and loader hot paths.
+
+Every case runs on fixed inputs. Time is the best of a few repeats, in ns per
+call. Memory is the tracemalloc high-water mark of a single call, in bytes:
+that's everything the call had alive at once, temporaries included, which
+is what ends up churning the allocator. Results can be stored as a baseline
+and later runs checked against it (exit 1 on a regression past the threshold).
+
+run from within the TGRA_PA5 folder:
+    python -m benchmarks.micro
+    python -m benchmarks.micro --save-baseline runs/micro_baseline.json
+    python -m benchmarks.micro --baseline runs/micro_baseline.json --threshold 0.2
+    python -m benchmarks.micro --filter collision
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+
+import utils
+from game.controller import Collision
+from game.model_classes.archetype import Archetype
+from game.model_classes.camera import Camera
+from game.model_classes.cube import Cube
+from game.model_classes.entity import Entity
+from game.model_classes.plane import Plane
+from game.scene import bezier_point
+from game.view_classes.obj_mesh import load_mtl, load_obj_split
+
+
+MAXWELL_OBJ = "res/3D_models/maxwell/maxwell.54d410c0.obj"
+MAXWELL_MTL = "res/3D_models/maxwell/maxwell.54d410c0.mtl"
+
+
+def build_cases() -> dict[str, Callable[[], object]]:
+    """name -> zero argument callable, inputs are set up once here"""
+
+    entity = Entity(position=[1.0, 2.0, 3.0], rotation=[10.0, 20.0, 30.0], scale=[1.0, 2.0, 1.0])
+    entity.store_previous()
+    entity.position += 0.5
+
+    camera = Camera(position=[0, 1, 0], rotation=[0, 30, 10])
+    cube = Cube(position=[5, 0, 5], rotation=[0, 0, 15], scale=[1, 1, 1], id="CUBE")
+    plane = Plane(position=[0, 0, 2], rotation=[0, 0, 90], scale=[1, 1, 1])
+
+    # the same in an archetype, get_aabb comes out of its cache there
+    walls_archetype = Archetype(0)
+    cached_cube = walls_archetype.add(Cube(position=[5, 0, 5], rotation=[0, 0, 15], scale=[1, 1, 1], id="CUBE"))
+    for i in range(1000):
+        walls_archetype.add(Plane(position=[i, 0, 0], rotation=[0, 0, 90 * (i % 2)], scale=[1, 1, 1]))
+    moved = walls_archetype.view("position")
+
+    def dirty_and_refresh():
+        # every wall goes up one and back down on alternate calls, so each
+        # call recomputes every AABB and the positions don't drift between runs
+        moved[:, 1] += 1.0 if moved[0, 1] == 0.0 else -1.0
+        return walls_archetype.aabbs()
+
+    # a small room of walls the player walks into, nothing that gets pushed
+    # around so every call sees the same input
+    walls = [
+        Plane(position=[x, 0, z], rotation=[0, 0, angle], scale=[1, 1, 1])
+        for x, z, angle in ((0, 3, 0), (0, -3, 0), (3, 0, 90), (-3, 0, 90))
+    ] + [cube]
+    position = np.array([0.0, 0.0, 1.5], dtype=np.float32)
+    new_position = np.array([0.2, 0.0, 2.1], dtype=np.float32)
+
+    player_min = np.array([-0.5, -1.0, -0.5], dtype=np.float32)
+    player_max = np.array([0.5, 1.0, 0.5], dtype=np.float32)
+    object_min = np.array([0.3, -2.0, -2.0], dtype=np.float32)
+    object_max = np.array([2.0, 2.0, 2.0], dtype=np.float32)
+
+    points = [np.array(p, dtype=np.float64) for p in ((-100, 60, -140), (-200, 50, -140), (-100, 60, -140), (-10, 50, -140))]
+
+    obj_path = utils.asset(MAXWELL_OBJ)
+    mtl_path = utils.asset(MAXWELL_MTL)
+
+    return {
+        "entity.get_model_transform": lambda: entity.get_model_transform(),
+        "entity.get_model_transform(alpha)": lambda: entity.get_model_transform(0.5),
+        "entity.get_normal_matrix": lambda: entity.get_normal_matrix(),
+        "camera.update": lambda: camera.update(),
+        "camera.get_view_transform": lambda: camera.get_view_transform(),
+        "cube.get_aabb": lambda: cube.get_aabb(),
+        "plane.get_aabb": lambda: plane.get_aabb(),
+        "cube.get_aabb(cached)": lambda: cached_cube.get_aabb(),
+        # every wall moved, so every AABB is recomputed
+        "archetype.aabbs(1001 dirty)": dirty_and_refresh,
+        "collision.get_player_move": lambda: Collision.get_player_move(position, new_position, walls),
+        "collision.resolve_aabb_collision": lambda: Collision.resolve_aabb_collision(
+            player_min, player_max, object_min, object_max),
+        "scene.bezier_point": lambda: bezier_point(*points, 0.37),
+        "loader.load_obj_split": lambda: load_obj_split(obj_path),
+        "loader.load_mtl": lambda: load_mtl(mtl_path),
+    }
+
+
+def time_case(function: Callable[[], object], min_time: float, repeats: int) -> float:
+    """Best ns per call over a few repeats, each long enough to be measurable"""
+
+    # find a loop count that takes about min_time
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed == 0 else max(2, int(min_time / elapsed))
+
+    best = elapsed / loops
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return 1e9 * best
+
+
+def peak_bytes(function: Callable[[], object]) -> int:
+    """Most memory a single call had allocated at once"""
+
+    function() # warm any caches so they don't count
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - baseline
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], threshold: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric in ("ns_per_op", "bytes_per_op"):
+            if reference[metric] > 0 and result[metric] > reference[metric] * (1 + threshold):
+                regressions.append(
+                    f"{name} {metric}: {result[metric]:.0f} vs {reference[metric]:.0f}"
+                    f" (+{100 * (result[metric] / reference[metric] - 1):.0f}%)")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default="", help="only run cases containing this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing repeat")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--baseline", help="json from an earlier run to compare against")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    results: dict[str, dict] = {}
+    print(f"{'case':<40}{'ns/op':>14}{'bytes/op':>12}")
+    for name, function in build_cases().items():
+        if args.filter not in name:
+            continue
+        results[name] = {
+            "ns_per_op": time_case(function, args.min_time, args.repeats),
+            "bytes_per_op": peak_bytes(function),
+        }
+        print(f"{name:<40}{results[name]['ns_per_op']:>14.0f}{results[name]['bytes_per_op']:>12}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions over {100 * args.threshold:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Vectorized sphere-vs-AABB narrowphase against the one-collider-at-a-time loop.
+
+The reference below is the loop get_player_move used to run, working on the
+same stacked AABBs so only the narrowphase itself is timed. Colliders are
+packed around the player so a few of them get hit, some of them pushable
+(maxwells), and every move is checked to end up in the same place with the
+same things pushed the same way.
+
+The second table is the swept move against a wall of thin (WALL_D) slabs,
+walking at it with bigger and bigger steps, the way a long tick would: how
+many moves end up on the far side with the plain end point test and with
+sweep_move, and how many sweeps a move took.
+
+run from within the TGRA_PA5 folder:
+    python -m benchmarks.narrowphase
+    python -m benchmarks.narrowphase --counts 10 100 10000 --moves 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+import config as GLOBAL
+from game.controller import Collision
+
+
+def reference_move(pos: np.ndarray, new_pos: np.ndarray, aabb_min: np.ndarray, aabb_max: np.ndarray,
+                   pushable: np.ndarray) -> tuple[np.ndarray, dict[int, np.ndarray]]:
+    """The old per-collider loop, pushes are returned instead of applied"""
+
+    pushes = {}
+    for i in range(len(aabb_min)):
+        closest = np.maximum(aabb_min[i], np.minimum(new_pos, aabb_max[i]))
+        delta = new_pos - closest
+        dist_sq = np.sum(delta ** 2)
+
+        delta_player = new_pos - pos
+        if np.linalg.norm(delta_player) > 0:
+            push_dir = delta_player / np.linalg.norm(delta_player)
+        else:
+            push_dir = np.array([0, 0, 0], dtype=np.float32)
+
+        if dist_sq < GLOBAL.PLAYER_RADIUS ** 2:
+            if pushable[i]:
+                pushes[i] = push_dir
+            else:
+                if np.all(delta == 0):
+                    normal = np.array([0, 0, 1], dtype=np.float32)
+                else:
+                    normal = delta / np.linalg.norm(delta)
+                move_vec = new_pos - pos
+                move_along_wall = move_vec - np.dot(move_vec, normal) * normal
+                new_pos = pos + move_along_wall
+    return new_pos, pushes
+
+
+def scatter(count: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Wall and maxwell sized boxes, denser the fewer there are so small sets still get hits"""
+    spread = max(6.0, np.sqrt(count) * 2.0)
+    centers = rng.uniform(-spread, spread, size=(count, 3)).astype(np.float32)
+    centers[:, 1] = rng.uniform(-1.0, 2.0, size=count)
+    half_extents = rng.uniform(0.2, 2.5, size=(count, 3)).astype(np.float32)
+    pushable = rng.random(count) < 0.2
+    return centers - half_extents, centers + half_extents, pushable
+
+
+def wall_run(step_length: float, moves: int, rng: np.random.Generator) -> tuple[int, int, float, float, float]:
+    """Walk into a row of thin walls at x = 0 from random points in front of it"""
+
+    z = np.arange(-10, 11) * (GLOBAL.GROUND_W / GLOBAL.GRID_SIZE)
+    half = np.array([GLOBAL.WALL_D / 2, GLOBAL.WALL_H / 2, GLOBAL.GROUND_W / GLOBAL.GRID_SIZE / 2], dtype=np.float32)
+    centers = np.stack([np.zeros_like(z), np.full_like(z, 1.0), z], axis=1).astype(np.float32)
+    aabb_min, aabb_max = centers - half, centers + half
+    pushable = np.zeros(len(centers), dtype=bool)
+
+    starts = np.stack([
+        rng.uniform(-3.0, -0.1, moves) - GLOBAL.PLAYER_RADIUS - GLOBAL.WALL_D / 2,
+        np.ones(moves),
+        rng.uniform(-20.0, 20.0, moves)], axis=1).astype(np.float32)
+    angles = rng.uniform(-1.2, 1.2, moves)
+    steps = step_length * np.stack([np.cos(angles), np.zeros(moves), np.sin(angles)], axis=1).astype(np.float32)
+
+    discrete_through = swept_through = 0
+    Collision.reset_stats()
+    discrete_s = swept_s = 0.0
+    for pos, step in zip(starts, steps):
+        start = time.perf_counter()
+        end, _, _ = Collision.slide_move(pos, pos + step, aabb_min, aabb_max, pushable)
+        discrete_s += time.perf_counter() - start
+        discrete_through += end[0] > 0
+
+        start = time.perf_counter()
+        end, _, _, _ = Collision.sweep_move(pos, pos + step, aabb_min, aabb_max, pushable)
+        swept_s += time.perf_counter() - start
+        swept_through += end[0] > 0
+
+    iterations = Collision.sweep_stats()["iterations_per_move"]
+    return discrete_through, swept_through, iterations, 1e6 * discrete_s / moves, 1e6 * swept_s / moves
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 10000])
+    parser.add_argument("--moves", type=int, default=100, help="player moves per count")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'colliders':>10}{'loop us':>12}{'vector us':>12}{'speedup':>10}{'hits/move':>11}")
+    for count in args.counts:
+        aabb_min, aabb_max, pushable = scatter(count, rng)
+        starts = rng.uniform(-3.0, 3.0, size=(args.moves, 3)).astype(np.float32)
+        steps = rng.normal(scale=0.3, size=(args.moves, 3)).astype(np.float32)
+
+        start = time.perf_counter()
+        expected = [reference_move(pos, pos + step, aabb_min, aabb_max, pushable) for pos, step in zip(starts, steps)]
+        loop_us = 1e6 * (time.perf_counter() - start) / args.moves
+
+        start = time.perf_counter()
+        results = [Collision.slide_move(pos, pos + step, aabb_min, aabb_max, pushable) for pos, step in zip(starts, steps)]
+        vector_us = 1e6 * (time.perf_counter() - start) / args.moves
+
+        hits = 0
+        for pos, step, (reference_pos, pushes), (new_pos, pushed, push_dirs) in zip(starts, steps, expected, results):
+            _, dist_sq, _, _ = Collision.sphere_contacts(pos + step, GLOBAL.PLAYER_RADIUS, aabb_min, aabb_max)
+            hits += int(np.sum(dist_sq < GLOBAL.PLAYER_RADIUS ** 2))
+            if not np.allclose(new_pos, reference_pos, atol=1e-5):
+                print(f"MISMATCH end point {new_pos} vs {reference_pos}")
+            if set(np.flatnonzero(pushed).tolist()) != set(pushes):
+                print(f"MISMATCH pushed {np.flatnonzero(pushed)} vs {sorted(pushes)}")
+            elif pushes and not np.allclose(push_dirs[sorted(pushes)], [pushes[i] for i in sorted(pushes)], atol=1e-5):
+                print("MISMATCH push directions")
+
+        print(f"{count:>10}{loop_us:>12.1f}{vector_us:>12.1f}{loop_us / vector_us:>9.1f}x{hits / args.moves:>11.2f}")
+
+    print()
+    print(f"{'step':>10}{'through, end test':>20}{'through, swept':>17}{'sweeps/move':>13}{'end us':>9}{'swept us':>10}")
+    for step_length in (0.5, 2.0, 5.0, 10.0, 40.0):
+        discrete, swept, iterations, discrete_us, swept_us = wall_run(step_length, args.moves, rng)
+        print(f"{step_length:>10.1f}{discrete:>20}{swept:>17}{iterations:>13.2f}{discrete_us:>9.1f}{swept_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
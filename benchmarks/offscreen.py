@@ -0,0 +1,109 @@
+"""Render the scene without a window, for machines with no display (or GPU).
+
+Reports the CPU side of a frame (building the snapshot and submitting the GL
+calls) apart from the GPU side, and can save / compare the final image for
+pixel regression checks.
+
+run from within the TGRA_PA5 folder:
+    python -m benchmarks.offscreen --backend egl --size 1400 800 --frames 300
+    python -m benchmarks.offscreen --backend osmesa --save-reference runs/reference.npy
+    python -m benchmarks.offscreen --backend osmesa --compare runs/reference.npy
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from game.view_classes import offscreen
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=offscreen.BACKENDS, default="egl")
+    parser.add_argument("--size", type=int, nargs=2, default=None, metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=30)
+    parser.add_argument("--view", type=int, default=0, help="index into TEST_VIEWS")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-reference", metavar="PATH", help="store the final frame as a .npy")
+    parser.add_argument("--compare", metavar="PATH", help="check the final frame against a stored one")
+    parser.add_argument("--tolerance", type=int, default=8, help="per channel difference allowed")
+    parser.add_argument("--max-bad-pixels", type=float, default=0.001,
+                        help="fraction of pixels allowed over the tolerance")
+    args = parser.parse_args()
+
+    # has to happen before anything imports OpenGL
+    offscreen.use_platform(args.backend)
+
+    from OpenGL.GL import glFinish
+
+    import config as GLOBAL
+    from game.scene import Scene
+    from game.view_classes.graphics_engine import GraphicsEngine
+
+    width, height = args.size or (GLOBAL.WIDTH, GLOBAL.HEIGHT)
+    context = offscreen.OffscreenContext(width, height, args.backend)
+
+    scene = Scene(seed=args.seed, audio=False)
+    view = GLOBAL.TEST_VIEWS[args.view]
+    scene.player.rotation = np.array(view["rot"], dtype=np.float32)
+    scene.player.position = np.array(view["pos"], dtype=np.float32)
+    scene.player.update()
+
+    graph = GraphicsEngine(scene, output_size=(width, height))
+    # fixed resolution, otherwise the work per frame drifts
+    graph.resolution_scaler = None
+    graph.set_anti_aliasing(GLOBAL.AA_MODE, GLOBAL.MSAA_SAMPLES)
+
+    failed = False
+    try:
+        for _ in range(args.warmup):
+            graph.render(scene.player, scene.entities)
+        glFinish()
+
+        submit_times = []
+        frame_times = []
+        gpu_times = []
+        for _ in range(args.frames):
+            start = time.perf_counter()
+            graph.render(scene.player, scene.entities)
+            submitted = time.perf_counter()
+            glFinish()
+            finished = time.perf_counter()
+
+            submit_times.append(submitted - start)
+            frame_times.append(finished - start)
+            gpu_times.append(graph.gpu_timer.last_time)
+
+        print(f"{args.backend} {width}x{height}, {args.frames} frames")
+        print(f"{'':<10}{'mean ms':>10}{'p95 ms':>10}")
+        for name, times in (("cpu", submit_times), ("gpu", gpu_times), ("frame", frame_times)):
+            print(f"{name:<10}{1000 * np.mean(times):>10.3f}{1000 * np.percentile(times, 95):>10.3f}")
+
+        pixels = graph.read_pixels()
+        if args.save_reference:
+            np.save(args.save_reference, pixels)
+            print(f"saved reference to {args.save_reference}")
+
+        if args.compare:
+            reference = np.load(args.compare)
+            if reference.shape != pixels.shape:
+                print(f"size mismatch: {pixels.shape} vs reference {reference.shape}")
+                failed = True
+            else:
+                difference = np.abs(pixels.astype(np.int16) - reference.astype(np.int16)).max(axis=2)
+                bad = float(np.mean(difference > args.tolerance))
+                failed = bad > args.max_bad_pixels
+                print(
+                    f"pixels over tolerance: {100 * bad:.3f}% (max diff {int(difference.max())})"
+                    f" -> {'FAIL' if failed else 'ok'}")
+    finally:
+        graph.destroy()
+        context.destroy()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
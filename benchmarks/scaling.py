@@ -0,0 +1,202 @@
+"""How the update and render paths scale with the number of entities.
+
+For every entity kind and count the scene is filled procedurally, the camera
+flies a fixed path through GLOBAL.TEST_VIEWS and per frame the simulation
+tick, the CPU side of rendering, the whole frame (after glFinish), draw calls
+and triangles are recorded. Results go to JSON and CSV, and can be checked
+against a stored baseline: the run fails (exit 1) when a configuration got
+slower than the threshold allows.
+
+run from within the TGRA_PA5 folder:
+    python -m benchmarks.scaling --out runs/scaling --save-baseline runs/scaling_baseline.json
+    python -m benchmarks.scaling --out runs/scaling --baseline runs/scaling_baseline.json --threshold 0.15
+    python -m benchmarks.scaling --backend window --kinds cube obj --counts 10 1000
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+
+import numpy as np
+
+from game.view_classes import offscreen
+
+# compared against the baseline, lower is better for all of them
+METRICS = ("update_ms", "render_cpu_ms", "frame_ms")
+
+
+def camera_path(views: list[dict], frames: int) -> list[tuple[np.ndarray, np.ndarray]]:
+    """(position, rotation) per frame, gliding through the views and back to the first"""
+
+    positions = np.array([view["pos"] for view in views] + [views[0]["pos"]], dtype=np.float32)
+    rotations = np.array([view["rot"] for view in views] + [views[0]["rot"]], dtype=np.float32)
+
+    path = []
+    for frame in range(frames):
+        t = frame / max(1, frames) * len(views)
+        i = int(t)
+        f = t - i
+        path.append((
+            positions[i] + (positions[i + 1] - positions[i]) * f,
+            rotations[i] + (rotations[i + 1] - rotations[i]) * f,
+        ))
+    return path
+
+
+def create_window_context(width: int, height: int):
+    """Hidden glfw window, for when there's a display but no EGL/OSMesa"""
+    import glfw
+    import glfw.GLFW as GLFW_CONSTANTS
+
+    glfw.init()
+    glfw.window_hint(GLFW_CONSTANTS.GLFW_CONTEXT_VERSION_MAJOR, 3)
+    glfw.window_hint(GLFW_CONSTANTS.GLFW_CONTEXT_VERSION_MINOR, 3)
+    glfw.window_hint(GLFW_CONSTANTS.GLFW_OPENGL_PROFILE, GLFW_CONSTANTS.GLFW_OPENGL_CORE_PROFILE)
+    glfw.window_hint(GLFW_CONSTANTS.GLFW_OPENGL_FORWARD_COMPAT, GLFW_CONSTANTS.GLFW_TRUE)
+    glfw.window_hint(GLFW_CONSTANTS.GLFW_VISIBLE, GLFW_CONSTANTS.GLFW_FALSE)
+    window = glfw.create_window(width, height, "scaling", None, None)
+    glfw.make_context_current(window)
+    glfw.swap_interval(0)
+    return window
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> list[str]:
+    """Configurations that got worse than baseline * (1 + threshold)"""
+
+    baseline_rows = {(row["kind"], row["count"]): row for row in baseline}
+    regressions = []
+    for row in results:
+        reference = baseline_rows.get((row["kind"], row["count"]))
+        if reference is None:
+            continue
+        for metric in METRICS:
+            if reference[metric] > 0 and row[metric] > reference[metric] * (1 + threshold):
+                regressions.append(
+                    f"{row['kind']} x{row['count']} {metric}: {row[metric]:.3f}"
+                    f" vs {reference[metric]:.3f} (+{100 * (row[metric] / reference[metric] - 1):.0f}%)")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=offscreen.BACKENDS + ("window",), default="egl")
+    parser.add_argument("--size", type=int, nargs=2, default=None, metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--kinds", nargs="+", default=["cube", "light", "billboard", "obj"])
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--frames", type=int, default=60, help="measured frames per configuration")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="scaling", help="writes <out>.json and <out>.csv")
+    parser.add_argument("--baseline", help="json from an earlier run to compare against")
+    parser.add_argument("--save-baseline", metavar="PATH", help="also store this run as a baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown, 0.10 = 10%%")
+    args = parser.parse_args()
+
+    # has to happen before anything imports OpenGL
+    if args.backend != "window":
+        offscreen.use_platform(args.backend)
+
+    from OpenGL.GL import glFinish
+
+    import config as GLOBAL
+    from game.scene import Scene
+    from game.view_classes.graphics_engine import GraphicsEngine
+    from benchmarks.headless import ENTITY_KINDS, spawn_entities
+
+    for kind in args.kinds:
+        if kind not in ENTITY_KINDS:
+            parser.error(f"unknown kind {kind}, pick from {', '.join(ENTITY_KINDS)}")
+
+    width, height = args.size or (GLOBAL.WIDTH, GLOBAL.HEIGHT)
+    if args.backend == "window":
+        context = None
+        window = create_window_context(width, height)
+    else:
+        context = offscreen.OffscreenContext(width, height, args.backend)
+
+    base_scene = Scene(seed=args.seed, audio=False)
+    graph = GraphicsEngine(base_scene, output_size=(width, height))
+    # fixed resolution, otherwise the work per frame drifts
+    graph.resolution_scaler = None
+    graph.set_anti_aliasing(GLOBAL.AA_MODE, GLOBAL.MSAA_SAMPLES)
+
+    path = camera_path(GLOBAL.TEST_VIEWS, args.warmup + args.frames)
+    step = 1.0 / GLOBAL.SIM_RATE
+
+    results = []
+    print(f"{'kind':<10}{'count':>8}{'update ms':>11}{'render ms':>11}{'frame ms':>10}{'calls':>8}{'tris':>10}")
+    try:
+        for kind in args.kinds:
+            for count in args.counts:
+                scene = Scene(seed=args.seed, audio=False)
+                spawn_entities(scene, kind, count, np.random.default_rng(args.seed))
+                graph.scene = scene
+
+                update_times, render_times, frame_times = [], [], []
+                for frame, (position, rotation) in enumerate(path):
+                    scene.player.position = position.copy()
+                    scene.player.rotation = rotation.copy()
+
+                    start = time.perf_counter()
+                    scene.store_previous()
+                    scene.update(frame + 1, step)
+                    updated = time.perf_counter()
+                    graph.render(scene.player, scene.entities)
+                    submitted = time.perf_counter()
+                    glFinish()
+                    finished = time.perf_counter()
+
+                    if frame >= args.warmup:
+                        update_times.append(updated - start)
+                        render_times.append(submitted - updated)
+                        frame_times.append(finished - start)
+
+                row = {
+                    "kind": kind,
+                    "count": count,
+                    "entities": sum(len(entities) for entities in scene.entities.values()),
+                    "update_ms": 1000 * float(np.mean(update_times)),
+                    "render_cpu_ms": 1000 * float(np.mean(render_times)),
+                    "frame_ms": 1000 * float(np.mean(frame_times)),
+                    "frame_p95_ms": 1000 * float(np.percentile(frame_times, 95)),
+                    "draw_calls": graph.stats["draw_calls"],
+                    "triangles": graph.stats["triangles"],
+                }
+                results.append(row)
+                print(
+                    f"{kind:<10}{count:>8}{row['update_ms']:>11.3f}{row['render_cpu_ms']:>11.3f}"
+                    f"{row['frame_ms']:>10.3f}{row['draw_calls']:>8}{row['triangles']:>10}")
+    finally:
+        graph.destroy()
+        if context is not None:
+            context.destroy()
+        else:
+            import glfw
+            glfw.destroy_window(window)
+            glfw.terminate()
+
+    run = {"backend": args.backend, "size": [width, height], "frames": args.frames, "results": results}
+    with open(f"{args.out}.json", "w") as file:
+        json.dump(run, file, indent=2)
+    with open(f"{args.out}.csv", "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(run, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions over {100 * args.threshold:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Sweep and prune pair finding against testing every pair with numpy.
+
+Maxwell sized boxes are scattered over the ground and a share of them takes
+a small random step every tick, like props being pushed about. Each tick
+the sweep and prune is updated with the ones that moved and the brute force
+tests all pairs, the two have to come up with the same pairs. Times are per
+tick, in ms.
+
+run from within the TGRA_PA5 folder:
+    python -m benchmarks.sweep_and_prune
+    python -m benchmarks.sweep_and_prune --counts 100 1000 5000 --moving 0.1 --ticks 100
+"""
+import argparse
+import time
+
+import numpy as np
+
+import config as GLOBAL
+from benchmarks.aabb_tree import Proxy
+from game.sweep_and_prune import SweepAndPrune
+
+
+def brute_pairs(lower: np.ndarray, upper: np.ndarray, chunk: int = 512) -> set[tuple[int, int]]:
+    pairs = set()
+    for start in range(0, len(lower), chunk):
+        block = slice(start, start + chunk)
+        overlap = np.all(
+            (lower[block, None] < upper[None]) & (lower[None] < upper[block, None]), axis=2)
+        a, b = np.nonzero(overlap)
+        a += start
+        pairs.update(zip(a[a < b].tolist(), b[a < b].tolist()))
+    return pairs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--ticks", type=int, default=50)
+    parser.add_argument("--moving", type=float, default=0.1, help="share of the boxes moving each tick")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    half = GLOBAL.GROUND_W / 2
+
+    print(f"{'boxes':>8}{'pairs':>8}{'sap ms':>10}{'brute ms':>10}{'speedup':>10}{'swaps/tick':>12}{'events/tick':>13}")
+    for count in args.counts:
+        centers = rng.uniform(low=(-half, -1.0, -half), high=(half, 1.0, half), size=(count, 3))
+        half_extents = rng.uniform(0.3, 1.0, size=(count, 3))
+        lower, upper = centers - half_extents, centers + half_extents
+
+        proxies = [Proxy(i) for i in range(count)]
+        events = [0]
+        sap = SweepAndPrune(on_begin=lambda a, b: events.__setitem__(0, events[0] + 1),
+                            on_end=lambda a, b: events.__setitem__(0, events[0] + 1))
+        for proxy, box_min, box_max in zip(proxies, lower, upper):
+            sap.insert(proxy, (box_min, box_max))
+        sap.reset_stats()
+        events[0] = 0
+
+        sap_s = brute_s = 0.0
+        mismatches = 0
+        for _ in range(args.ticks):
+            moved = np.flatnonzero(rng.random(count) < args.moving)
+            steps = rng.normal(scale=0.1, size=(len(moved), 3))
+            lower[moved] += steps
+            upper[moved] += steps
+
+            start = time.perf_counter()
+            sap.update_many([proxies[i] for i in moved.tolist()], lower[moved], upper[moved])
+            sap_s += time.perf_counter() - start
+
+            start = time.perf_counter()
+            expected = brute_pairs(lower, upper)
+            brute_s += time.perf_counter() - start
+
+            found = {tuple(sorted((a.index, b.index))) for a, b in sap.pairs}
+            mismatches += found != expected
+
+        sap_ms, brute_ms = 1000 * sap_s / args.ticks, 1000 * brute_s / args.ticks
+        print(f"{count:>8}{len(sap.pairs_by_handle):>8}{sap_ms:>10.3f}{brute_ms:>10.3f}{brute_ms / sap_ms:>9.1f}x"
+              f"{sap.stats['swaps_per_update']:>12.1f}{events[0] / args.ticks:>13.2f}")
+        if mismatches:
+            print(f"MISMATCH pairs differ on {mismatches} of {args.ticks} ticks")
+
+
+if __name__ == "__main__":
+    main()
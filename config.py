@@ -8,8 +8,36 @@ DEBUG_FLAT_WALLS = False
 DEBUG_GENERATE_MAZE = False
 DEBUG_NORMAL = False
 
+################### Render settings
+GEOMETRY_ARENA = True # all static meshes in one shared vertex buffer
+DEPTH_PREPASS = False # lay down depth for opaque stuff first, only worth it for heavy scenes
+DYNAMIC_RES = True # render offscreen and scale the resolution to hold the frame time
+DYNAMIC_RES_MIN = 0.5 # per axis, fraction of the window size
+DYNAMIC_RES_MAX = 1.0
+UPSCALE_FILTER = "sharpen" # "blit" or "sharpen"
+UPSCALE_SHARPNESS = 0.4
+AA_MODE = "fxaa" # "none", "msaa" or "fxaa"
+MSAA_SAMPLES = 4
+
 RES = WIDTH, HEIGHT = 1400, 800
 FPS = 60
+SWAP_INTERVAL = 0 # screen refreshes per buffer swap, 0 = no vsync (the frame pacer does the waiting)
+MAX_FRAMES_IN_FLIGHT = 2 # frames the CPU may queue up ahead of the GPU, 1 = double 2 = triple buffered
+SIM_RATE = 60 # simulation ticks per second, rendering interpolates between them
+SIM_MAX_STEPS = 5 # most ticks to run in one frame when catching up
+PIPELINED = False # simulate the next frame on a worker thread while this one is drawn
+UPDATE_LOD = True # far away / off screen entities update less often (game/scheduler.py)
+LOD_NEAR = 25.0 # world units, entities closer than this always update every run
+LOD_FAR = 80.0 # past this they're down to the slowest rate
+SYSTEM_BUDGET = 0.002 # seconds an update system may take per run, longer ones are reported
+
+SEED = None # scene RNG seed, None = random every run
+RECORD_PATH = None # e.g. "runs/session.rec", save the seed, start state and input of the run there
+REPLAY_PATH = None # play a recording back at fixed timesteps instead of taking live input
+
+PROFILE = False # time the frame phases (game/profiler.py), printed on quit
+PROFILE_GPU = False # also put GL timestamp queries around the render passes
+PROFILE_TRACE_PATH = None # e.g. "runs/trace.json", chrome://tracing export of the last frames
 
 TEST_VIEWS = [
     { "rot": [6,  0,   -90], "pos": [6, 18, 6] },
@@ -33,8 +61,19 @@ WALL_D = 1
 PLAYER_W = 1
 PLAYER_H = 2
 
-COLLIDERS = []
+COLLIDERS = ["3D_WALL", "MAXWELL"] # entity types the player collides with, indexed in Scene.colliders
 PLAYER_RADIUS = 1.5
+SWEEP_ITERATIONS = 4 # slides per player move before it gives up and stops at the last contact
+SWEEP_SKIN = 1e-3 # how far short of a wall a swept move stops, so the next slide starts outside it
+
+# pushable props (maxwells), see game/rigid_body.py
+GRAVITY = 9.8 # world units / s^2, down Y
+PROP_FLOOR = -2.0 # height of the ground plane, props' boxes come to rest on it
+PROP_DAMPING = 0.5 # 1/s, velocity lost to the air
+PROP_FRICTION = 6.0 # 1/s, sliding velocity lost while on the floor or against a wall
+PROP_PUSH_SPEED = 8.0 # how fast the player shoves a prop away
+SLEEP_SPEED = 0.05 # props slower than this while resting on something ..
+SLEEP_TIME = 0.5 # .. for this many seconds stop being simulated until something wakes them
 
 ENTITY_TYPE = {
     "CUBE": 0,
@@ -0,0 +1,601 @@
+import numpy as np
+
+from game.model_classes.entity import Entity
+
+
+NULL = -1
+
+
+# boxes in the scalar code paths are (min x, min y, min z, max x, max y, max z)
+# tuples of floats, plain python is a lot quicker than numpy on single boxes
+Box = tuple[float, float, float, float, float, float]
+
+
+def _box(box_min, box_max) -> Box:
+    return (float(box_min[0]), float(box_min[1]), float(box_min[2]),
+            float(box_max[0]), float(box_max[1]), float(box_max[2]))
+
+
+def _union(a: Box, b: Box) -> Box:
+    return (min(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]),
+            max(a[3], b[3]), max(a[4], b[4]), max(a[5], b[5]))
+
+
+def _area(box: Box) -> float:
+    """Surface area, the cost the tree tries to keep small"""
+    dx, dy, dz = box[3] - box[0], box[4] - box[1], box[5] - box[2]
+    return 2.0 * (dx * dy + dy * dz + dz * dx)
+
+
+def _contains(outer: Box, inner: Box) -> bool:
+    return (outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] <= inner[2]
+            and inner[3] <= outer[3] and inner[4] <= outer[4] and inner[5] <= outer[5])
+
+
+def _ray_box(origin: tuple[float, float, float], inverse: tuple[float, float, float], box: Box) -> tuple[float, float]:
+    """Entry and exit ray parameter of one ray against one box"""
+    enter, leave = -np.inf, np.inf
+    for axis in range(3):
+        t1 = (box[axis] - origin[axis]) * inverse[axis]
+        t2 = (box[axis + 3] - origin[axis]) * inverse[axis]
+        if t1 > t2:
+            t1, t2 = t2, t1
+        enter = max(enter, t1)
+        leave = min(leave, t2)
+    return enter, leave
+
+
+def _slabs(origins: np.ndarray, inverse: np.ndarray, lower: np.ndarray, upper: np.ndarray
+           ) -> tuple[np.ndarray, np.ndarray]:
+    """Entry and exit ray parameter of every ray against one box (or a box per ray)"""
+    t1 = (lower - origins) * inverse
+    t2 = (upper - origins) * inverse
+    return np.minimum(t1, t2).max(axis=-1), np.maximum(t1, t2).min(axis=-1)
+
+
+def _morton(cells: np.ndarray) -> np.ndarray:
+    """Z-order curve code of (N, 3) integer cells in [0, 1024), the bits of the
+        three axes interleaved so things close in space are mostly close in code
+    """
+    codes = np.zeros(len(cells), dtype=np.uint64)
+    for axis in range(3):
+        bits = cells[:, axis].astype(np.uint64)
+        bits = (bits | (bits << np.uint64(16))) & np.uint64(0x030000FF)
+        bits = (bits | (bits << np.uint64(8))) & np.uint64(0x0300F00F)
+        bits = (bits | (bits << np.uint64(4))) & np.uint64(0x030C30C3)
+        bits = (bits | (bits << np.uint64(2))) & np.uint64(0x09249249)
+        codes |= bits << np.uint64(axis)
+    return codes
+
+
+def _inverse(directions: np.ndarray) -> np.ndarray:
+    # axis parallel rays would divide by zero, nudge them instead
+    directions = np.where(directions == 0.0, 1e-30, directions)
+    return 1.0 / directions
+
+
+class AABBTree:
+    """Dynamic bounding volume hierarchy over AABBs.
+
+        Leaves hold an entity and a "fat" copy of its AABB, grown by `margin`
+        (and the last displacement), so an object that moves a little stays
+        inside it and the tree doesn't have to change. When it does leave
+        its fat box the leaf is taken out and put back in. Inserting walks
+        down to the sibling that grows the tree's surface area least and
+        every node on the way back up is rebalanced by tree rotations, so
+        the height stays around log(n) whatever order things come in.
+
+        That's a walk down and up per leaf, fine for a few at a time but
+        not for hundreds that all start moving together (props dropped at
+        once leave their fat boxes on the same tick). When more than
+        `rebuild_fraction` of the leaves left theirs in one update_many,
+        the inner nodes are thrown away and built again in one go instead.
+
+        Queries check the tight AABB at the leaves, the fat ones only steer
+        the traversal. The boxes are kept twice: as tuples for the one at a
+        time code and in numpy arrays for raycast_batch.
+    """
+    __slots__ = (
+        "margin", "displacement_scale", "rebuild_fraction", "fat", "tight", "lower", "upper", "tight_lower", "tight_upper",
+        "parent", "child1", "child2", "height", "entities", "root", "free", "proxies",
+        "queries", "nodes_visited", "rebuilds")
+
+
+    def __init__(self, margin: float = 0.2, displacement_scale: float = 2.0, rebuild_fraction: float = 0.02,
+                 capacity: int = 16):
+        """ Parameters:
+                margin: world units a fat AABB sticks out past the real one
+                displacement_scale: how many updates' worth of movement the fat box
+                    is stretched by in the direction something is moving
+                rebuild_fraction: share of the leaves leaving their fat boxes in
+                    one update_many above which the whole tree is rebuilt
+        """
+        self.margin = margin
+        self.displacement_scale = displacement_scale
+        self.rebuild_fraction = rebuild_fraction
+
+        # per node, fat boxes for every node and the real one for leaves
+        self.fat: list[Box | None] = [None] * capacity
+        self.tight: list[Box | None] = [None] * capacity
+        self.lower = np.zeros((capacity, 3))
+        self.upper = np.zeros((capacity, 3))
+        self.tight_lower = np.zeros((capacity, 3))
+        self.tight_upper = np.zeros((capacity, 3))
+
+        self.parent = [NULL] * capacity
+        self.child1 = [NULL] * capacity
+        self.child2 = [NULL] * capacity
+        # leaves are 0, free nodes -1
+        self.height = [-1] * capacity
+        self.entities: list[Entity | None] = [None] * capacity
+
+        self.root = NULL
+        self.free = list(range(capacity - 1, -1, -1))
+        self.proxies: dict[Entity, int] = {}
+
+        # since the last reset_stats
+        self.queries = 0
+        self.nodes_visited = 0
+        self.rebuilds = 0
+
+    def __len__(self) -> int:
+        return len(self.proxies)
+
+    def __contains__(self, entity: Entity) -> bool:
+        return entity in self.proxies
+
+    @property
+    def tree_height(self) -> int:
+        return self.height[self.root] if self.root != NULL else 0
+
+    ################################   NODES   ######################################
+
+    def _allocate(self) -> int:
+        if not self.free:
+            capacity = len(self.parent)
+            for name in ("lower", "upper", "tight_lower", "tight_upper"):
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+            for nodes, empty in ((self.fat, None), (self.tight, None), (self.parent, NULL),
+                                 (self.child1, NULL), (self.child2, NULL), (self.height, -1),
+                                 (self.entities, None)):
+                nodes.extend([empty] * capacity)
+            self.free = list(range(2 * capacity - 1, capacity - 1, -1))
+
+        node = self.free.pop()
+        self.parent[node] = self.child1[node] = self.child2[node] = NULL
+        self.height[node] = 0
+        return node
+
+    def _release(self, node: int) -> None:
+        self.height[node] = -1
+        self.entities[node] = None
+        self.fat[node] = self.tight[node] = None
+        self.free.append(node)
+
+    def _is_leaf(self, node: int) -> bool:
+        return self.child1[node] == NULL
+
+    def _set_fat(self, node: int, box: Box) -> None:
+        self.fat[node] = box
+        self.lower[node] = box[:3]
+        self.upper[node] = box[3:]
+
+    def _set_tight(self, node: int, box: Box) -> None:
+        self.tight[node] = box
+        self.tight_lower[node] = box[:3]
+        self.tight_upper[node] = box[3:]
+
+    def _fatten(self, leaf: int, displacement: np.ndarray | None = None) -> None:
+        margin = self.margin
+        box = self.tight[leaf]
+        lower = [box[0] - margin, box[1] - margin, box[2] - margin]
+        upper = [box[3] + margin, box[4] + margin, box[5] + margin]
+        if displacement is not None:
+            for axis in range(3):
+                stretch = self.displacement_scale * float(displacement[axis])
+                if stretch < 0.0:
+                    lower[axis] += stretch
+                else:
+                    upper[axis] += stretch
+        self._set_fat(leaf, (*lower, *upper))
+
+    def _fatten_many(self, leaves: np.ndarray, displacements: np.ndarray | None = None) -> None:
+        """_fatten() for a batch of leaves"""
+        lower = self.tight_lower[leaves] - self.margin
+        upper = self.tight_upper[leaves] + self.margin
+        if displacements is not None:
+            stretch = self.displacement_scale * np.asarray(displacements, dtype=np.float64)
+            lower += np.minimum(stretch, 0.0)
+            upper += np.maximum(stretch, 0.0)
+        self.lower[leaves] = lower
+        self.upper[leaves] = upper
+        for leaf, box in zip(leaves.tolist(), np.hstack([lower, upper]).tolist()):
+            self.fat[leaf] = tuple(box)
+
+    def _refit(self, node: int) -> None:
+        child1, child2 = self.child1[node], self.child2[node]
+        self._set_fat(node, _union(self.fat[child1], self.fat[child2]))
+        self.height[node] = 1 + max(self.height[child1], self.height[child2])
+
+    ################################   UPDATES   ######################################
+
+    def insert(self, entity: Entity, aabb: tuple[np.ndarray, np.ndarray] | None = None) -> int:
+        """Add the entity with its AABB, get_aabb() by default. Returns its leaf"""
+
+        if entity in self.proxies:
+            raise ValueError("entity is already in the tree")
+
+        box_min, box_max = aabb if aabb is not None else entity.get_aabb()
+        leaf = self._allocate()
+        self.entities[leaf] = entity
+        self._set_tight(leaf, _box(box_min, box_max))
+        self._fatten(leaf)
+
+        self._insert_leaf(leaf)
+        self.proxies[entity] = leaf
+        return leaf
+
+    def remove(self, entity: Entity) -> None:
+        leaf = self.proxies.pop(entity)
+        self._remove_leaf(leaf)
+        self._release(leaf)
+
+    def update(self, entity: Entity, aabb: tuple[np.ndarray, np.ndarray] | None = None,
+               displacement: np.ndarray | None = None) -> bool:
+        """The entity moved. Only restructures the tree if it left its fat AABB,
+            returns whether it did.
+            displacement: how far it moved since the last update, to stretch
+                the new fat box ahead of it
+        """
+
+        leaf = self.proxies[entity]
+        box_min, box_max = aabb if aabb is not None else entity.get_aabb()
+        self._set_tight(leaf, _box(box_min, box_max))
+
+        if _contains(self.fat[leaf], self.tight[leaf]):
+            return False
+
+        self._remove_leaf(leaf)
+        self._fatten(leaf, displacement)
+        self._insert_leaf(leaf)
+        return True
+
+    def update_many(self, entities: list[Entity], aabb_min: np.ndarray, aabb_max: np.ndarray,
+                    displacements: np.ndarray | None = None) -> int:
+        """update() for a batch, with their AABBs stacked (N, 3). The fat box
+            check is done for all of them at once, only the ones that left
+            theirs touch the tree, or if there's too many of those the tree
+            is rebuilt. Returns how many left.
+        """
+
+        leaves = np.fromiter((self.proxies[entity] for entity in entities), dtype=np.int64, count=len(entities))
+        aabb_min = np.asarray(aabb_min, dtype=np.float64)
+        aabb_max = np.asarray(aabb_max, dtype=np.float64)
+        self.tight_lower[leaves] = aabb_min
+        self.tight_upper[leaves] = aabb_max
+        for leaf, box in zip(leaves.tolist(), np.hstack([aabb_min, aabb_max]).tolist()):
+            self.tight[leaf] = tuple(box)
+
+        inside = np.all(self.lower[leaves] <= aabb_min, axis=1) & np.all(aabb_max <= self.upper[leaves], axis=1)
+        escaped = np.flatnonzero(~inside)
+        if len(escaped) > self.rebuild_fraction * len(self.proxies):
+            self._fatten_many(leaves[escaped], displacements[escaped] if displacements is not None else None)
+            self.rebuild()
+            return len(escaped)
+
+        for i in escaped.tolist():
+            leaf = int(leaves[i])
+            self._remove_leaf(leaf)
+            self._fatten(leaf, displacements[i] if displacements is not None else None)
+            self._insert_leaf(leaf)
+        return len(escaped)
+
+    def rebuild(self) -> None:
+        """Throw the inner nodes away and build them again over the leaves
+            as they are. The leaves are put in order along a Z-order curve
+            through their centers and neighbours paired up a level at a time,
+            each level's boxes in one numpy call; no surface area heuristic,
+            but a lot cheaper than inserting them one by one.
+        """
+
+        self.rebuilds += 1
+        for node, height in enumerate(self.height):
+            if height > 0:
+                self._release(node)
+        if not self.proxies:
+            self.root = NULL
+            return
+
+        leaves = np.fromiter(self.proxies.values(), dtype=np.int64, count=len(self.proxies))
+        centers = self.lower[leaves] + self.upper[leaves]
+        low = centers.min(axis=0)
+        span = np.maximum(centers.max(axis=0) - low, 1e-9)
+        level = leaves[np.argsort(_morton(((centers - low) / span * 1023).astype(np.int64)), kind="stable")]
+        lower, upper = self.lower[level], self.upper[level]
+        heights = np.zeros(len(level), dtype=np.int64)
+
+        while len(level) > 1:
+            paired = len(level) // 2 * 2
+            parents = np.array([self._allocate() for _ in range(paired // 2)], dtype=np.int64)
+            parent_lower = np.minimum(lower[0:paired:2], lower[1:paired:2])
+            parent_upper = np.maximum(upper[0:paired:2], upper[1:paired:2])
+            parent_heights = 1 + np.maximum(heights[0:paired:2], heights[1:paired:2])
+
+            self.lower[parents] = parent_lower
+            self.upper[parents] = parent_upper
+            for parent, child1, child2, height, box in zip(
+                    parents.tolist(), level[0:paired:2].tolist(), level[1:paired:2].tolist(),
+                    parent_heights.tolist(), np.hstack([parent_lower, parent_upper]).tolist()):
+                self.child1[parent] = child1
+                self.child2[parent] = child2
+                self.parent[child1] = self.parent[child2] = parent
+                self.height[parent] = height
+                self.fat[parent] = tuple(box)
+
+            # an odd one out goes up a level as it is
+            level = np.concatenate([parents, level[paired:]])
+            lower = np.concatenate([parent_lower, lower[paired:]])
+            upper = np.concatenate([parent_upper, upper[paired:]])
+            heights = np.concatenate([parent_heights, heights[paired:]])
+
+        self.root = int(level[0])
+        self.parent[self.root] = NULL
+
+    def _insert_leaf(self, leaf: int) -> None:
+        if self.root == NULL:
+            self.root = leaf
+            self.parent[leaf] = NULL
+            return
+
+        leaf_box = self.fat[leaf]
+
+        # go down to the cheapest sibling
+        node = self.root
+        while not self._is_leaf(node):
+            area = _area(self.fat[node])
+            combined_area = _area(_union(self.fat[node], leaf_box))
+
+            # cost of making a new parent here, vs pushing the leaf further down
+            cost = 2.0 * combined_area
+            inheritance = 2.0 * (combined_area - area)
+
+            child1, child2 = self.child1[node], self.child2[node]
+            cost1 = _area(_union(self.fat[child1], leaf_box)) + inheritance
+            if not self._is_leaf(child1):
+                cost1 -= _area(self.fat[child1])
+            cost2 = _area(_union(self.fat[child2], leaf_box)) + inheritance
+            if not self._is_leaf(child2):
+                cost2 -= _area(self.fat[child2])
+
+            if cost < cost1 and cost < cost2:
+                break
+            node = child1 if cost1 < cost2 else child2
+
+        sibling = node
+        old_parent = self.parent[sibling]
+        new_parent = self._allocate()
+        self.parent[new_parent] = old_parent
+        self.child1[new_parent] = sibling
+        self.child2[new_parent] = leaf
+        self.parent[sibling] = new_parent
+        self.parent[leaf] = new_parent
+
+        if old_parent == NULL:
+            self.root = new_parent
+        elif self.child1[old_parent] == sibling:
+            self.child1[old_parent] = new_parent
+        else:
+            self.child2[old_parent] = new_parent
+
+        self._fix_upwards(new_parent)
+
+    def _remove_leaf(self, leaf: int) -> None:
+        if leaf == self.root:
+            self.root = NULL
+            return
+
+        parent = self.parent[leaf]
+        grandparent = self.parent[parent]
+        sibling = self.child2[parent] if self.child1[parent] == leaf else self.child1[parent]
+
+        if grandparent == NULL:
+            self.root = sibling
+            self.parent[sibling] = NULL
+        else:
+            if self.child1[grandparent] == parent:
+                self.child1[grandparent] = sibling
+            else:
+                self.child2[grandparent] = sibling
+            self.parent[sibling] = grandparent
+        self._release(parent)
+        self._fix_upwards(grandparent)
+
+    def _fix_upwards(self, node: int) -> None:
+        """Rebalance and refit every node from here to the root"""
+        while node != NULL:
+            node = self._balance(node)
+            self._refit(node)
+            node = self.parent[node]
+
+    def _balance(self, a: int) -> int:
+        """Rotate the taller grandchild up if a's children differ in height by
+            more than one. Returns whichever node ends up where a was.
+        """
+
+        if self._is_leaf(a) or self.height[a] < 2:
+            return a
+
+        b, c = self.child1[a], self.child2[a]
+        balance = self.height[c] - self.height[b]
+        if -1 <= balance <= 1:
+            return a
+
+        # the taller child takes a's place, a takes over one of its children
+        if balance > 1:
+            up, other = c, b
+        else:
+            up, other = b, c
+        f, g = self.child1[up], self.child2[up]
+
+        self.child1[up] = a
+        self.parent[up] = self.parent[a]
+        self.parent[a] = up
+        if self.parent[up] == NULL:
+            self.root = up
+        elif self.child1[self.parent[up]] == a:
+            self.child1[self.parent[up]] = up
+        else:
+            self.child2[self.parent[up]] = up
+
+        # the taller of up's children stays with it, a gets the other
+        if self.height[f] > self.height[g]:
+            keep, give = f, g
+        else:
+            keep, give = g, f
+        self.child2[up] = keep
+        if up == c:
+            self.child2[a] = give
+        else:
+            self.child1[a] = give
+        self.parent[give] = a
+
+        self._refit(a)
+        self._refit(up)
+        return up
+
+    ################################   QUERIES   ######################################
+
+    def _traverse(self, overlaps) -> list[Entity]:
+        """Leaves whose fat and tight boxes pass the overlaps(box) test"""
+
+        self.queries += 1
+        hits = []
+        stack = [self.root] if self.root != NULL else []
+        while stack:
+            node = stack.pop()
+            self.nodes_visited += 1
+            if not overlaps(self.fat[node]):
+                continue
+            if self._is_leaf(node):
+                if overlaps(self.tight[node]):
+                    hits.append(self.entities[node])
+            else:
+                stack.append(self.child1[node])
+                stack.append(self.child2[node])
+        return hits
+
+    def query_box(self, box_min: np.ndarray, box_max: np.ndarray) -> list[Entity]:
+        """Entities whose AABB overlaps the box"""
+
+        x0, y0, z0, x1, y1, z1 = _box(box_min, box_max)
+
+        def overlaps(box: Box) -> bool:
+            return (box[0] <= x1 and box[3] >= x0 and box[1] <= y1 and box[4] >= y0
+                    and box[2] <= z1 and box[5] >= z0)
+
+        return self._traverse(overlaps)
+
+    def query_sphere(self, center: np.ndarray, radius: float) -> list[Entity]:
+        """Entities whose AABB the sphere touches"""
+
+        cx, cy, cz = (float(c) for c in center)
+        radius_sq = float(radius) ** 2
+
+        def overlaps(box: Box) -> bool:
+            # squared distance from the center to the closest point of the box
+            dx = max(box[0] - cx, 0.0, cx - box[3])
+            dy = max(box[1] - cy, 0.0, cy - box[4])
+            dz = max(box[2] - cz, 0.0, cz - box[5])
+            return dx * dx + dy * dy + dz * dz <= radius_sq
+
+        return self._traverse(overlaps)
+
+    def raycast(self, origin: np.ndarray, direction: np.ndarray, max_t: float = np.inf
+                ) -> tuple[Entity | None, float]:
+        """Closest entity hit by origin + t * direction for 0 <= t <= max_t,
+            and its t. (None, inf) if there's nothing.
+        """
+
+        self.queries += 1
+        origin = tuple(float(o) for o in origin)
+        inverse = tuple(float(i) for i in _inverse(np.asarray(direction, dtype=np.float64)))
+
+        best, best_t = None, float(max_t)
+        stack = [self.root] if self.root != NULL else []
+        while stack:
+            node = stack.pop()
+            self.nodes_visited += 1
+            enter, leave = _ray_box(origin, inverse, self.fat[node])
+            if enter > leave or leave < 0.0 or enter > best_t:
+                continue
+
+            if self._is_leaf(node):
+                enter, leave = _ray_box(origin, inverse, self.tight[node])
+                enter = max(enter, 0.0)
+                if enter <= leave and enter <= best_t:
+                    best, best_t = self.entities[node], enter
+            else:
+                stack.append(self.child1[node])
+                stack.append(self.child2[node])
+
+        if best is None:
+            return None, np.inf
+        return best, best_t
+
+    def raycast_batch(self, origins: np.ndarray, directions: np.ndarray, max_t: float | np.ndarray = np.inf
+                      ) -> tuple[list[Entity | None], np.ndarray]:
+        """raycast() for (N, 3) rays at once, for picking / sight lines / the camera.
+            The rays go down the tree together, each node is tested against
+            all the rays still interested in it in one numpy call.
+            Returns the entity each ray hit (or None) and the t of the hit (inf).
+        """
+
+        self.queries += 1
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        inverse = _inverse(np.asarray(directions, dtype=np.float64).reshape(-1, 3))
+        count = len(origins)
+
+        best_t = np.array(np.broadcast_to(max_t, (count,)), dtype=np.float64)
+        best_leaf = np.full(count, NULL, dtype=np.int64)
+
+        stack = [(self.root, np.arange(count))] if self.root != NULL and count else []
+        while stack:
+            node, rays = stack.pop()
+            self.nodes_visited += 1
+            enter, leave = _slabs(origins[rays], inverse[rays], self.lower[node], self.upper[node])
+            rays = rays[(enter <= leave) & (leave >= 0.0) & (enter <= best_t[rays])]
+            if not len(rays):
+                continue
+
+            if self._is_leaf(node):
+                enter, leave = _slabs(origins[rays], inverse[rays], self.tight_lower[node], self.tight_upper[node])
+                enter = np.maximum(enter, 0.0)
+                closer = (enter <= leave) & (enter <= best_t[rays])
+                best_t[rays[closer]] = enter[closer]
+                best_leaf[rays[closer]] = node
+            else:
+                stack.append((self.child1[node], rays))
+                stack.append((self.child2[node], rays))
+
+        hits = [self.entities[leaf] if leaf != NULL else None for leaf in best_leaf]
+        best_t[best_leaf == NULL] = np.inf
+        return hits, best_t
+
+    ################################   STATS   ######################################
+
+    @property
+    def stats(self) -> dict[str, float]:
+        return {
+            "leaves": len(self.proxies),
+            "height": self.tree_height,
+            "queries": self.queries,
+            "nodes_visited": self.nodes_visited,
+            "nodes_per_query": self.nodes_visited / self.queries if self.queries else 0.0,
+            "rebuilds": self.rebuilds,
+        }
+
+    def reset_stats(self) -> None:
+        self.queries = 0
+        self.nodes_visited = 0
+        self.rebuilds = 0
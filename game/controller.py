@@ -7,91 +7,243 @@ import pyrr
 import config as GLOBAL
 from game.model_classes.camera import Camera
 from game.model_classes.entity import Entity
+from game.rigid_body import push
 # from game.view_classes.graphics_engine import GraphicsEngine
 
 
 class Collision:
 
+    # swept player moves since the last reset_stats, see sweep_move
+    moves = 0
+    sweep_iterations = 0
+    max_iterations = 0 # most sweeps a single move took
+    exhausted = 0 # moves that ran out of iterations and stopped short
+
     @staticmethod
-    def check_move(pos: list[float], new_pos: list[float], collidables: list[Entity]):
+    def stack_aabbs(collidables: list[Entity]) -> tuple[np.ndarray, np.ndarray]:
+        """(N, 3) min and max of the collidables' AABBs"""
+        aabb_min = np.empty((len(collidables), 3), dtype=np.float32)
+        aabb_max = np.empty((len(collidables), 3), dtype=np.float32)
+        for i, ob in enumerate(collidables):
+            aabb_min[i], aabb_max[i] = ob.get_aabb()
+        return aabb_min, aabb_max
 
-        for ob in collidables:
-            aabb_min, aabb_max = ob.get_aabb()
+    @staticmethod
+    def sphere_contacts(center: np.ndarray, radius: float, aabb_min: np.ndarray, aabb_max: np.ndarray
+                        ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """A sphere against (N, 3) stacked AABBs in one go.
+            Returns per AABB the closest point to the center, the squared
+            distance to it, the contact normal (out of the box, +Z when the
+            center is inside it) and the penetration depth (<= 0 means apart).
+        """
+
+        # clamp each coordinate of sphere center to AABB
+        closest = np.maximum(aabb_min, np.minimum(center, aabb_max))
+        delta = center - closest
+        dist_sq = np.sum(delta ** 2, axis=1)
+        dist = np.sqrt(dist_sq)
 
-            # clamp each coordinate of sphere center to AABB
-            closest = np.maximum(aabb_min, np.minimum(new_pos, aabb_max))
-            delta = new_pos - closest
-            dist_sq = np.sum(delta ** 2)
+        normals = np.zeros_like(delta)
+        inside = dist == 0
+        normals[inside, 2] = 1
+        normals[~inside] = delta[~inside] / dist[~inside, None]
+        return closest, dist_sq, normals, radius - dist
 
-            # check If player radius is inside collision
-            if dist_sq < GLOBAL.PLAYER_RADIUS ** 2:
-                return True
-        return False
+    @staticmethod
+    def check_move(pos: list[float], new_pos: list[float], collidables: list[Entity]):
+
+        if not collidables:
+            return False
+        aabb_min, aabb_max = Collision.stack_aabbs(collidables)
+        _, dist_sq, _, _ = Collision.sphere_contacts(new_pos, GLOBAL.PLAYER_RADIUS, aabb_min, aabb_max)
+
+        # check If player radius is inside collision
+        return bool(np.any(dist_sq < GLOBAL.PLAYER_RADIUS ** 2))
     
     @staticmethod
     def move_max(pos: list[float], new_pos: list[float], collidables: list[Entity]):
         for ob in collidables:
             aabb_min, aabb_max = ob.get_aabb()
 
-                
-    
     @staticmethod
-    def get_player_move(pos: list[float], new_pos: list[float], collidables: list[Entity]):
+    def slide_move(pos: np.ndarray, new_pos: np.ndarray, aabb_min: np.ndarray, aabb_max: np.ndarray,
+                   pushable: np.ndarray, radius: float = GLOBAL.PLAYER_RADIUS
+                   ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The sphere's move against stacked AABBs, same result as going through
+            them one at a time in order: a wall the sphere ends up in takes
+            the move's component along its normal away, and everything after
+            it is tested from the new end point. So all of them are tested
+            at once, up to the first wall hit, which is resolved, and the rest
+            are tested again from there; one pass per wall actually hit.
+
+            Returns the end point, which pushable AABBs got hit and the
+            direction each was pushed in (the move's direction at that point).
+        """
 
+        count = len(aabb_min)
+        pushed = np.zeros(count, dtype=bool)
+        push_dirs = np.zeros((count, 3), dtype=np.float32)
 
+        start = 0
+        while start < count:
+            _, dist_sq, normals, _ = Collision.sphere_contacts(new_pos, radius, aabb_min[start:], aabb_max[start:])
+            hits = np.flatnonzero(dist_sq < radius ** 2) + start
+            walls = hits[~pushable[hits]]
+            first_wall = walls[0] if len(walls) else count
 
-        for ob in collidables:
-            aabb_min, aabb_max = ob.get_aabb()
+            # the pushables before the wall all see the same move
+            delta_player = new_pos - pos
+            length = np.linalg.norm(delta_player)
+            push_dir = delta_player / length if length > 0 else np.zeros(3, dtype=np.float32)
+            shoved = hits[(hits < first_wall) & pushable[hits]]
+            pushed[shoved] = True
+            push_dirs[shoved] = push_dir
 
-            # clamp each coordinate of sphere center to AABB
-            closest = np.maximum(aabb_min, np.minimum(new_pos, aabb_max))
-            delta = new_pos - closest
-            dist_sq = np.sum(delta ** 2)
+            if first_wall == count:
+                break
 
-            # length
-            delta_player = new_pos - pos
-            if np.linalg.norm(delta_player) > 0:
-                push_dir = delta_player / np.linalg.norm(delta_player)
-            else:
-                push_dir = np.array([0, 0, 0], dtype=np.float32)
+            # slidey wall
+            normal = normals[first_wall - start]
+            move_vec = new_pos - pos
+            move_along_wall = move_vec - np.dot(move_vec, normal) * normal
+            new_pos = pos + move_along_wall
+            start = first_wall + 1
 
-            # If player radius is inside wall → block movement
-            if dist_sq < GLOBAL.PLAYER_RADIUS ** 2:
+        return new_pos, pushed, push_dirs
 
-                if ob.id == "MAXWELL":
+    @staticmethod
+    def sweep_sphere(start: np.ndarray, end: np.ndarray, radius: float, aabb_min: np.ndarray, aabb_max: np.ndarray
+                     ) -> tuple[int, float, np.ndarray | None]:
+        """Time of impact of a sphere moving from start to end against (N, 3)
+            stacked AABBs. Every box is grown by the radius and the center's
+            path is slab tested against it, its corners are square instead of
+            rounded so a sphere going past one stops a bit early, never late.
+
+            A grown box the center already starts in (the sphere is in its
+            square corner, or got put there) is hit at 0 on its nearest face
+            if the move goes further in through that face, so a move can't
+            start inside a wall and carry on out the other side.
+
+            Returns the first box hit, the fraction of the move done when it
+            is hit and the normal of the face it hits; (-1, 1.0, None) when
+            the whole move is clear.
+        """
 
-                    floor = ob.position[2] + (push_dir[2] * 1)
-                    if floor < -1.9: floor = -1.9 # make sure he dont clip through the floor
+        start = np.asarray(start, dtype=np.float64)
+        move = np.asarray(end, dtype=np.float64) - start
+        if not len(aabb_min) or not np.any(move):
+            return -1, 1.0, None
+
+        lower = aabb_min - radius
+        upper = aabb_max + radius
+        # axis parallel moves would divide by zero, nudge them instead
+        inverse = 1.0 / np.where(move == 0.0, 1e-30, move)
+        t1 = (lower - start) * inverse
+        t2 = (upper - start) * inverse
+        near = np.minimum(t1, t2)
+        enter = near.max(axis=1)
+        leave = np.maximum(t1, t2).min(axis=1)
+
+        # the ones it starts in: nearest face, and whether the move heads in through it
+        inside = np.all((start > lower) & (start < upper), axis=1)
+        faces = np.concatenate([start - lower, upper - start], axis=1)
+        nearest = np.argmin(faces, axis=1)
+        axes = nearest % 3
+        outwards = np.where(nearest < 3, -1.0, 1.0)
+        heading_in = inside & (move[axes] * outwards < 0.0)
+        enter[heading_in] = 0.0
+
+        hits = np.flatnonzero(heading_in | (~inside & (enter >= 0.0) & (enter <= 1.0) & (enter <= leave)))
+        if not len(hits):
+            return -1, 1.0, None
+        first = int(hits[np.argmin(enter[hits])])
+
+        normal = np.zeros(3, dtype=np.float32)
+        if heading_in[first]:
+            normal[axes[first]] = outwards[first]
+        else:
+            # the face is on the axis the box was entered on last, facing the move
+            axis = int(np.argmax(near[first]))
+            normal[axis] = -np.sign(move[axis])
+        return first, float(enter[first]), normal
 
-                    # push the object away
-                    ob.position = [
-                        ob.position[0] + (push_dir[0] * 1), 
-                        ob.position[1] + (push_dir[1] * 1), 
-                        floor
-                    ]
+    @staticmethod
+    def sweep_move(pos: np.ndarray, new_pos: np.ndarray, aabb_min: np.ndarray, aabb_max: np.ndarray,
+                   pushable: np.ndarray, radius: float = GLOBAL.PLAYER_RADIUS,
+                   iterations: int = GLOBAL.SWEEP_ITERATIONS) -> tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """slide_move, but the way there is swept against the walls so a long
+            move (a big delta time after a hitch, a low tick rate) can't step
+            over a thin one. The sphere goes as far as the first wall it
+            would touch, the rest of the move is slid along that wall and
+            swept again, up to `iterations` times; if it still hits something
+            it stays at the last contact. The end point then goes through
+            slide_move for pushables and walls it started out touching.
+
+            Returns slide_move's end point, pushed and push directions, and
+            how many sweeps the move took.
+        """
 
-                    # max_aabb_min, max_aabb_max = ob.get_aabb()
-                    # for ob in collidables:
-                    #     wall_aabb_min, wall_aabb_max = ob.get_aabb()
-                    #     if Collision.aabb_collision(max_aabb_min, max_aabb_max, wall_aabb_min, wall_aabb_max):
-                    #         ob.position = Collision.resolve_aabb_collision(max_aabb_min, max_aabb_max, wall_aabb_min, wall_aabb_max)
+        walls = ~pushable
+        wall_min, wall_max = aabb_min[walls], aabb_max[walls]
+
+        start = current = np.asarray(pos, dtype=np.float32)
+        target = np.asarray(new_pos, dtype=np.float32)
+        sweeps = 0
+        while True:
+            if sweeps == iterations:
+                target = current
+                Collision.exhausted += 1
+                break
+            sweeps += 1
+
+            _, t, normal = Collision.sweep_sphere(current, target, radius, wall_min, wall_max)
+            if normal is None:
+                break
+
+            # stop just short of the wall, then slide what's left of the move along it
+            move = target - current
+            t = max(0.0, t - GLOBAL.SWEEP_SKIN / float(np.linalg.norm(move)))
+            current = current + t * move
+            remaining = target - current
+            target = current + remaining - np.dot(remaining, normal) * normal
+
+        Collision.moves += 1
+        Collision.sweep_iterations += sweeps
+        Collision.max_iterations = max(Collision.max_iterations, sweeps)
+
+        new_pos, pushed, push_dirs = Collision.slide_move(start, target, aabb_min, aabb_max, pushable, radius)
+        return new_pos, pushed, push_dirs, sweeps
+
+    @classmethod
+    def sweep_stats(cls) -> dict[str, float]:
+        return {
+            "moves": cls.moves,
+            "iterations": cls.sweep_iterations,
+            "iterations_per_move": cls.sweep_iterations / cls.moves if cls.moves else 0.0,
+            "max_iterations": cls.max_iterations,
+            "exhausted": cls.exhausted,
+        }
+
+    @classmethod
+    def reset_stats(cls) -> None:
+        cls.moves = 0
+        cls.sweep_iterations = 0
+        cls.max_iterations = 0
+        cls.exhausted = 0
 
+    @staticmethod
+    def get_player_move(pos: list[float], new_pos: list[float], collidables: list[Entity]):
 
-                 
+        if not collidables:
+            return new_pos
 
-                   
-                
-                else:
-                    if np.all(delta == 0):
-                        normal = np.array([0, 0, 1], dtype=np.float32)
-                    else:
-                        normal = delta / np.linalg.norm(delta)
-                    
-                    # slidey wall
-                    move_vec = new_pos - pos
-                    move_along_wall = move_vec - np.dot(move_vec, normal) * normal
-                    
-                    new_pos = pos + move_along_wall
+        aabb_min, aabb_max = Collision.stack_aabbs(collidables)
+        pushable = np.array([ob.id == "MAXWELL" for ob in collidables])
+        new_pos, pushed, push_dirs, _ = Collision.sweep_move(pos, new_pos, aabb_min, aabb_max, pushable)
+
+        for i in np.flatnonzero(pushed):
+            # shove the object away, the rigid body step keeps it out of the floor and walls
+            push(collidables[i], push_dirs[i] * GLOBAL.PROP_PUSH_SPEED)
 
         return new_pos
     
@@ -0,0 +1,96 @@
+import time
+from collections import deque
+
+import glfw
+import numpy as np
+
+
+class FramePacer:
+    """Waits out the time until the next frame is due without pinning a core.
+
+        Most of the wait is spent blocked in glfw.wait_events_timeout (so input
+        still gets handled), only the last sliver is a busy spin to hit the
+        deadline accurately. With vsync the swap does the waiting instead.
+    """
+    __slots__ = (
+        "frame_time", "spin_threshold", "vsync", "next_deadline", "last_poll_time",
+        "intervals", "cpu_utilization",
+        "_last_frame", "_sample_wall", "_sample_cpu")
+
+
+    def __init__(self, fps: float, vsync: bool = False, spin_threshold: float = 0.002, history: int = 120):
+        """ Parameters:
+                fps: frames per second to pace to
+                vsync: let the buffer swap block instead of sleeping
+                spin_threshold: seconds before the deadline to stop sleeping and spin
+                history: how many frame intervals the stats are taken over
+        """
+        self.frame_time = 1.0 / fps
+        self.vsync = vsync
+        self.spin_threshold = spin_threshold
+
+        now = time.perf_counter()
+        self.next_deadline = now + self.frame_time
+        self._last_frame = now
+        # when the window events were last polled, input sampled then is this old
+        self.last_poll_time = now
+
+        self.intervals: deque[float] = deque(maxlen=history)
+
+        # fraction of one core used by this process, updated about twice a second
+        self.cpu_utilization = 0.0
+        self._sample_wall = now
+        self._sample_cpu = time.process_time()
+
+    def wait(self) -> float:
+        """Block until the next frame is due, handling window events meanwhile.
+            Returns the seconds since the previous frame started.
+        """
+
+        if not self.vsync:
+            remaining = self.next_deadline - time.perf_counter()
+            # wait_events_timeout returns early on any event, so keep going
+            while remaining > self.spin_threshold:
+                glfw.wait_events_timeout(remaining - self.spin_threshold)
+                remaining = self.next_deadline - time.perf_counter()
+
+            while time.perf_counter() < self.next_deadline:
+                pass
+
+        glfw.poll_events()
+
+        now = time.perf_counter()
+        self.last_poll_time = now
+        delta_time = now - self._last_frame
+        self._last_frame = now
+        self.intervals.append(delta_time)
+
+        self.next_deadline += self.frame_time
+        if self.next_deadline < now:
+            # fell behind, don't try to catch up with a burst of frames
+            self.next_deadline = now + self.frame_time
+
+        self._sample_cpu_utilization(now)
+        return delta_time
+
+    def _sample_cpu_utilization(self, now: float) -> None:
+        wall = now - self._sample_wall
+        if wall < 0.5:
+            return
+        cpu = time.process_time()
+        self.cpu_utilization = (cpu - self._sample_cpu) / wall
+        self._sample_wall = now
+        self._sample_cpu = cpu
+
+    @property
+    def jitter(self) -> float:
+        """Standard deviation of the recent frame intervals, in seconds"""
+        if len(self.intervals) < 2:
+            return 0.0
+        return float(np.std(self.intervals))
+
+    @property
+    def average_frame_time(self) -> float:
+        if not self.intervals:
+            return self.frame_time
+        return float(np.mean(self.intervals))
@@ -9,7 +9,14 @@ import time
 
 import config as GLOBAL
 from game.scene import Scene
+from game.input_queue import InputEvent, InputQueue
+from game.replay import Recording, InputRecorder, InputReplayer
+from game.profiler import profiler
+from game.frame_pacer import FramePacer
+from game.sim_clock import SimulationClock
+from game.pipeline import SimulationWorker, SnapshotExchange, PipelineStats
 from game.view_classes.graphics_engine import GraphicsEngine
+from game.view_classes.presenter import Presenter
 
 
 class GameLoop:
@@ -18,11 +25,13 @@ class GameLoop:
         self._set_up_timeline()
         self._set_up_input_systems()
 
-        self.scene = Scene()
-        self.graph = GraphicsEngine(self.scene)
+        self._set_up_replay()
+        self.graph = GraphicsEngine(self.scene, frame_budget=self.frame_durr)
 
         self.pressed_key1 = False
 
+        self._set_up_pipeline()
+
         
         
     def _set_up_glfw(self) -> None:
@@ -34,15 +43,25 @@ class GameLoop:
             GLFW_CONSTANTS.GLFW_OPENGL_CORE_PROFILE)
         glfw.window_hint(GLFW_CONSTANTS.GLFW_OPENGL_FORWARD_COMPAT, GLFW_CONSTANTS.GLFW_TRUE)
 
-        glfw.window_hint(GLFW_CONSTANTS.GLFW_DOUBLEBUFFER,GL_FALSE) 
+        # draw into the back buffer, the Presenter swaps it onto the screen
+        glfw.window_hint(GLFW_CONSTANTS.GLFW_DOUBLEBUFFER,GL_TRUE) 
+
+        # antialiasing is done offscreen by the GraphicsEngine (see AA_MODE),
+        # so the window itself doesn't need to be multisampled.
+        # hints only apply to windows created after them
+        glfw.window_hint(glfw.SAMPLES, 0)
+
         self.window = glfw.create_window(
             GLOBAL.WIDTH, GLOBAL.HEIGHT, "DUNGEON", None, None)
-        
-        # antialiasing - not pixelated
-        glfw.window_hint(glfw.SAMPLES, 4)  # Request 4x MSAA
 
         glfw.make_context_current(self.window)
 
+        self.presenter = Presenter(
+            self.window,
+            swap_interval = GLOBAL.SWAP_INTERVAL,
+            max_frames_in_flight = GLOBAL.MAX_FRAMES_IN_FLIGHT,
+        )
+
     def _set_up_openAl(self) -> None:
         # Initialize OpenAL
         oalInit()
@@ -54,18 +73,79 @@ class GameLoop:
         self.current_frame = 0
         self.start_time = time.time()
 
+        self.pacer = FramePacer(self.fps, vsync=GLOBAL.SWAP_INTERVAL > 0)
+        self.clock = SimulationClock(GLOBAL.SIM_RATE, max_steps=GLOBAL.SIM_MAX_STEPS)
+        self.last_title_update = 0.0
+
+    def _set_up_replay(self) -> None:
+        """Build the scene, either fresh (maybe recording the run) or from a
+            recording, in which case the input comes from the file and every
+            frame runs the same fixed amount of simulation.
+        """
+
+        self.replayer: InputReplayer | None = None
+        self.recorder: InputRecorder | None = None
+
+        if GLOBAL.REPLAY_PATH:
+            recording = Recording.load(GLOBAL.REPLAY_PATH)
+            self.replayer = InputReplayer(recording)
+            self.clock = SimulationClock(recording.sim_rate, max_steps=GLOBAL.SIM_MAX_STEPS)
+
+            self.scene = Scene(seed=recording.seed)
+            self.scene.view_index = recording.view_index
+            self.scene.player.position = recording.player_position.copy()
+            self.scene.player.rotation = recording.player_rotation.copy()
+            self.scene.player.update()
+            return
+
+        self.scene = Scene(seed=GLOBAL.SEED)
+        if GLOBAL.RECORD_PATH:
+            self.recorder = InputRecorder(Recording(
+                seed = self.scene.seed,
+                sim_rate = GLOBAL.SIM_RATE,
+                player_position = self.scene.player.position,
+                player_rotation = self.scene.player.rotation,
+                view_index = self.scene.view_index,
+            ))
+
+    def _set_up_pipeline(self) -> None:
+        """With PIPELINED the simulation runs one frame ahead on a worker thread,
+            handing RenderSnapshots over to this (the GL) thread.
+        """
+        self.worker: SimulationWorker | None = None
+        if not GLOBAL.PIPELINED:
+            return
+
+        self.exchange = SnapshotExchange()
+        self.pipeline_stats = PipelineStats()
+        self.rendered_sequence = 0
+        self.worker = SimulationWorker(
+            self.scene, self.clock, self.exchange, self.pipeline_stats, self._simulate)
+        self.worker.start()
+
     def _set_up_input_systems(self) -> None:
-        """Configure the mouse and keyboard"""
+        """Configure the mouse and keyboard.
+            The callbacks only timestamp events into the input queue,
+            the simulation applies them on the tick they belong to.
+        """
 
+        # disabled keeps the cursor in the window and gives unbounded motion,
+        # no need to warp it back to the center every frame
         glfw.set_input_mode(
             self.window, 
             GLFW_CONSTANTS.GLFW_CURSOR, 
-            # GLFW_CONSTANTS.GLFW_CURSOR_NORMAL
-            GLFW_CONSTANTS.GLFW_CURSOR_HIDDEN
+            GLFW_CONSTANTS.GLFW_CURSOR_DISABLED
         )
+        # unscaled, unaccelerated motion straight from the mouse, if the platform has it
+        if glfw.raw_mouse_motion_supported():
+            glfw.set_input_mode(self.window, GLFW_CONSTANTS.GLFW_RAW_MOUSE_MOTION, GLFW_CONSTANTS.GLFW_TRUE)
 
+        self.input_queue = InputQueue()
         self._keys = {}
+        self.cursor_pos = glfw.get_cursor_pos(self.window)
+
         glfw.set_key_callback(self.window, self._key_callback)
+        glfw.set_cursor_pos_callback(self.window, self._cursor_pos_callback)
     
     def _key_callback(self, window, key, scancode, action, mods) -> None:
         """Handle a key event:
@@ -77,16 +157,26 @@ class GameLoop:
             mods: modifiers applied to the event
         """
 
-        state = False
-        match action:
-            case GLFW_CONSTANTS.GLFW_PRESS:
-                state = True
-            case GLFW_CONSTANTS.GLFW_RELEASE:
-                state = False
-            case _:
-                return
+        if action not in (GLFW_CONSTANTS.GLFW_PRESS, GLFW_CONSTANTS.GLFW_RELEASE):
+            return
+
+        # quitting shouldn't wait on the simulation
+        if key == GLFW_CONSTANTS.GLFW_KEY_ESCAPE:
+            glfw.set_window_should_close(window, True)
 
-        self._keys[key] = state
+        now = time.perf_counter()
+        self.input_queue.push(InputEvent(now, InputEvent.KEY, key=key, action=action))
+        self.presenter.mark_input(now)
+
+    def _cursor_pos_callback(self, window, x, y) -> None:
+        """Queue how far the mouse moved since the last event"""
+
+        last_x, last_y = self.cursor_pos
+        self.cursor_pos = (x, y)
+
+        now = time.perf_counter()
+        self.input_queue.push(InputEvent(now, InputEvent.MOUSE_MOTION, dx=x - last_x, dy=y - last_y))
+        self.presenter.mark_input(now)
     
     ################################   RUN   ######################################
 
@@ -94,35 +184,127 @@ class GameLoop:
 
         running = True
         while (running):
-            #check pygame events()
-            if glfw.window_should_close(self.window) or self._keys.get(GLFW_CONSTANTS.GLFW_KEY_ESCAPE, False):
-                running = False
-
-            self._handle_keys()
-            self._handle_mouse()
+            profiler.begin_frame()
 
-            glfw.poll_events() # for event handling
+            # sleeps until the next frame is due, handles window events while waiting
+            with profiler.scope("wait"):
+                delta_time = self.pacer.wait()
 
+            #check pygame events()
+            if glfw.window_should_close(self.window):
+                running = False
+            if self.replayer is not None and self.replayer.finished(self.clock.tick):
+                running = False
 
+            self.current_frame += 1
+            if self.worker is not None:
+                self._render_pipelined()
+            else:
+                self._simulate(delta_time, self.pacer.last_poll_time)
+                with profiler.scope("render", gpu=True):
+                    self.graph.render(self.scene.player, self.scene.entities, self.clock.alpha)
+            with profiler.scope("present"):
+                self.presenter.present()
+
+            self._update_title()
+            profiler.end_frame()
+
+    def _simulate(self, frame_time: float, now: float) -> None:
+        """Fixed rate simulation, however many ticks fit in the time that passed.
+            Each tick first applies the input that arrived up to the moment it
+            stands for, so motion within a frame lands on the right tick.
+            While replaying, live input is thrown away as it comes in.
+        """
 
+        if self.replayer is not None:
+            # same work every frame no matter how long the last one took
+            frame_time = self.frame_durr
+            # the callbacks still push live input, the replay doesn't want it
+            self.input_queue.drain()
+
+        steps = self.clock.advance(frame_time)
+        for i in range(steps):
+            tick = self.clock.tick + 1
+
+            if self.replayer is not None:
+                events = self.replayer.events_for(tick)
+            else:
+                # the simulation trails real time by whatever is left in the accumulator
+                tick_time = now - self.clock.accumulator - (steps - 1 - i) * self.clock.step
+                events = self.input_queue.drain(tick_time)
+                if self.recorder is not None:
+                    self.recorder.record(tick, events)
+
+            for event in events:
+                self._apply_input(event)
+
+            with profiler.scope("simulate"):
+                self.scene.store_previous()
+                self.scene.update(self.clock.step_once(), self.clock.step)
+
+    def _render_pipelined(self) -> None:
+        """Draw the newest snapshot, the worker starts on the next one meanwhile"""
+
+        wait_start = time.perf_counter()
+        while self.exchange.published <= self.rendered_sequence:
+            if self.worker.error is not None:
+                raise RuntimeError("simulation thread died") from self.worker.error
+            time.sleep(SimulationWorker.POLL_INTERVAL)
+
+        sequence, snapshot = self.exchange.latest()
+        self.exchange.consume(sequence)
+        self.rendered_sequence = sequence
+
+        start = time.perf_counter()
+        self.pipeline_stats.render_waits.append(start - wait_start)
+        with profiler.scope("render", gpu=True):
+            self.graph.render_snapshot(snapshot)
+        self.pipeline_stats.render_spans.append((start, time.perf_counter()))
+
+    def _update_title(self) -> None:
+        """Frame stats in the window title, about once a second"""
+
+        now = time.perf_counter()
+        if now - self.last_title_update < 1.0:
+            return
+        self.last_title_update = now
+
+        glfw.set_window_title(
+            self.window,
+            f"frame: {self.current_frame}  res: {self.graph.render_scale:.2f}"
+            f"  jitter: {1000 * self.pacer.jitter:.2f}ms"
+            f"  cpu: {100 * self.pacer.cpu_utilization:.0f}%"
+            f"  latency: {1000 * self.presenter.latency:.1f}ms"
+            + (f"  overlap: {100 * self.pipeline_stats.overlap:.0f}%"
+               f"  waits sim/gl: {1000 * self.pipeline_stats.sim_wait:.1f}"
+               f"/{1000 * self.pipeline_stats.render_wait:.1f}ms"
+               if self.worker is not None else "")
+            + (f"  frame p95: {1000 * self._frame_p95():.1f}ms" if profiler.enabled else ""))
+
+    def _frame_p95(self) -> float:
+        frames = list(profiler.frames)
+        if not frames:
+            return 0.0
+        return float(np.percentile([frame.end - frame.start for frame in frames], 95))
 
-            # Render new frame every 0.0417 or 24 frames per second
-            elapsed = time.time() - self.start_time
-            target_frame = int(elapsed * self.fps)
-            glfw.set_window_title(self.window, f"frame: {self.current_frame}")
+    
+    ################################   CONTROL   ######################################
+    def _apply_input(self, event: InputEvent) -> None:
+        """Feed one queued event to the scene, runs on the simulation side"""
 
-            if target_frame > self.current_frame:
-                delta_frames = target_frame - self.current_frame
-                self.current_frame = target_frame
+        if event.kind == InputEvent.MOUSE_MOTION:
+            sensitivity = 0.1  # adjust to taste
 
-                delta_time = delta_frames / self.fps if self.fps > 0 else 0.0
+            # screen y grows downwards, pitch up when the mouse moves up
+            d_yaw   = event.dx * sensitivity  # rotation[1]
+            d_pitch = -event.dy * sensitivity # rotation[2]
 
-                self.scene.update(self.current_frame, delta_time)
-                self.graph.render(self.scene.player, self.scene.entities)
+            # build Euler delta vector: (roll, yaw, pitch)
+            d_eulers = np.array([0.0, d_yaw, d_pitch], dtype=np.float32)
+            self.scene.spin_player(d_eulers)
+            return
 
-    
-    ################################   CONTROL   ######################################
-    def _handle_keys(self) -> None:
+        self._keys[event.key] = event.action == GLFW_CONSTANTS.GLFW_PRESS
 
         pressed_key1 = self._keys.get(GLFW_CONSTANTS.GLFW_KEY_SPACE, False)
         if pressed_key1 and not self.pressed_key1:
@@ -133,28 +315,6 @@ class GameLoop:
         elif not pressed_key1 and self.pressed_key1:
             self.pressed_key1 = False
 
-    
-    def _handle_mouse(self) -> None:
-        x, y = glfw.get_cursor_pos(self.window)
-
-        # how far we moved from window center
-        dx = (GLOBAL.WIDTH / 2)  - x
-        dy = (GLOBAL.HEIGHT / 2) - y
-
-        sensitivity = 0.1  # adjust to taste
-        
-        d_yaw   = dx * sensitivity # rotation[1]
-        d_pitch = dy * sensitivity # rotation[2]
-
-        # build Euler delta vector: (roll, yaw, pitch)
-        d_eulers = np.array([0.0, -d_yaw, d_pitch], dtype=np.float32)
-
-        # apply to camera
-        self.scene.spin_player(d_eulers)
-
-        # re-center cursor
-        glfw.set_cursor_pos(self.window, GLOBAL.WIDTH / 2, GLOBAL.HEIGHT / 2)
-
     # def _handle_mouse(self) -> None:
 
     #     (x,y) = glfw.get_cursor_pos(self.window)
@@ -191,8 +351,21 @@ class GameLoop:
         # self.frames_rendered += 1
 
     def quit(self) -> None:
+        if self.worker is not None:
+            self.worker.stop()
+        if self.recorder is not None:
+            self.recorder.finish(self.clock.tick).save(GLOBAL.RECORD_PATH)
+        if any(system.overruns for system in self.scene.scheduler.systems):
+            print(self.scene.scheduler.report())
+        if profiler.enabled:
+            print(profiler.report())
+            if GLOBAL.PROFILE_TRACE_PATH:
+                profiler.export_chrome_trace(GLOBAL.PROFILE_TRACE_PATH)
+            profiler.destroy()
+        self.presenter.destroy()
         self.graph.destroy()
-        oalQuit()
+        if self.scene.audio:
+            oalQuit()
         glfw.terminate()
 
 
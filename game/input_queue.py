@@ -0,0 +1,52 @@
+import threading
+from collections import deque
+
+
+class InputEvent:
+    """One thing the player did, stamped with time.perf_counter() seconds"""
+    __slots__ = ("time", "kind", "key", "action", "dx", "dy")
+
+    KEY = 0
+    MOUSE_MOTION = 1
+
+
+    def __init__(self, time: float, kind: int,
+                 key: int = 0, action: int = 0,
+                 dx: float = 0.0, dy: float = 0.0):
+        self.time = time
+        self.kind = kind
+        # KEY events
+        self.key = key
+        self.action = action
+        # MOUSE_MOTION events, raw motion since the previous event
+        self.dx = dx
+        self.dy = dy
+
+
+class InputQueue:
+    """Input events in the order they arrived.
+        The glfw callbacks only push onto it, the simulation drains it tick
+        by tick, so nothing input related runs in between.
+    """
+    __slots__ = ("events", "_lock")
+
+
+    def __init__(self):
+        self.events: deque[InputEvent] = deque()
+        self._lock = threading.Lock()
+
+    def push(self, event: InputEvent) -> None:
+        with self._lock:
+            self.events.append(event)
+
+    def drain(self, until: float | None = None) -> list[InputEvent]:
+        """Take out every event up to (and including) the given time, all if None"""
+
+        drained = []
+        with self._lock:
+            while self.events and (until is None or self.events[0].time <= until):
+                drained.append(self.events.popleft())
+        return drained
+
+    def __len__(self) -> int:
+        return len(self.events)
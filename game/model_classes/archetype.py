@@ -0,0 +1,262 @@
+import numpy as np
+
+from game.model_classes.entity import Entity
+
+
+class Archetype:
+    """Every entity of one type, stored structure-of-arrays.
+
+        Each Component (position, rotation, scale, light colour, animation
+        frame...) is a contiguous column with one row per entity, and each
+        tag (see Entity.TAGS) a bool column, so systems can work on whole
+        columns with numpy instead of looping over objects.
+
+        The entity objects stay around as handles onto their row and keep the
+        usual Entity API working. Columns get reallocated when the archetype
+        grows, the handles are rebound then, but views taken from them earlier
+        are stale after an add.
+
+        Iterating / indexing an archetype gives the handles, like the list it replaces.
+    """
+    __slots__ = ("entity_type", "entities", "columns", "count", "capacity")
+
+
+    def __init__(self, entity_type: int, capacity: int = 8):
+        self.entity_type = entity_type
+        self.entities: list[Entity] = []
+        self.columns: dict[str, np.ndarray] = {}
+        self.count = 0
+        self.capacity = capacity
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        return iter(self.entities)
+
+    def __getitem__(self, index):
+        return self.entities[index]
+
+    def column(self, name: str, dtype: np.dtype = np.float32, shape: tuple[int, ...] = ()) -> np.ndarray:
+        """The full capacity column, created zero filled if it isn't there yet"""
+        if name not in self.columns:
+            self.columns[name] = np.zeros((self.capacity, *shape), dtype=dtype)
+        return self.columns[name]
+
+    def view(self, name: str) -> np.ndarray:
+        """The rows in use of a column, writes go straight to the entities"""
+        return self.columns[name][:self.count]
+
+    def has(self, name: str) -> bool:
+        return name in self.columns
+
+    def rows_tagged(self, tag: str) -> np.ndarray:
+        """Indices of the rows carrying a tag"""
+        if tag not in self.columns:
+            return np.zeros(0, dtype=np.intp)
+        return np.flatnonzero(self.view(tag))
+
+    def add(self, entity: Entity) -> Entity:
+        """Move the entity's components into a new row, it becomes a handle onto it"""
+
+        if entity.archetype is not None:
+            raise ValueError("entity already belongs to an archetype")
+
+        if self.count == self.capacity:
+            self._grow(self.capacity * 2)
+
+        row = self.count
+        self.count += 1
+        for name, component in entity.components.items():
+            column = self.column(name, component.dtype, component.shape)
+            column[row] = getattr(entity, component.storage)
+        for tag in entity.tags:
+            self.column(tag, bool)[row] = True
+
+        self.entities.append(entity)
+        self._bind(entity, row)
+        return entity
+
+    def remove(self, entity: Entity) -> None:
+        """Take the entity out, the last row moves into its place"""
+
+        row = entity.row
+        last = self.count - 1
+
+        # give the entity back arrays of its own
+        for name, component in entity.components.items():
+            setattr(entity, component.storage, np.array(self.columns[name][row, ...]))
+        entity.archetype = None
+        entity.row = -1
+
+        if row != last:
+            for column in self.columns.values():
+                column[row] = column[last]
+            moved = self.entities[last]
+            self.entities[row] = moved
+            self._bind(moved, row)
+
+        for column in self.columns.values():
+            column[last] = 0
+        self.entities.pop()
+        self.count -= 1
+
+    def _bind(self, entity: Entity, row: int) -> None:
+        entity.archetype = self
+        entity.row = row
+        for name, component in entity.components.items():
+            # [row, ...] keeps even scalar components as (0-d) views
+            setattr(entity, component.storage, self.columns[name][row, ...])
+
+    def _grow(self, capacity: int) -> None:
+        for name, column in self.columns.items():
+            grown = np.zeros((capacity, *column.shape[1:]), dtype=column.dtype)
+            grown[:self.count] = column[:self.count]
+            self.columns[name] = grown
+        self.capacity = capacity
+
+        # the handles still point into the old columns
+        for row, entity in enumerate(self.entities):
+            self._bind(entity, row)
+
+    def store_previous(self) -> None:
+        """Entity.store_previous for every row"""
+        if self.count:
+            self.view("prev_position")[:] = self.view("position")
+            self.view("prev_rotation")[:] = self.view("rotation")
+
+    def model_transforms(self, alpha: float = 1.0) -> np.ndarray:
+        """Entity.get_model_transform for every row, (N, 4, 4)"""
+
+        position = self.view("position")
+        rotation = self.view("rotation")
+        if alpha < 1.0:
+            prev_position = self.view("prev_position")
+            prev_rotation = self.view("prev_rotation")
+            position = prev_position + (position - prev_position) * alpha
+            # take the short way round, 359 -> 1 should not spin backwards
+            d_rot = (rotation - prev_rotation + 180.0) % 360.0 - 180.0
+            rotation = prev_rotation + d_rot * alpha
+
+        return model_transforms(position, rotation, self.view("scale"))
+
+    ################################   BOUNDS   ######################################
+
+    def _aabb_cache(self) -> tuple[np.ndarray, ...]:
+        """The world AABB columns and what they were computed from"""
+        return (
+            self.column("aabb_min", np.float32, (3,)),
+            self.column("aabb_max", np.float32, (3,)),
+            self.column("aabb_position", np.float32, (3,)),
+            self.column("aabb_angle", np.float32),
+            self.column("aabb_valid", bool),
+        )
+
+    def refresh_aabbs(self) -> np.ndarray:
+        """Recompute the world AABB of every row whose position or Z rotation
+            changed since the last time, in one go. Returns those rows.
+        """
+
+        count = self.count
+        aabb_min, aabb_max, cached_position, cached_angle, valid = (
+            column[:count] for column in self._aabb_cache())
+        position = self.view("position")
+        angle = self.view("rotation")[:, 2]
+
+        dirty = ~valid | np.any(position != cached_position, axis=1) | (angle != cached_angle)
+        rows = np.flatnonzero(dirty)
+        if len(rows):
+            aabb_min[rows], aabb_max[rows] = world_aabbs(
+                self.view("aabb_extents")[rows], self.view("aabb_offset")[rows], position[rows], angle[rows])
+            cached_position[rows] = position[rows]
+            cached_angle[rows] = angle[rows]
+            valid[rows] = True
+        return rows
+
+    def aabbs(self) -> tuple[np.ndarray, np.ndarray]:
+        """(N, 3) world AABB min and max of every row, brought up to date first"""
+        self.refresh_aabbs()
+        return self.view("aabb_min"), self.view("aabb_max")
+
+    def aabb(self, row: int) -> tuple[np.ndarray, np.ndarray]:
+        """World AABB of one row, only recomputed if its transform changed"""
+
+        aabb_min, aabb_max, cached_position, cached_angle, valid = self._aabb_cache()
+        position = self.columns["position"][row]
+        angle = self.columns["rotation"][row, 2]
+
+        if not (valid[row] and angle == cached_angle[row] and np.array_equal(position, cached_position[row])):
+            box_min, box_max = world_aabbs(
+                self.columns["aabb_extents"][row:row + 1], self.columns["aabb_offset"][row:row + 1],
+                position[None], angle[None])
+            aabb_min[row], aabb_max[row] = box_min[0], box_max[0]
+            cached_position[row] = position
+            cached_angle[row] = angle
+            valid[row] = True
+        return aabb_min[row], aabb_max[row]
+
+
+def model_transforms(positions: np.ndarray, rotations: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Batched model matrices, same layout and order as Entity.get_model_transform:
+        rotate X then Y then Z, scale, translate (pyrr's row vector convention).
+    """
+
+    theta = np.radians(rotations.astype(np.float32))
+    s, c = np.sin(theta), np.cos(theta)
+    count = len(positions)
+    one = np.ones(count, dtype=np.float32)
+    zero = np.zeros(count, dtype=np.float32)
+
+    rx = np.stack([
+        one, zero, zero,
+        zero, c[:, 0], s[:, 0],
+        zero, -s[:, 0], c[:, 0],
+    ], axis=1).reshape(count, 3, 3)
+    ry = np.stack([
+        c[:, 1], zero, -s[:, 1],
+        zero, one, zero,
+        s[:, 1], zero, c[:, 1],
+    ], axis=1).reshape(count, 3, 3)
+    rz = np.stack([
+        c[:, 2], s[:, 2], zero,
+        -s[:, 2], c[:, 2], zero,
+        zero, zero, one,
+    ], axis=1).reshape(count, 3, 3)
+
+    models = np.zeros((count, 4, 4), dtype=np.float32)
+    models[:, :3, :3] = rz @ ry @ rx * scales[:, None, :]
+    models[:, 3, :3] = positions
+    models[:, 3, 3] = 1.0
+    return models
+
+
+def world_aabbs(extents: np.ndarray, offsets: np.ndarray, positions: np.ndarray, angles: np.ndarray
+                ) -> tuple[np.ndarray, np.ndarray]:
+    """Batched Cube / Plane get_aabb: boxes with the given half extents, turned
+        `angles` degrees about Z and moved to position + offset. (N, 3) min and max.
+    """
+
+    theta = np.radians(angles.astype(np.float32))
+    cos, sin = np.abs(np.cos(theta)), np.abs(np.sin(theta))
+
+    # turned about Z the box's half size on x / y is what its furthest
+    # corner reaches, same as rotating all 8 and taking the min / max
+    half = np.empty(extents.shape, dtype=np.float32)
+    half[:, 0] = cos * extents[:, 0] + sin * extents[:, 1]
+    half[:, 1] = sin * extents[:, 0] + cos * extents[:, 1]
+    half[:, 2] = extents[:, 2]
+    center = positions + offsets
+
+    return center - half, center + half
+
+
+def cached_aabb(entity: Entity) -> tuple[np.ndarray, np.ndarray]:
+    """get_aabb for entities with aabb_extents / aabb_offset components,
+        from the archetype's cache if it's in one.
+    """
+    if entity.archetype is not None:
+        return entity.archetype.aabb(entity.row)
+
+    box_min, box_max = world_aabbs(
+        entity.aabb_extents[None], entity.aabb_offset[None], entity.position[None], entity.rotation[2:3])
+    return box_min[0], box_max[0]
@@ -6,12 +6,14 @@ from OpenGL.GLU import *
 import numpy as np
 import pyrr
 
-from game.model_classes.entity import Entity
+from game.model_classes.entity import Entity, Component
 
 class Billboard(Entity):
     """An object which always faces towards the camera"""
     __slots__ = tuple()
 
+    TAGS = frozenset({"billboard"})
+
 
     def __init__(self, position: list[float], scale: list[float] | None = None):
         super().__init__(position, rotation=[0.0, 0.0, 0.0], scale=scale or [1.0, 1.0, 1.0])
@@ -46,7 +48,15 @@ class Billboard(Entity):
 class AnimatedBillboard(Billboard):
     """Billboard that cycles through an image sequence."""
 
-    __slots__ = ("frame_rate", "frame_count", "current_frame", "_time_accumulator", "texture_paths")
+    __slots__ = ("_frame_rate", "_frame_count", "_current_frame", "_frame_clock", "texture_paths")
+
+    TAGS = frozenset({"billboard", "animated"})
+
+    frame_rate = Component(np.float32)
+    frame_count = Component(np.int32)
+    current_frame = Component(np.int32)
+    # time gone by since the current frame came up
+    frame_clock = Component(np.float32)
 
     def __init__(
         self,
@@ -60,7 +70,7 @@ class AnimatedBillboard(Billboard):
         self.frame_rate = frame_rate
         self.frame_count = len(self.texture_paths)
         self.current_frame = 0
-        self._time_accumulator = 0.0
+        self.frame_clock = 0.0
 
     def set_sequence(self, texture_paths: list[str] | tuple[str, ...], frame_rate: float) -> None:
         """Assign a new sequence for the billboard to play."""
@@ -68,15 +78,36 @@ class AnimatedBillboard(Billboard):
         self.frame_rate = frame_rate
         self.frame_count = len(self.texture_paths)
         self.current_frame = 0
-        self._time_accumulator = 0.0
+        self.frame_clock = 0.0
 
     def advance(self, delta_time: float) -> None:
         """Advance the animation based on elapsed time."""
         if self.frame_count == 0 or self.frame_rate <= 0.0:
             return
 
-        self._time_accumulator += delta_time
+        self.frame_clock += delta_time
         frame_time = 1.0 / self.frame_rate
-        while self._time_accumulator >= frame_time:
-            self._time_accumulator -= frame_time
-            self.current_frame = (self.current_frame + 1) % self.frame_count
\ No newline at end of file
+        while self.frame_clock >= frame_time:
+            self.frame_clock -= frame_time
+            self.current_frame = (self.current_frame + 1) % self.frame_count
+
+    @staticmethod
+    def advance_all(archetype, rows: np.ndarray, delta_time: float | np.ndarray) -> None:
+        """advance() for the given rows of an archetype in one go,
+            delta_time can be one for all of them or one per row
+        """
+
+        frame_rate = archetype.view("frame_rate")[rows]
+        frame_count = archetype.view("frame_count")[rows]
+        playing = (frame_count > 0) & (frame_rate > 0.0)
+        rows = rows[playing]
+        delta_time = np.broadcast_to(delta_time, playing.shape)[playing]
+
+        frame_clock = archetype.view("frame_clock")
+        current_frame = archetype.view("current_frame")
+
+        frame_clock[rows] += delta_time
+        frame_time = (1.0 / frame_rate[playing]).astype(np.float32)
+        steps = np.floor(frame_clock[rows] / frame_time)
+        frame_clock[rows] -= steps * frame_time
+        current_frame[rows] = (current_frame[rows] + steps.astype(np.int32)) % frame_count[playing]
\ No newline at end of file
@@ -3,54 +3,37 @@ from OpenGL.GL import *
 from OpenGL.GLU import *
 
 import numpy as np
-from game.model_classes.entity import Entity
+from game.model_classes.entity import Entity, Component
+from game.model_classes.archetype import cached_aabb
 
 
 class Cube(Entity):
-    __slots__ = tuple([])
+    __slots__ = ("_aabb_extents", "_aabb_offset", "_velocity", "_rest_time", "_asleep")
+
+    # collision box, half extents and where its center sits relative to the position
+    aabb_extents = Component(np.float32, (3,))
+    aabb_offset = Component(np.float32, (3,))
+    # rigid body state of the maxwells, see game/rigid_body.py
+    velocity = Component(np.float32, (3,))
+    rest_time = Component(np.float32)
+    asleep = Component(bool)
 
     def __init__(self, position: list[float], rotation: list[float], scale: list[float], id = "MAXWELL"):
         super().__init__(position, rotation, scale)
         self.id = id
+        self.aabb_extents = (1, 1, 1)
+        self.aabb_offset = (0, 0, 0.9)
         
 
     def get_aabb(self):
+        """World AABB, cached in the archetype until the cube moves or turns about Z"""
+        return cached_aabb(self)
 
-        # half extents
-        hx, hy, hz = 1, 1, 1
-
-        # world position
-        cx, cy, cz = self.position
-        cz = cz + 0.9
-
-        # 8 corners relative to center
-        corners = np.array([
-            [ hx,  hy,  hz],
-            [ hx,  hy, -hz],
-            [ hx, -hy,  hz],
-            [ hx, -hy, -hz],
-            [-hx,  hy,  hz],
-            [-hx,  hy, -hz],
-            [-hx, -hy,  hz],
-            [-hx, -hy, -hz],
-        ], dtype=np.float32)
-
-        # create rotation matrix (e.g., around Z)
-        rz = np.deg2rad(self.rotation[2])
-        cosz, sinz = np.cos(rz), np.sin(rz)
-        rot_matrix = np.array([
-            [cosz, -sinz, 0],
-            [sinz,  cosz, 0],
-            [0,      0,   1]
-        ], dtype=np.float32)
-
-        rotated = (rot_matrix @ corners.T).T
-        rotated += np.array([cx, cy, cz])
-
-        min_corner = rotated.min(axis=0)
-        max_corner = rotated.max(axis=0)
-        return min_corner, max_corner
 
+    @property
+    def tags(self) -> frozenset[str]:
+        # maxwells spin every tick (see update / update_all), fall and get pushed about by game/rigid_body.py
+        return self.TAGS | {"maxwell"} if self.id == "MAXWELL" else self.TAGS
 
     def update(self, dt: float) -> None:
 
@@ -59,5 +42,15 @@ class Cube(Entity):
         if self.rotation[1] > 360:
             self.rotation[1] += 360
 
-        if self.position[1] > 0.5:
-            self.position[1] -= 0.1
\ No newline at end of file
+    @staticmethod
+    def update_all(archetype, rows: np.ndarray, dt: float | np.ndarray) -> None:
+        """update() for the given rows of an archetype in one go,
+            dt can be one for all of them or one per row
+        """
+
+        rotation = archetype.view("rotation")
+        dt = np.broadcast_to(dt, rows.shape)
+
+        rotation[rows, 1] -= 24 * dt
+        wrapped = rotation[rows, 1] > 360
+        rotation[rows[wrapped], 1] += 360
@@ -3,10 +3,71 @@ import pyrr
 import config as GLOBAL
 
 
+class Component:
+    """An entity attribute that lives in a column of its Archetype
+        (see archetype.py) once the entity is in one, and in its own little
+        array before that. Reading a vector gives a view, setting always
+        writes in place, so `entity.position[1] -= 1` and
+        `entity.position = [0, 1, 0]` both end up in the column.
+    """
+    __slots__ = ("dtype", "shape", "name", "storage")
+
+
+    def __init__(self, dtype: np.dtype, shape: tuple[int, ...] = ()):
+        self.dtype = np.dtype(dtype)
+        self.shape = shape
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+        # the slot holding the array (or row view) behind it
+        self.storage = "_" + name
+
+    def allocate(self) -> np.ndarray:
+        return np.zeros(self.shape, dtype=self.dtype)
+
+    def __get__(self, entity, owner=None):
+        if entity is None:
+            return self
+        value = getattr(entity, self.storage)
+        return value if self.shape else value[()]
+
+    def __set__(self, entity, value) -> None:
+        getattr(entity, self.storage)[...] = value
+
+
 class Entity:
     """A basic object in the world, with a position and rotation.
+        Its Components are stored in its Archetype's columns once it's been
+        added to one, the entity object is then just a handle onto its row.
     """
-    __slots__ = ("position", "rotation", "scale", "id")
+    __slots__ = (
+        "_position", "_rotation", "_scale", "_prev_position", "_prev_rotation",
+        "id", "archetype", "row")
+
+    # the position of the entity.
+    position = Component(np.float32, (3,))
+    # the rotation of the entity about each axis.
+    rotation = Component(np.float32, (3,))
+    # the scale of the entity.
+    scale = Component(np.float32, (3,))
+    # transform at the previous simulation tick, rendering interpolates from it
+    prev_position = Component(np.float32, (3,))
+    prev_rotation = Component(np.float32, (3,))
+
+    # bool columns set for the entity in its archetype, systems select on them
+    TAGS: frozenset[str] = frozenset()
+
+    # name -> Component, for this class and everything it inherits
+    components: dict[str, Component] = {}
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.components = {
+            name: value
+            for klass in reversed(cls.__mro__)
+            for name, value in vars(klass).items()
+            if isinstance(value, Component)
+        }
 
     def __init__(self, 
                  position: list[float] = [0,0,0],
@@ -14,17 +75,43 @@ class Entity:
                     scale: list[float] = [1,1,1]
                     ):
 
-        # the position of the entity.
-        self.position = np.array(position, dtype=np.float32)
-
-        # the rotation of the entity about each axis.
-        self.rotation = np.array(rotation, dtype=np.float32)
+        for component in self.components.values():
+            setattr(self, component.storage, component.allocate())
+        self.archetype = None
+        self.row = -1
 
-        # the scale of the entity.
-        self.scale = np.array(scale, dtype=np.float32)
+        self.position = position
+        self.rotation = rotation
+        self.scale = scale
 
         self.id = ""
 
+        self.prev_position = self.position
+        self.prev_rotation = self.rotation
+
+    @property
+    def tags(self) -> frozenset[str]:
+        return self.TAGS
+
+    def store_previous(self) -> None:
+        """Remember the current transform, call right before a simulation tick"""
+        self.prev_position = self.position
+        self.prev_rotation = self.rotation
+
+    def get_interpolated(self, alpha: float) -> tuple[np.ndarray, np.ndarray]:
+        """Position and rotation an alpha (0-1) of the way from the previous tick to this one"""
+
+        position = np.asarray(self.position, dtype=np.float32)
+        rotation = np.asarray(self.rotation, dtype=np.float32)
+        if alpha >= 1.0:
+            return position, rotation
+
+        position = self.prev_position + (position - self.prev_position) * alpha
+        # take the short way round, 359 -> 1 should not spin backwards
+        d_rot = (rotation - self.prev_rotation + 180.0) % 360.0 - 180.0
+        rotation = self.prev_rotation + d_rot * alpha
+        return position, rotation
+
     def update(self,
                new_pos: list[float] | None = None, 
                new_rot: list[float] | None = None,
@@ -38,24 +125,24 @@ class Entity:
 
 
 
-    def _get_rotations(self, model_transform):
+    def _get_rotations(self, model_transform, rotation):
 
         # rotations:::::
      
 
         Rx = pyrr.matrix44.create_from_axis_rotation(        # X-axis
             axis=GLOBAL.X,
-            theta=np.radians(self.rotation[0]),
+            theta=np.radians(rotation[0]),
             dtype=np.float32
         )
         Ry = pyrr.matrix44.create_from_axis_rotation(        # Y-axis
             axis=GLOBAL.Y,
-            theta=np.radians(self.rotation[1]),
+            theta=np.radians(rotation[1]),
             dtype=np.float32
         )
         Rz = pyrr.matrix44.create_from_axis_rotation(        # Z-axis
             axis=GLOBAL.Z,
-            theta=np.radians(self.rotation[2]),
+            theta=np.radians(rotation[2]),
             dtype=np.float32
         )
 
@@ -68,12 +155,15 @@ class Entity:
         return model_transform
 
 
-    def get_model_transform(self) -> np.ndarray:
-        """Returns the entity's model to world transformation matrix"""
+    def get_model_transform(self, alpha: float = 1.0) -> np.ndarray:
+        """Returns the entity's model to world transformation matrix,
+            alpha < 1 interpolates back towards the previous simulation tick.
+        """
+        position, rotation = self.get_interpolated(alpha)
         
         model_transform = pyrr.matrix44.create_identity(dtype=np.float32)
 
-        model_transform = self._get_rotations(model_transform)
+        model_transform = self._get_rotations(model_transform, rotation)
 
         # Scale transformation :::
         model_transform = pyrr.matrix44.multiply(
@@ -86,7 +176,7 @@ class Entity:
         return pyrr.matrix44.multiply(
             m1=model_transform, 
             m2=pyrr.matrix44.create_from_translation(
-                vec=np.array(self.position),dtype=np.float32
+                vec=np.array(position),dtype=np.float32
             )
         )
     
@@ -97,4 +187,7 @@ class Entity:
         model = self.get_model_transform()       # 4x4 model matrix
         normal_matrix = np.linalg.inv(model[:3,:3]).T
         return normal_matrix.astype(np.float32)
-    
+
+
+Entity.components = {
+    name: value for name, value in vars(Entity).items() if isinstance(value, Component)}
@@ -1,12 +1,15 @@
 import numpy as np
-from game.model_classes.entity import Entity
+from game.model_classes.entity import Entity, Component
 from game.model_classes.billboard import Billboard
 
 #class Light(Billboard):
 class Light(Entity):
     """yagami???"""
 
-    __slots__ = ("color", "strength")
+    __slots__ = ("_color", "_strength")
+
+    color = Component(np.float32, (3,))
+    strength = Component(np.float32)
 
     def __init__(self, 
                  position: list[float],
@@ -14,5 +17,5 @@ class Light(Entity):
                  strength: float = 10
                  ):
         super().__init__(position) # inherits from Entity
-        self.color = np.array(color, dtype=np.float32)
+        self.color = color
         self.strength = strength
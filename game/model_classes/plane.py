@@ -1,12 +1,17 @@
 import numpy as np
 import pyrr
 import config as GLOBAL
-from game.model_classes.entity import Entity
+from game.model_classes.entity import Entity, Component
+from game.model_classes.archetype import cached_aabb
 
 
 class Plane(Entity):
     """The ground plane, uses rectangle mesh"""
-    __slots__ = ("position", "scale", "texture")
+    __slots__ = ("texture", "_aabb_extents", "_aabb_offset")
+
+    # collision box, half extents and where its center sits relative to the position
+    aabb_extents = Component(np.float32, (3,))
+    aabb_offset = Component(np.float32, (3,))
 
     def __init__(self, 
                  position: list[float], 
@@ -17,46 +22,10 @@ class Plane(Entity):
 
         self.texture = texture
         self.id = "WALL"
-
-
-    def get_aabb(self):
-
-        # half extents
         # hx, hy, hz = 0, self.scale[1] * 2, self.scale[2] * 2
-        hx, hy, hz = (GLOBAL.GROUND_W / GLOBAL.GRID_SIZE) /2, GLOBAL.WALL_H /2, GLOBAL.WALL_D /2
-
-        # world position
-        cx, cy, cz = self.position
+        self.aabb_extents = (GLOBAL.GROUND_W / GLOBAL.GRID_SIZE / 2, GLOBAL.WALL_H / 2, GLOBAL.WALL_D / 2)
 
-        # 8 corners relative to center
-        corners = np.array([
-            [ hx,  hy,  hz],
-            [ hx,  hy, -hz],
-            [ hx, -hy,  hz],
-            [ hx, -hy, -hz],
-            [-hx,  hy,  hz],
-            [-hx,  hy, -hz],
-            [-hx, -hy,  hz],
-            [-hx, -hy, -hz],
-        ], dtype=np.float32)
 
-        # create rotation matrix (e.g., around Z)
-        rz = np.deg2rad(self.rotation[2])
-        cosz, sinz = np.cos(rz), np.sin(rz)
-        rot_matrix = np.array([
-            [cosz, -sinz, 0],
-            [sinz,  cosz, 0],
-            [0,      0,   1]
-        ], dtype=np.float32)
-
-        rotated = (rot_matrix @ corners.T).T
-        rotated += np.array([cx, cy, cz])
-
-        min_corner = rotated.min(axis=0)
-        max_corner = rotated.max(axis=0)
-        return min_corner, max_corner
-
-
-
-    
-    
+    def get_aabb(self):
+        """World AABB, cached in the archetype until the wall moves or turns about Z"""
+        return cached_aabb(self)
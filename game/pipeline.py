@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+import numpy as np
+
+from game.render_snapshot import RenderSnapshot
+from game.scene import Scene
+from game.sim_clock import SimulationClock
+
+
+class SnapshotExchange:
+    """Lock-free double buffer between the simulation thread and the GL thread.
+
+        The producer fills the slot the consumer isn't reading and publishes it
+        by bumping a sequence number, the consumer marks what it picked up the
+        same way. Each counter only ever has one writer and single reference
+        assignments are atomic in CPython, so neither side takes a lock.
+    """
+    __slots__ = ("slots", "published", "consumed")
+
+
+    def __init__(self):
+        self.slots: list[RenderSnapshot | None] = [None, None]
+        self.published = 0 # written by the producer only
+        self.consumed = 0  # written by the consumer only
+
+    def publish(self, snapshot: RenderSnapshot) -> None:
+        self.slots[(self.published + 1) % 2] = snapshot
+        self.published += 1
+
+    def latest(self) -> tuple[int, RenderSnapshot | None]:
+        sequence = self.published
+        return sequence, self.slots[sequence % 2]
+
+    def consume(self, sequence: int) -> None:
+        self.consumed = sequence
+
+
+class PipelineStats:
+    """Timings for both stages, appended to from both threads"""
+    __slots__ = ("sim_spans", "render_spans", "sim_waits", "render_waits")
+
+
+    def __init__(self, history: int = 120):
+        # (start, end) perf_counter seconds of each stage's work
+        self.sim_spans: deque[tuple[float, float]] = deque(maxlen=history)
+        self.render_spans: deque[tuple[float, float]] = deque(maxlen=history)
+        # seconds each stage sat waiting on the other
+        self.sim_waits: deque[float] = deque(maxlen=history)
+        self.render_waits: deque[float] = deque(maxlen=history)
+
+    @property
+    def overlap(self) -> float:
+        """Fraction of the render time during which the simulation was working too"""
+
+        sim_spans = list(self.sim_spans)
+        render_spans = list(self.render_spans)
+        render_time = sum(end - start for start, end in render_spans)
+        if not render_time:
+            return 0.0
+
+        shared = 0.0
+        i = 0
+        for render_start, render_end in render_spans:
+            # spans are in time order on both sides, skip the ones that ended already
+            while i < len(sim_spans) and sim_spans[i][1] <= render_start:
+                i += 1
+            j = i
+            while j < len(sim_spans) and sim_spans[j][0] < render_end:
+                shared += min(render_end, sim_spans[j][1]) - max(render_start, sim_spans[j][0])
+                j += 1
+        return shared / render_time
+
+    @property
+    def sim_wait(self) -> float:
+        return float(np.mean(self.sim_waits)) if self.sim_waits else 0.0
+
+    @property
+    def render_wait(self) -> float:
+        return float(np.mean(self.render_waits)) if self.render_waits else 0.0
+
+
+class SimulationWorker(threading.Thread):
+    """Runs Scene.update on its own thread, one frame ahead of the renderer.
+
+        Every frame it waits for the GL thread to pick up the last snapshot,
+        runs the simulation for the time that passed (simulate applies the
+        queued input tick by tick) and publishes a new RenderSnapshot.
+    """
+
+    # how long to nap while waiting on the other thread
+    POLL_INTERVAL = 0.0002
+
+    def __init__(self, scene: Scene, clock: SimulationClock, exchange: SnapshotExchange, stats: PipelineStats,
+                 simulate: Callable[[float, float], None]):
+        """ Parameters:
+                simulate: called with (frame_time, now), runs however many ticks
+                    are due. Anything touching the scene has to happen in there.
+        """
+        super().__init__(name="simulation", daemon=True)
+        self.scene = scene
+        self.clock = clock
+        self.exchange = exchange
+        self.stats = stats
+        self.simulate = simulate
+
+        self.running = True
+        self.error: BaseException | None = None
+
+    def run(self) -> None:
+        try:
+            self._run()
+        except BaseException as error:
+            self.error = error
+            self.running = False
+
+    def _run(self) -> None:
+        last_time = time.perf_counter()
+
+        while self.running:
+            wait_start = time.perf_counter()
+            while self.running and self.exchange.consumed < self.exchange.published:
+                time.sleep(self.POLL_INTERVAL)
+            if not self.running:
+                return
+
+            start = time.perf_counter()
+            self.stats.sim_waits.append(start - wait_start)
+
+            self.simulate(start - last_time, start)
+            last_time = start
+
+            self.exchange.publish(RenderSnapshot.capture(
+                self.scene.player, self.scene.entities,
+                self.clock.alpha, self.scene.sky_mix, self.clock.tick))
+
+            self.stats.sim_spans.append((start, time.perf_counter()))
+
+    def stop(self) -> None:
+        self.running = False
+        self.join()
@@ -0,0 +1,251 @@
+import ctypes
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import config as GLOBAL
+
+
+class ProfileFrame:
+    """Everything timed during one frame"""
+    __slots__ = ("number", "start", "end", "events", "gpu_events")
+
+
+    def __init__(self, number: int, start: float):
+        self.number = number
+        self.start = start
+        self.end = start
+        # (name, thread name, depth, start, end), perf_counter seconds
+        self.events: list[tuple[str, str, int, float, float]] = []
+        # (name, cpu start, gpu seconds), filled in a few frames late
+        self.gpu_events: list[tuple[str, float, float]] = []
+
+
+class _Scope:
+    """Context manager handed out by Profiler.scope"""
+    __slots__ = ("profiler", "name", "gpu", "start", "depth", "queries")
+
+
+    def __init__(self, profiler: "Profiler", name: str, gpu: bool):
+        self.profiler = profiler
+        self.name = name
+        self.gpu = gpu
+
+    def __enter__(self) -> "_Scope":
+        local = self.profiler._local
+        self.depth = getattr(local, "depth", 0)
+        local.depth = self.depth + 1
+        if self.gpu:
+            self.queries = self.profiler._gpu_begin()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        end = time.perf_counter()
+        profiler = self.profiler
+        profiler._local.depth = self.depth
+        profiler.frame.events.append(
+            (self.name, threading.current_thread().name, self.depth, self.start, end))
+        if self.gpu:
+            profiler._gpu_end(self.name, self.start, self.queries)
+
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullScope":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class Profiler:
+    """Scoped frame profiler.
+
+        with profiler.scope("render/opaque", gpu=True):
+            ...
+
+        Scopes nest (per thread) and are collected into the current frame,
+        the last `history` frames are kept for the stats and trace export.
+        gpu=True also brackets the scope with GL timestamp queries, their
+        results are picked up a few frames later so reading never stalls.
+        Disabled, scope() hands back a shared do-nothing context manager.
+    """
+    __slots__ = (
+        "enabled", "gpu", "frames", "frame", "frame_count",
+        "_local", "_free_queries", "_pending_queries")
+
+
+    def __init__(self, enabled: bool = False, gpu: bool = False, history: int = 240):
+        """ Parameters:
+                enabled: record anything at all
+                gpu: honour gpu=True scopes, needs a current GL context
+                history: frames kept around
+        """
+        self.enabled = enabled
+        self.gpu = gpu
+        self.frames: deque[ProfileFrame] = deque(maxlen=history)
+        self.frame_count = 0
+        self.frame = ProfileFrame(0, time.perf_counter())
+
+        # scope depth per thread
+        self._local = threading.local()
+        self._free_queries: list[int] = []
+        # (frame number, name, cpu start, start query, end query)
+        self._pending_queries: deque[tuple[int, str, float, int, int]] = deque()
+
+    def scope(self, name: str, gpu: bool = False) -> _Scope | _NullScope:
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _Scope(self, name, gpu and self.gpu)
+
+    def begin_frame(self) -> None:
+        if not self.enabled:
+            return
+        self.frame_count += 1
+        self.frame = ProfileFrame(self.frame_count, time.perf_counter())
+
+    def end_frame(self) -> None:
+        if not self.enabled:
+            return
+        self.frame.end = time.perf_counter()
+        self.frames.append(self.frame)
+        if self._pending_queries:
+            self._collect_gpu_results()
+
+    ################################   GPU   ######################################
+
+    def _gpu_begin(self) -> tuple[int, int]:
+        from OpenGL.GL import glGenQueries, glQueryCounter, GL_TIMESTAMP
+
+        if len(self._free_queries) < 2:
+            self._free_queries.extend(int(query) for query in glGenQueries(16))
+        queries = (self._free_queries.pop(), self._free_queries.pop())
+        # timestamps rather than GL_TIME_ELAPSED, those can't nest with the frame timer
+        glQueryCounter(queries[0], GL_TIMESTAMP)
+        return queries
+
+    def _gpu_end(self, name: str, cpu_start: float, queries: tuple[int, int]) -> None:
+        from OpenGL.GL import glQueryCounter, GL_TIMESTAMP
+
+        glQueryCounter(queries[1], GL_TIMESTAMP)
+        self._pending_queries.append((self.frame.number, name, cpu_start, *queries))
+
+    def _collect_gpu_results(self) -> None:
+        """Read back every query pair the GPU is done with, oldest first"""
+        from OpenGL.GL import (
+            glGetQueryObjectiv, glGetQueryObjectui64v, GL_QUERY_RESULT, GL_QUERY_RESULT_AVAILABLE)
+
+        frames = {frame.number: frame for frame in self.frames}
+        available = np.zeros(1, dtype=np.int32)
+        # PyOpenGL has no array type for 64 bit unsigned results, read into a plain ctypes one
+        result = ctypes.c_uint64()
+
+        while self._pending_queries:
+            number, name, cpu_start, start_query, end_query = self._pending_queries[0]
+            glGetQueryObjectiv(end_query, GL_QUERY_RESULT_AVAILABLE, available)
+            if not available[0]:
+                break
+            self._pending_queries.popleft()
+
+            glGetQueryObjectui64v(start_query, GL_QUERY_RESULT, ctypes.byref(result))
+            gpu_start = result.value
+            glGetQueryObjectui64v(end_query, GL_QUERY_RESULT, ctypes.byref(result))
+            gpu_time = (result.value - gpu_start) * 1e-9
+
+            if number in frames:
+                frames[number].gpu_events.append((name, cpu_start, gpu_time))
+            self._free_queries.extend((start_query, end_query))
+
+    def destroy(self) -> None:
+        """Free the GL queries, only needed with gpu on"""
+        if not self._free_queries and not self._pending_queries:
+            return
+        from OpenGL.GL import glDeleteQueries
+
+        queries = self._free_queries + [
+            query for pending in self._pending_queries for query in pending[3:]]
+        glDeleteQueries(len(queries), queries)
+        self._free_queries = []
+        self._pending_queries.clear()
+
+    ################################   REPORTING   ######################################
+
+    def timings(self) -> dict[str, np.ndarray]:
+        """Seconds spent in each scope per frame, over the kept frames.
+            A scope entered more than once in a frame (ticks) is summed.
+            GPU times come under "<name> (gpu)".
+        """
+        frames = list(self.frames)
+        timings: dict[str, np.ndarray] = {"frame": np.array([frame.end - frame.start for frame in frames])}
+
+        for i, frame in enumerate(frames):
+            for name, _, _, start, end in frame.events:
+                timings.setdefault(name, np.zeros(len(frames)))[i] += end - start
+            for name, _, gpu_time in frame.gpu_events:
+                timings.setdefault(f"{name} (gpu)", np.zeros(len(frames)))[i] += gpu_time
+        return timings
+
+    def percentiles(self) -> dict[str, tuple[float, float, float]]:
+        """(p50, p95, p99) seconds for every scope"""
+        return {
+            name: tuple(float(p) for p in np.percentile(times, (50, 95, 99)))
+            for name, times in self.timings().items() if len(times)
+        }
+
+    def report(self) -> str:
+        lines = [f"{'scope':<32}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+        for name, (p50, p95, p99) in sorted(self.percentiles().items()):
+            lines.append(f"{name:<32}{1000 * p50:>10.3f}{1000 * p95:>10.3f}{1000 * p99:>10.3f}")
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path: str) -> None:
+        """Write the kept frames as Chrome trace events (chrome://tracing, Perfetto).
+            GPU scopes go on their own track, placed at the CPU time they were
+            issued since the GPU clock isn't synced to ours.
+        """
+
+        frames = list(self.frames)
+        if not frames:
+            return
+        origin = frames[0].start
+
+        def microseconds(seconds: float) -> float:
+            return round(1e6 * seconds, 3)
+
+        events = []
+        threads = {}
+        for frame in frames:
+            events.append({
+                "name": f"frame {frame.number}", "cat": "frame", "ph": "X", "pid": 0, "tid": 0,
+                "ts": microseconds(frame.start - origin), "dur": microseconds(frame.end - frame.start)})
+            for name, thread, _, start, end in frame.events:
+                tid = threads.setdefault(thread, len(threads) + 1)
+                events.append({
+                    "name": name, "cat": "cpu", "ph": "X", "pid": 0, "tid": tid,
+                    "ts": microseconds(start - origin), "dur": microseconds(end - start)})
+            for name, start, gpu_time in frame.gpu_events:
+                events.append({
+                    "name": name, "cat": "gpu", "ph": "X", "pid": 1, "tid": 0,
+                    "ts": microseconds(start - origin), "dur": microseconds(gpu_time)})
+
+        names = [
+            {"name": "process_name", "ph": "M", "pid": 0, "args": {"name": "cpu"}},
+            {"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "gpu"}},
+        ]
+        for thread, tid in threads.items():
+            names.append({"name": "thread_name", "ph": "M", "pid": 0, "tid": tid, "args": {"name": thread}})
+
+        with open(path, "w") as file:
+            json.dump({"traceEvents": names + events, "displayTimeUnit": "ms"}, file)
+
+
+# the one everything reports to, switched on with GLOBAL.PROFILE
+profiler = Profiler(enabled=GLOBAL.PROFILE, gpu=GLOBAL.PROFILE_GPU)
@@ -0,0 +1,150 @@
+import numpy as np
+
+import config as GLOBAL
+from game.model_classes.entity import Entity
+from game.model_classes.archetype import Archetype
+from game.model_classes.billboard import Billboard
+from game.model_classes.camera import Camera
+
+
+class EntityBatch:
+    """Everything the renderer needs from one entity type, packed into arrays"""
+    __slots__ = ("models", "positions", "frames", "billboard")
+
+
+    def __init__(self, models: np.ndarray, positions: np.ndarray, frames: np.ndarray, billboard: np.ndarray):
+        """ Parameters:
+                models: (N, 4, 4) model transforms
+                positions: (N, 3) world positions, for depth sorting
+                frames: (N,) image sequence frame per entity, -1 if it has none
+                billboard: (N,) whether the entity is a billboard
+        """
+        self.models = models
+        self.positions = positions
+        self.frames = frames
+        self.billboard = billboard
+
+        for array in (models, positions, frames, billboard):
+            array.setflags(write=False)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+
+class RenderSnapshot:
+    """A frozen copy of everything needed to draw one frame.
+        The simulation can go on changing the scene while the GL side draws
+        from one of these.
+    """
+    __slots__ = (
+        "tick", "camera_position", "view", "sky_mix", "batches",
+        "light_positions", "light_colors", "light_strengths")
+
+    MAX_LIGHTS = 8
+
+
+    def __init__(self, tick: int, camera_position: np.ndarray, view: np.ndarray, sky_mix: float,
+                 batches: dict[int, EntityBatch],
+                 light_positions: np.ndarray, light_colors: np.ndarray, light_strengths: np.ndarray):
+        self.tick = tick
+        self.camera_position = camera_position
+        self.view = view
+        self.sky_mix = sky_mix
+        self.batches = batches
+        self.light_positions = light_positions
+        self.light_colors = light_colors
+        self.light_strengths = light_strengths
+
+    @classmethod
+    def capture(cls, camera: Camera, renderables: dict[int, list[Entity]],
+                alpha: float = 1.0, sky_mix: float = 0.0, tick: int = 0) -> "RenderSnapshot":
+        """Pack up the current state of the scene.
+            alpha: how far (0-1) between the previous and the latest simulation
+                tick the entities should be drawn
+        """
+
+        batches: dict[int, EntityBatch] = {}
+        for entity_type, entities in renderables.items():
+            is_billboard_type = entity_type == GLOBAL.ENTITY_TYPE.get("BILLBOARD")
+            if isinstance(entities, Archetype):
+                batches[entity_type] = cls._pack_archetype(entities, alpha, is_billboard_type)
+                continue
+
+            count = len(entities)
+            models = np.empty((count, 4, 4), dtype=np.float32)
+            positions = np.empty((count, 3), dtype=np.float32)
+            frames = np.full(count, -1, dtype=np.int32)
+            billboard = np.zeros(count, dtype=bool)
+
+            for i, entity in enumerate(entities):
+                models[i] = entity.get_model_transform(alpha)
+                positions[i] = models[i][3, :3]
+                frames[i] = getattr(entity, "current_frame", -1)
+                billboard[i] = is_billboard_type or isinstance(entity, Billboard)
+
+            batches[entity_type] = EntityBatch(models, positions, frames, billboard)
+
+        light_positions, light_colors, light_strengths = cls._pack_lights(renderables)
+
+        return cls(
+            tick = tick,
+            camera_position = np.array(camera.position, dtype=np.float32),
+            view = camera.get_view_transform(),
+            sky_mix = float(sky_mix),
+            batches = batches,
+            light_positions = light_positions,
+            light_colors = light_colors,
+            light_strengths = light_strengths,
+        )
+
+    @staticmethod
+    def _pack_archetype(archetype: Archetype, alpha: float, is_billboard_type: bool) -> EntityBatch:
+        """The capture loop for a whole archetype at once, straight off its columns"""
+
+        count = len(archetype)
+        models = archetype.model_transforms(alpha)
+        positions = models[:, 3, :3].copy()
+
+        frames = np.full(count, -1, dtype=np.int32)
+        animated = archetype.rows_tagged("animated")
+        if len(animated) and archetype.has("current_frame"):
+            frames[animated] = archetype.view("current_frame")[animated]
+
+        if is_billboard_type:
+            billboard = np.ones(count, dtype=bool)
+        elif archetype.has("billboard"):
+            billboard = archetype.view("billboard").copy()
+        else:
+            billboard = np.zeros(count, dtype=bool)
+
+        return EntityBatch(models, positions, frames, billboard)
+
+    @classmethod
+    def _pack_lights(cls, renderables: dict[int, list[Entity]]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Lights as the shader sees them, slot 0 is maxwell's light"""
+
+        point_lights = renderables.get(GLOBAL.ENTITY_TYPE["POINTLIGHT"], [])
+        max_lights = renderables.get(GLOBAL.ENTITY_TYPE["MAXLIGHT"], [])
+
+        if isinstance(point_lights, Archetype):
+            count = min(len(point_lights), cls.MAX_LIGHTS)
+            # fancy indexing copies, the columns stay the simulation's
+            slots = np.arange(count)
+            positions = point_lights.view("position")[slots]
+            colors = point_lights.view("color")[slots]
+            strengths = point_lights.view("strength")[slots]
+            if count and len(max_lights):
+                maxwell_light = max_lights[0]
+                positions[0] = maxwell_light.position
+                colors[0] = maxwell_light.color
+                strengths[0] = maxwell_light.strength
+            return positions, colors, strengths
+
+        slots = list(point_lights[:cls.MAX_LIGHTS])
+        if slots and max_lights:
+            slots[0] = max_lights[0]
+
+        positions = np.array([light.position for light in slots], dtype=np.float32).reshape(-1, 3)
+        colors = np.array([light.color for light in slots], dtype=np.float32).reshape(-1, 3)
+        strengths = np.array([light.strength for light in slots], dtype=np.float32)
+        return positions, colors, strengths
@@ -0,0 +1,137 @@
+import numpy as np
+
+from game.input_queue import InputEvent
+
+
+class Recording:
+    """Everything needed to play a session back tick for tick:
+        the scene's RNG seed, where the player started and every input event,
+        keyed by the simulation tick it was applied on.
+
+        On disk it's a fixed size header followed by packed 16 byte events.
+    """
+    __slots__ = (
+        "seed", "sim_rate", "tick_count", "view_index",
+        "player_position", "player_rotation", "events")
+
+    MAGIC = b"DGRP"
+    VERSION = 1
+
+    HEADER = np.dtype([
+        ("magic", "S4"),
+        ("version", "<u2"),
+        ("view_index", "<u2"),
+        ("sim_rate", "<f4"),
+        ("seed", "<u8"),
+        ("tick_count", "<u4"),
+        ("event_count", "<u4"),
+        ("player_position", "<f4", 3),
+        ("player_rotation", "<f4", 3),
+    ])
+    EVENT = np.dtype([
+        ("tick", "<u4"),
+        ("kind", "u1"),
+        ("action", "u1"),
+        ("key", "<i2"),
+        ("dx", "<f4"),
+        ("dy", "<f4"),
+    ])
+
+
+    def __init__(self, seed: int, sim_rate: float,
+                 player_position: np.ndarray, player_rotation: np.ndarray,
+                 view_index: int = 0, tick_count: int = 0,
+                 events: np.ndarray | None = None):
+        self.seed = seed
+        self.sim_rate = sim_rate
+        self.view_index = view_index
+        self.player_position = np.array(player_position, dtype=np.float32)
+        self.player_rotation = np.array(player_rotation, dtype=np.float32)
+        # ticks run in total, playback stops after the last one
+        self.tick_count = tick_count
+        # sorted by tick, in the order they were applied
+        self.events = events if events is not None else np.zeros(0, dtype=self.EVENT)
+
+    def save(self, path: str) -> None:
+        header = np.zeros(1, dtype=self.HEADER)
+        header["magic"] = self.MAGIC
+        header["version"] = self.VERSION
+        header["view_index"] = self.view_index
+        header["sim_rate"] = self.sim_rate
+        header["seed"] = self.seed
+        header["tick_count"] = self.tick_count
+        header["event_count"] = len(self.events)
+        header["player_position"] = self.player_position
+        header["player_rotation"] = self.player_rotation
+
+        with open(path, "wb") as file:
+            file.write(header.tobytes())
+            file.write(np.ascontiguousarray(self.events, dtype=self.EVENT).tobytes())
+
+    @classmethod
+    def load(cls, path: str) -> "Recording":
+        with open(path, "rb") as file:
+            data = file.read()
+
+        header = np.frombuffer(data, dtype=cls.HEADER, count=1)[0]
+        if header["magic"] != cls.MAGIC:
+            raise ValueError(f"{path} is not a recording")
+        if header["version"] != cls.VERSION:
+            raise ValueError(f"{path} is recording version {header['version']}, expected {cls.VERSION}")
+
+        events = np.frombuffer(
+            data, dtype=cls.EVENT, count=int(header["event_count"]), offset=cls.HEADER.itemsize)
+
+        return cls(
+            seed = int(header["seed"]),
+            sim_rate = float(header["sim_rate"]),
+            player_position = header["player_position"],
+            player_rotation = header["player_rotation"],
+            view_index = int(header["view_index"]),
+            tick_count = int(header["tick_count"]),
+            events = events,
+        )
+
+
+class InputRecorder:
+    """Collects the input applied on each tick, turns into a Recording at the end"""
+    __slots__ = ("recording", "rows")
+
+
+    def __init__(self, recording: Recording):
+        """ recording: header data (seed, starting state), the events get filled in"""
+        self.recording = recording
+        self.rows: list[tuple] = []
+
+    def record(self, tick: int, events: list[InputEvent]) -> None:
+        for event in events:
+            self.rows.append((tick, event.kind, event.action, event.key, event.dx, event.dy))
+
+    def finish(self, tick_count: int) -> Recording:
+        self.recording.events = np.array(self.rows, dtype=Recording.EVENT)
+        self.recording.tick_count = tick_count
+        return self.recording
+
+
+class InputReplayer:
+    """Hands the recorded events back out, one tick at a time"""
+    __slots__ = ("recording", "step", "_ticks")
+
+
+    def __init__(self, recording: Recording):
+        self.recording = recording
+        self.step = 1.0 / recording.sim_rate
+        self._ticks = np.ascontiguousarray(recording.events["tick"])
+
+    def events_for(self, tick: int) -> list[InputEvent]:
+        first, last = np.searchsorted(self._ticks, (tick, tick + 1))
+        return [
+            InputEvent(
+                tick * self.step, int(row["kind"]),
+                key=int(row["key"]), action=int(row["action"]),
+                dx=float(row["dx"]), dy=float(row["dy"]))
+            for row in self.recording.events[first:last]
+        ]
+
+    def finished(self, tick: int) -> bool:
+        return tick >= self.recording.tick_count
@@ -0,0 +1,166 @@
+import numpy as np
+
+import config as GLOBAL
+from game.model_classes.archetype import Archetype, world_aabbs
+from game.model_classes.entity import Entity
+
+
+def push(entity: Entity, velocity: np.ndarray) -> None:
+    """Shove a body, it wakes up and moves off at the given velocity"""
+    entity.velocity = velocity
+    entity.rest_time = 0.0
+    entity.asleep = False
+
+
+class RigidBodies:
+    """Rigid body step for the pushable props, run over their archetype's
+        columns (velocity, rest_time and asleep next to the position) so
+        thousands of them are a handful of numpy ops.
+
+        Semi-implicit Euler: gravity and damping go into the velocity first
+        and the position moves by the new velocity. Then contacts: no box
+        goes below the ground plane at `floor`, and a body overlapping a
+        static collider's AABB is pushed back out along the axis it's least
+        far in, losing the velocity it had into it. Sliding on either costs
+        friction.
+
+        A body that stays slow while resting on something for `sleep_time`
+        goes to sleep: its velocity is zeroed and it isn't touched again
+        until it's pushed, so a pile of settled props costs one mask per
+        tick, and doesn't move, so the broadphases leave it alone too.
+    """
+    __slots__ = ("gravity", "floor", "damping", "friction", "sleep_speed", "sleep_time",
+                 "steps", "awake", "sleeping", "contacts", "fell_asleep")
+
+
+    def __init__(self,
+                 gravity: float = GLOBAL.GRAVITY,
+                 floor: float = GLOBAL.PROP_FLOOR,
+                 damping: float = GLOBAL.PROP_DAMPING,
+                 friction: float = GLOBAL.PROP_FRICTION,
+                 sleep_speed: float = GLOBAL.SLEEP_SPEED,
+                 sleep_time: float = GLOBAL.SLEEP_TIME):
+        self.gravity = gravity
+        self.floor = floor
+        self.damping = damping
+        self.friction = friction
+        self.sleep_speed = sleep_speed
+        self.sleep_time = sleep_time
+
+        # since the last reset_stats, body counts are summed over steps
+        self.steps = 0
+        self.awake = 0
+        self.sleeping = 0
+        self.contacts = 0 # body vs static collider overlaps resolved
+        self.fell_asleep = 0
+
+    def step(self, archetype: Archetype, rows: np.ndarray, dt: float,
+             static_min: np.ndarray, static_max: np.ndarray) -> np.ndarray:
+        """Advance the bodies in `rows` that are awake by dt, against the
+            floor and the (S, 3) stacked static AABBs. Returns the rows moved.
+        """
+
+        asleep = archetype.view("asleep")
+        self.sleeping += int(np.sum(asleep[rows]))
+        rows = rows[~asleep[rows]]
+        self.steps += 1
+        self.awake += len(rows)
+        if not len(rows) or dt <= 0.0:
+            return rows
+
+        velocity = archetype.view("velocity")
+        position = archetype.view("position")
+        v = velocity[rows]
+        p = position[rows]
+
+        v[:, 1] -= self.gravity * dt
+        v *= np.exp(-self.damping * dt)
+        p += v * dt
+
+        box_min, box_max = world_aabbs(
+            archetype.view("aabb_extents")[rows], archetype.view("aabb_offset")[rows],
+            p, archetype.view("rotation")[rows, 2])
+        sunk = np.maximum(self.floor - box_min[:, 1], 0.0)
+        resting = sunk > 0.0
+        p[:, 1] += sunk
+        box_min[:, 1] += sunk
+        box_max[:, 1] += sunk
+        v[resting, 1] = np.maximum(v[resting, 1], 0.0)
+
+        if len(static_min):
+            out, hit = self._resolve(box_min, box_max, static_min, static_max)
+            p += out
+            # lose the velocity going into whatever it was pushed out of
+            v[(out != 0.0) & (out * v < 0.0)] = 0.0
+            resting |= hit
+
+        sliding = np.where(resting, np.exp(-self.friction * dt), 1.0)
+        v[:, 0] *= sliding
+        v[:, 2] *= sliding
+
+        velocity[rows] = v
+        position[rows] = p
+
+        rest_time = archetype.view("rest_time")
+        slow = np.sum(v ** 2, axis=1) < self.sleep_speed ** 2
+        rest_time[rows] = np.where(slow & resting, rest_time[rows] + dt, 0.0)
+        sleepy = rows[rest_time[rows] >= self.sleep_time]
+        asleep[sleepy] = True
+        velocity[sleepy] = 0.0
+        self.fell_asleep += len(sleepy)
+        return rows
+
+    def _resolve(self, box_min: np.ndarray, box_max: np.ndarray, static_min: np.ndarray, static_max: np.ndarray,
+                 chunk: int = 1024) -> tuple[np.ndarray, np.ndarray]:
+        """How far to move each (B, 3) box to get it out of the static ones,
+            and which boxes touched any. Each overlap pushes out along its
+            shallowest axis, the biggest push each way per axis wins.
+        """
+
+        count = len(box_min)
+        out_up = np.zeros((count, 3), dtype=np.float32)
+        out_down = np.zeros((count, 3), dtype=np.float32)
+        hit = np.zeros(count, dtype=bool)
+
+        for start in range(0, count, chunk):
+            block = slice(start, start + chunk)
+            overlap = np.all(
+                (box_min[block, None] < static_max[None]) & (static_min[None] < box_max[block, None]), axis=2)
+            bodies, statics = np.nonzero(overlap)
+            if not len(bodies):
+                continue
+            bodies += start
+
+            up = static_max[statics] - box_min[bodies] # distance to get out the + side
+            down = box_max[bodies] - static_min[statics] # and the - side
+            depth = np.minimum(up, down)
+            axis = np.argmin(depth, axis=1)
+            pairs = np.arange(len(bodies))
+            amount = depth[pairs, axis]
+            positive = up[pairs, axis] < down[pairs, axis]
+
+            np.maximum.at(out_up, (bodies[positive], axis[positive]), amount[positive])
+            np.maximum.at(out_down, (bodies[~positive], axis[~positive]), amount[~positive])
+            hit[bodies] = True
+            self.contacts += len(bodies)
+
+        return out_up - out_down, hit
+
+    ################################   STATS   ######################################
+
+    @property
+    def stats(self) -> dict[str, float]:
+        return {
+            "steps": self.steps,
+            "awake": self.awake,
+            "asleep": self.sleeping,
+            "contacts": self.contacts,
+            "fell_asleep": self.fell_asleep,
+        }
+
+    def reset_stats(self) -> None:
+        self.steps = 0
+        self.awake = 0
+        self.sleeping = 0
+        self.contacts = 0
+        self.fell_asleep = 0
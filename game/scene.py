@@ -1,8 +1,8 @@
 import numpy as np
-import time
 import config as GLOBAL
 import utils as utils
 from game.model_classes.entity import Entity
+from game.model_classes.archetype import Archetype
 from game.model_classes.camera import Camera
 from game.model_classes.plane import Plane
 from game.model_classes.cube import Cube
@@ -10,8 +10,11 @@ from game.model_classes.light import Light
 from game.model_classes.billboard import AnimatedBillboard
 
 from game.controller import Collision
-from openal import oalInit, oalQuit, oalOpen, Listener
-from game.sound_manager import *
+from game.scheduler import UpdateScheduler, UpdateLOD
+from game.spatial_hash import SpatialHash
+from game.aabb_tree import AABBTree
+from game.sweep_and_prune import SweepAndPrune
+from game.rigid_body import RigidBodies, push
 
 
 
@@ -32,7 +35,17 @@ class Scene:
     # __slots__ = ("entities", "player", "maze")
 
     
-    def __init__(self):
+    def __init__(self, seed: int | None = None, audio: bool = True):
+        """ seed: for everything random in the scene, a fresh one if None.
+                The same seed builds the same scene, see game/replay.py
+            audio: open the audio device and play the music,
+                off for headless runs where there may not be one
+        """
+
+        if seed is None:
+            seed = int(np.random.default_rng().integers(2**63))
+        self.seed = seed
+        rng = np.random.default_rng(seed)
 
         self.view_index = 0
         self._animation_setup()
@@ -56,7 +69,7 @@ class Scene:
         truck.id = "AIRPLANE"
 
 
-        self.entities: dict[int, list[Entity]] = {
+        initial_entities: dict[int, list[Entity]] = {
 
             GLOBAL.ENTITY_TYPE["GROUND"]: [
                 Plane(position=[0,-2,0], rotation=[0,0,0], scale=[1,1,1]),
@@ -82,13 +95,13 @@ class Scene:
             GLOBAL.ENTITY_TYPE["POINTLIGHT"]: [
                 Light(
                     position = [
-                        np.random.uniform(low=-20.0, high=20.0), 
-                        np.random.uniform(low=-20.0, high=20.0), 
-                        np.random.uniform(low=-1.0, high=4.0)],
+                        rng.uniform(low=-20.0, high=20.0), 
+                        rng.uniform(low=-20.0, high=20.0), 
+                        rng.uniform(low=-1.0, high=4.0)],
                     color = [
-                        np.random.uniform(low=0.1, high=1.0), 
-                        np.random.uniform(low=0.1, high=1.0), 
-                        np.random.uniform(low=0.1, high=1.0)],
+                        rng.uniform(low=0.1, high=1.0), 
+                        rng.uniform(low=0.1, high=1.0), 
+                        rng.uniform(low=0.1, high=1.0)],
                     strength = 20)
                 for _ in range(8)
             ],
@@ -102,13 +115,59 @@ class Scene:
             ],
         }
 
+        # collision broadphase, one cell per maze cell. Props that are awake
+        # aren't refiled in it as they move, only once they've settled again
+        # (the rows waiting for that are kept per entity type), see _awake_props
+        self.colliders = SpatialHash(GLOBAL.GROUND_W / GLOBAL.GRID_SIZE)
+        self.props_unfiled: dict[int, np.ndarray] = {}
+        # the same colliders for rays, see raycast. Only brought up to date
+        # when something asks it, the rows that moved since are kept per
+        # entity type. Fat boxes are stretched ahead of falling maxwells so
+        # they stay in them for a few ticks, but props dropped together still
+        # all leave theirs at once; the tree rebuilds in one go then
+        self.collider_tree = AABBTree(margin=0.5, displacement_scale=8.0)
+        self.collider_tree_stale: dict[int, np.ndarray] = {}
+        self.collider_types = tuple(GLOBAL.ENTITY_TYPE[name] for name in GLOBAL.COLLIDERS)
+        # the colliders that get moved about (maxwells) against each other, set
+        # props.on_begin / on_end to hear about them bumping into one another
+        self.props = SweepAndPrune(on_begin=self._props_bump)
+        self.bodies = RigidBodies()
+
+        # one structure-of-arrays Archetype per entity type, see archetype.py
+        self.entities: dict[int, Archetype] = {}
+        for entity_type, entities in initial_entities.items():
+            for entity in entities:
+                self.spawn(entity_type, entity)
+
 
         self.player = Camera(
             position = [0, 1, 0],
             rotation = [0, 0, 0]
         )
 
-        self.set_music()
+        # far / off screen maxwells and flipbooks update less often, each
+        # system counts its own runs so they get their own
+        self.spin_lod = UpdateLOD(GLOBAL.LOD_NEAR, GLOBAL.LOD_FAR) if GLOBAL.UPDATE_LOD else None
+        self.flipbook_lod = UpdateLOD(GLOBAL.LOD_NEAR, GLOBAL.LOD_FAR) if GLOBAL.UPDATE_LOD else None
+
+        # highest priority first, the camera goes before anything that looks at it
+        self.scheduler = UpdateScheduler()
+        budget = GLOBAL.SYSTEM_BUDGET
+        self.scheduler.add("player", self._update_player, priority=100, budget=budget)
+        self.scheduler.add("maxwell", self._update_maxwell, priority=50, budget=budget)
+        self.scheduler.add("bodies", self._update_bodies, priority=40, budget=budget)
+        self.scheduler.add("airplane", self._update_airplane, rate=30, priority=10, budget=budget)
+        self.scheduler.add("orbit", self._update_orbit, priority=10, budget=budget)
+        # 9 frames a second, 30 updates is plenty
+        self.scheduler.add("flipbook", self._update_flipbook, rate=30, budget=budget)
+        # after everything that moves things
+        self.scheduler.add("colliders", self._update_colliders, priority=-100, budget=budget)
+
+        self.audio = audio
+        if audio:
+            from game.sound_manager import init_audio
+            init_audio()
+            self.set_music()
 
         
 
@@ -130,6 +189,9 @@ class Scene:
             np.array([-90, 30.0,  0.0]),
         ]
 
+        # drives the day / night skybox blend, simulation time not wall clock
+        self.sky_time = 0.0
+
         self.bb_time = 0.0
         self.bb_speed = 0.2          # smaller = slower, bigger = faster
 
@@ -139,6 +201,8 @@ class Scene:
         self.bb_height = 2.0         # height above player
 
     def set_music(self):
+        from openal import Listener
+
         # Update OpenAL listener position/orientation to match player
         listener = Listener()
         listener.set_position(tuple(self.player.position))
@@ -158,107 +222,260 @@ class Scene:
 
 
 
+    @property
+    def sky_mix(self) -> float:
+        """Skybox blend, 0 = night, 1 = day"""
+        return (np.sin(self.sky_time * 0.2) * 0.5) + 0.5
+
+    def store_previous(self) -> None:
+        """Remember every entity's transform, call right before a simulation tick"""
+        for archetype in self.entities.values():
+            archetype.store_previous()
+
+    def spawn(self, entity_type: int, entity: Entity) -> Entity:
+        """Add an entity to the scene under the given GLOBAL.ENTITY_TYPE"""
+        entity.store_previous()
+        if entity_type not in self.entities:
+            self.entities[entity_type] = Archetype(entity_type)
+        self.entities[entity_type].add(entity)
+        if entity_type in self.collider_types:
+            aabb = entity.get_aabb()
+            self.colliders.insert(entity, aabb)
+            self.collider_tree.insert(entity, aabb)
+            if "maxwell" in entity.tags:
+                self.props.insert(entity, aabb)
+        return entity
+
+    @property
+    def system_times(self) -> dict[str, float]:
+        """Seconds each system took the last time it ran, by name"""
+        return {system.name: system.last_time for system in self.scheduler.systems}
+
     def update(self, frame_no: int, delta_time: float) -> None:
-        """Takes in a number representing what frame it is on"""
+        """Takes in a number representing what tick it is on, and the fixed tick length"""
+
+        self.sky_time += delta_time
+        self.scheduler.tick(delta_time)
+
+    def _due(self, lod: UpdateLOD | None, archetype: Archetype, rows: np.ndarray,
+             delta_time: float) -> tuple[np.ndarray, np.ndarray | float]:
+        """The rows a LOD'd system should update this run, and by how much"""
+        if lod is None:
+            return rows, delta_time
+        return lod.due(archetype, rows, self.player, delta_time)
+
+    def _update_maxwell(self, delta_time: float) -> None:
         # for entitt in self.entities:
         #     if entitt == GLOBAL.ENTITY_TYPE["MAXWELL"]:
         #         if len(self.frames) > frame_no:
         #             self.entities[entitt][0].update([self.frames[frame_no]])
 
-        for entities in self.entities.values():
-            for entity in entities:
-                if entity.id == "MAXWELL":
-                    entity.update(delta_time)
-                else:
-                    pass
-
+        if self.spin_lod is not None:
+            self.spin_lod.step()
+        for archetype in self.entities.values():
+            rows = archetype.rows_tagged("maxwell")
+            if len(rows):
+                rows, delta_time_rows = self._due(self.spin_lod, archetype, rows, delta_time)
+                Cube.update_all(archetype, rows, delta_time_rows)
+
+    def _update_bodies(self, delta_time: float) -> None:
+        # what the props bump into, every collider that isn't one of them.
+        # Their cached AABBs are read as they are, walls don't move
+        static_min, static_max = [], []
+        for entity_type in self.collider_types:
+            archetype = self.entities.get(entity_type)
+            if not archetype or not archetype.has("aabb_min"):
+                continue
+            static = ~archetype.view("maxwell") if archetype.has("maxwell") else slice(None)
+            static_min.append(archetype.view("aabb_min")[static])
+            static_max.append(archetype.view("aabb_max")[static])
+        static_min = np.concatenate(static_min) if static_min else np.zeros((0, 3), dtype=np.float32)
+        static_max = np.concatenate(static_max) if static_max else np.zeros((0, 3), dtype=np.float32)
+
+        for archetype in self.entities.values():
+            rows = archetype.rows_tagged("maxwell")
+            if len(rows):
+                self.bodies.step(archetype, rows, delta_time, static_min, static_max)
+
+    def _props_bump(self, a: Entity, b: Entity) -> None:
+        """Two props ran into each other, they go on together (at the same
+            velocity, they weigh the same) and the one sitting still wakes up
+        """
+        if a.asleep and b.asleep:
+            return
+        shared = (a.velocity + b.velocity) / 2
+        push(a, shared)
+        push(b, shared)
 
+    def _update_player(self, delta_time: float) -> None:
         # gently rotate the camera each frame so the skybox is visible
         # self.player.spin(np.array([0.0, 1.0, 0.0], dtype=np.float32))
 
-
         self.player.update()
 
+    def _update_airplane(self, delta_time: float) -> None:
         # Bezier animtion
-        if delta_time > 0.0:
-            # Animate billboards
-            for entity in self.entities.get(GLOBAL.ENTITY_TYPE["AIRPLANE"], []):
-
-                # Move along Bezier path (pos)
-                self.bb_time += delta_time * self.bb_speed
-                t = (np.sin(self.bb_time) * 0.5) + 0.5  # oscillate back and forth 0→1→0
-                
-                entity.position = bezier_point(
-                    *self.pos_path_points, t
-                )
-                entity.rotation = bezier_point(
-                    *self.rot_path_points, t
-                ) % 360
-                
-
+        airplanes = self.entities.get(GLOBAL.ENTITY_TYPE["AIRPLANE"])
+        if delta_time > 0.0 and airplanes:
+            # each airplane moves the path clock on a step, like one at a time would
+            times = self.bb_time + np.arange(1, len(airplanes) + 1) * delta_time * self.bb_speed
+            self.bb_time = float(times[-1])
+            t = ((np.sin(times) * 0.5) + 0.5)[:, None]  # oscillate back and forth 0→1→0
+
+            # Move along Bezier path (pos)
+            airplanes.view("position")[:] = bezier_point(*self.pos_path_points, t)
+            airplanes.view("rotation")[:] = bezier_point(*self.rot_path_points, t) % 360
+
+    def _update_flipbook(self, delta_time: float) -> None:
+        # animation frames
+        billboards = self.entities.get(GLOBAL.ENTITY_TYPE["BILLBOARD"])
+        if not billboards:
+            return
+        rows = billboards.rows_tagged("animated")
+        if not len(rows):
+            return
+
+        if self.flipbook_lod is not None:
+            self.flipbook_lod.step()
+        rows, delta_time_rows = self._due(self.flipbook_lod, billboards, rows, delta_time)
+        AnimatedBillboard.advance_all(billboards, rows, delta_time_rows)
+
+    def _update_orbit(self, delta_time: float) -> None:
         # --- Billboard world-centered orbit animation ---
-        for entity in self.entities.get(GLOBAL.ENTITY_TYPE["BILLBOARD"], []):
-            if isinstance(entity, AnimatedBillboard):
-                # animation frames
-                entity.advance(delta_time)
-
-                # update orbital angle
-                self.bb_angle += delta_time * self.bb_orbit_speed
-                if self.bb_angle > np.pi * 2:
-                    self.bb_angle -= np.pi * 2
-
-                # orbit center = world origin (0,0,0)
-                center = np.array([0.0, 0.0, 0.0], dtype=np.float32)
-
-                # compute orbit position
-                x = center[0] + self.bb_orbit_radius * np.cos(self.bb_angle)
-                y = self.bb_height
-                z = center[2] + self.bb_orbit_radius * np.sin(self.bb_angle)
-                
-
-                # assign position
-                entity.position = np.array([x, y, z], dtype=np.float32)
-
-                # make billboard face the player
-                entity.update(self.player.position)
-
-
+        billboards = self.entities.get(GLOBAL.ENTITY_TYPE["BILLBOARD"])
+        if not billboards:
+            return
+        rows = billboards.rows_tagged("animated")
+        if not len(rows):
+            return
+
+        # update orbital angle, every billboard moves it on a step
+        angles = self.bb_angle + np.arange(1, len(rows) + 1) * delta_time * self.bb_orbit_speed
+        angles = np.where(angles > np.pi * 2, angles % (np.pi * 2), angles)
+        self.bb_angle = float(angles[-1])
+
+        # orbit center = world origin (0,0,0)
+        position = billboards.view("position")
+        position[rows, 0] = self.bb_orbit_radius * np.cos(angles)
+        position[rows, 1] = self.bb_height
+        position[rows, 2] = self.bb_orbit_radius * np.sin(angles)
+
+        # make billboard face the player, see Billboard.update
+        dir_vec = self.player.position - position[rows]
+        dir_vec[:, 1] = 0.0
+        facing = ~np.all(np.abs(dir_vec) <= 1e-8, axis=1)
+        rows = rows[facing]
+        dir_vec = dir_vec[facing]
+
+        rotation = billboards.view("rotation")
+        rotation[rows, 0] = 0.0
+        rotation[rows, 1] = np.degrees(np.arctan2(dir_vec[:, 0], dir_vec[:, 2]))
+        rotation[rows, 2] = 0.0
+
+
+
+    def _update_colliders(self, delta_time: float) -> None:
+        # refile whatever moved this tick, their AABBs are recomputed in one batch per type.
+        # The tree only hears about it when it's next queried, see raycast
+        for entity_type in self.collider_types:
+            archetype = self.entities.get(entity_type)
+            if not archetype:
+                continue
+            rows = archetype.refresh_aabbs()
+            if len(rows):
+                stale = self.collider_tree_stale.get(entity_type)
+                self.collider_tree_stale[entity_type] = rows if stale is None else np.union1d(stale, rows)
+
+            if not archetype.has("maxwell"):
+                self._refile(archetype, rows)
+                continue
+
+            props = rows[archetype.view("maxwell")[rows]]
+            if len(props):
+                self.props.update_many([archetype[row] for row in props.tolist()],
+                                       archetype.view("aabb_min")[props], archetype.view("aabb_max")[props])
+
+            # props that moved wait in props_unfiled until they're asleep, they
+            # may come to rest a tick after their last move
+            unfiled = np.union1d(self.props_unfiled.get(entity_type, props), props)
+            settled = archetype.view("asleep")[unfiled]
+            self.props_unfiled[entity_type] = unfiled[~settled]
+            self._refile(archetype, np.union1d(np.setdiff1d(rows, props), unfiled[settled]))
+
+    def _refile(self, archetype: Archetype, rows: np.ndarray) -> None:
+        """Move rows of an archetype to their cached AABBs in the spatial hash"""
+        if len(rows):
+            self.colliders.update_many([archetype[row] for row in rows.tolist()],
+                                       archetype.view("aabb_min")[rows], archetype.view("aabb_max")[rows])
+
+    def _awake_props(self, box_min: np.ndarray, box_max: np.ndarray) -> list[Entity]:
+        """Props on the move whose AABB overlaps the box. The spatial hash
+            has them where they last settled, these are checked against
+            their cached AABBs directly, all of a type at once.
+        """
+        found = []
+        for entity_type in self.collider_types:
+            archetype = self.entities.get(entity_type)
+            if not archetype or not archetype.has("maxwell"):
+                continue
+            aabb_min, aabb_max = archetype.view("aabb_min"), archetype.view("aabb_max")
+            near = (archetype.view("maxwell") & ~archetype.view("asleep")
+                    & np.all(aabb_min <= box_max, axis=1) & np.all(aabb_max >= box_min, axis=1))
+            found += [archetype[row] for row in np.flatnonzero(near).tolist()]
+        return found
+
+    def _refresh_collider_tree(self) -> None:
+        """Refile everything that moved since the tree was last asked something,
+            one batch per type
+        """
+        for entity_type, rows in self.collider_tree_stale.items():
+            archetype = self.entities[entity_type]
+            entities = [archetype[row] for row in rows.tolist()]
+            # the stretch goes by the last tick's move, like it would have every tick
+            displacements = archetype.view("position")[rows] - archetype.view("prev_position")[rows]
+            self.collider_tree.update_many(
+                entities, archetype.view("aabb_min")[rows], archetype.view("aabb_max")[rows], displacements)
+        self.collider_tree_stale.clear()
+
+    def raycast(self, origin: np.ndarray, direction: np.ndarray,
+                max_distance: float = np.inf) -> tuple[Entity | None, float]:
+        """First collider along the ray and how far away it is, (None, inf) if nothing"""
+        direction = np.asarray(direction, dtype=np.float32)
+        length = float(np.linalg.norm(direction))
+        if length == 0.0:
+            return None, np.inf
+        self._refresh_collider_tree()
+        entity, t = self.collider_tree.raycast(origin, direction / length, max_distance)
+        return entity, t
+
+    def line_of_sight(self, start: np.ndarray, end: np.ndarray) -> bool:
+        """Whether nothing solid is between two points"""
+        offset = np.asarray(end, dtype=np.float32) - np.asarray(start, dtype=np.float32)
+        entity, _ = self.raycast(start, offset, float(np.linalg.norm(offset)))
+        return entity is None
 
     def move_player(self, d_pos: list[float]) -> None:
         """Move the player by the given amount in the (right, up, forwards) vectors.
         """
 
-        # get list of collidable objects close to the player
-        collidables: list[Entity] = []
-
         # proposed new position
         new_pos = self.player.position + (
             d_pos[0] * self.player.right +
             d_pos[1] * self.player.up +
             d_pos[2] * self.player.forwards
         )
-        # cell_x, cell_y = self.maze.get_player_cell(new_pos) # Find which maze cell the player is in
-
-        # for print vvv which cell you in
-        # ol_x, ol_y = self.maze.get_player_cell(self.player.position) # earlier player cell
-        # if cell_x != ol_x or cell_y != ol_y:
-        #     print(f"Cell: {cell_x}, {cell_y}")
-
-        # Get nearby cells (1 cell radius is fine)
-        # cells = self.maze.get_nearby_cells(cell_x, cell_y)
-        # for cel in cells:
-        #     collidables.extend(cel.walls)
-            # collidables.extend(cel.entities) # add the things that are in that cell
-
-        # collidables.append(self.entities[GLOBAL.ENTITY_TYPE["MAXWELL"]][0])
 
         if GLOBAL.DEBUG_COLLISION:
-            # for coll in collidables:
-            #     if coll.id != "WALL":
-            #         print(f"{coll.id}")
-
             # for spherical players ..
             pos = self.player.position.copy()  # start from current
+
+            # get list of collidable objects anywhere along the way, the move is swept
+            radius = GLOBAL.PLAYER_RADIUS
+            box_min, box_max = np.minimum(pos, new_pos) - radius, np.maximum(pos, new_pos) + radius
+            collidables: list[Entity] = self.colliders.query_box(box_min, box_max)
+            filed = set(collidables)
+            collidables += [entity for entity in self._awake_props(box_min, box_max) if entity not in filed]
+            # maxwells get shoved, the bodies system moves them from there
             new_pos = Collision.get_player_move(pos, new_pos, collidables)
 
         
@@ -0,0 +1,149 @@
+import time
+from typing import Callable
+
+import numpy as np
+
+from game.model_classes.archetype import Archetype
+from game.model_classes.camera import Camera
+from game.profiler import profiler
+
+
+class ScheduledSystem:
+    """One update system and its bookkeeping, see UpdateScheduler.add"""
+    __slots__ = (
+        "name", "update", "period", "priority", "budget",
+        "pending", "runs", "last_time", "worst_time", "overruns")
+
+
+    def __init__(self, name: str, update: Callable[[float], None],
+                 rate: float | None, priority: int, budget: float | None):
+        self.name = name
+        self.update = update
+        self.period = 1.0 / rate if rate else 0.0
+        self.priority = priority
+        self.budget = budget
+
+        # simulation time since the system last ran, handed to it when it does
+        self.pending = 0.0
+        self.runs = 0
+        self.last_time = 0.0
+        self.worst_time = 0.0
+        self.overruns = 0
+
+
+class UpdateScheduler:
+    """Runs the scene's update systems, each at its own rate.
+
+        A system with a rate below the simulation's skips ticks and gets all
+        the time it missed on the tick it does run, so it ends up where it
+        would have at full rate, just in coarser steps. Systems run highest
+        priority first (ties in the order they were added) and every run
+        longer than the system's budget is counted as an overrun.
+    """
+    __slots__ = ("systems",)
+
+
+    def __init__(self):
+        self.systems: list[ScheduledSystem] = []
+
+    def add(self, name: str, update: Callable[[float], None], rate: float | None = None,
+            priority: int = 0, budget: float | None = None) -> ScheduledSystem:
+        """ Parameters:
+                update: called with the simulation seconds since its last run
+                rate: runs per second, None to run every tick
+                priority: higher runs earlier in the tick
+                budget: seconds a run may take before it counts as an overrun
+        """
+        system = ScheduledSystem(name, update, rate, priority, budget)
+        self.systems.append(system)
+        # sort is stable, equal priorities keep the order they came in
+        self.systems.sort(key=lambda system: -system.priority)
+        return system
+
+    def tick(self, delta_time: float) -> None:
+        for system in self.systems:
+            system.pending += delta_time
+            # a little slack so 60 ticks of 1/60 make a 1/60 period due on time
+            if system.pending < system.period - 1e-9:
+                continue
+
+            with profiler.scope(f"update/{system.name}"):
+                start = time.perf_counter()
+                system.update(system.pending)
+                elapsed = time.perf_counter() - start
+
+            system.pending = 0.0
+            system.runs += 1
+            system.last_time = elapsed
+            system.worst_time = max(system.worst_time, elapsed)
+            if system.budget is not None and elapsed > system.budget:
+                system.overruns += 1
+
+    def report(self) -> str:
+        lines = [f"{'system':<12}{'runs':>8}{'last ms':>10}{'worst ms':>10}{'budget ms':>11}{'overruns':>10}"]
+        for system in self.systems:
+            budget = f"{1000 * system.budget:.3f}" if system.budget is not None else "-"
+            lines.append(
+                f"{system.name:<12}{system.runs:>8}{1000 * system.last_time:>10.3f}"
+                f"{1000 * system.worst_time:>10.3f}{budget:>11}{system.overruns:>10}")
+        return "\n".join(lines)
+
+
+class UpdateLOD:
+    """Distance / visibility based update rate for the entities of an archetype.
+
+        Entities near the camera update every time their system runs, far ones
+        every `far_interval` runs and ones outside the view cone every
+        `cull_interval` runs. Skipped time piles up in a "lod_dt" column and is
+        handed over in full when the entity's turn comes, rows are staggered
+        so the far ones don't all land on the same tick.
+    """
+    __slots__ = ("near", "far", "far_interval", "cull_interval", "cull_cos", "tick")
+
+
+    def __init__(self, near: float, far: float, far_interval: int = 4,
+                 cull_interval: int = 8, view_cone: float = 60.0):
+        """ Parameters:
+                near, far: distances where the update rate starts dropping and bottoms out
+                view_cone: half angle in degrees around the camera's forwards
+                    that counts as on screen, a bit wider than the real frustum
+        """
+        self.near = near
+        self.far = far
+        self.far_interval = far_interval
+        self.cull_interval = cull_interval
+        self.cull_cos = np.cos(np.radians(view_cone))
+        self.tick = 0
+
+    def step(self) -> None:
+        """Call once per run of the system, before asking what's due"""
+        self.tick += 1
+
+    def intervals(self, positions: np.ndarray, camera: Camera) -> np.ndarray:
+        """Runs between updates for each position, 1 = every run"""
+
+        offsets = positions - camera.position
+        distances = np.linalg.norm(offsets, axis=1)
+
+        # ramp from every run at `near` to far_interval at `far`
+        ramp = np.clip((distances - self.near) / max(self.far - self.near, 1e-6), 0.0, 1.0)
+        intervals = 1 + np.floor(ramp * (self.far_interval - 1)).astype(np.int64)
+
+        # behind or well off to the side, but never the things right next to the camera
+        facing = offsets @ camera.forwards
+        culled = (facing < self.cull_cos * distances) & (distances > self.near)
+        intervals[culled] = np.maximum(intervals[culled], self.cull_interval)
+        return intervals
+
+    def due(self, archetype: Archetype, rows: np.ndarray, camera: Camera,
+            delta_time: float) -> tuple[np.ndarray, np.ndarray]:
+        """The rows that get updated now and the time each of them is owed"""
+
+        lod_dt = archetype.column("lod_dt")[:archetype.count]
+        lod_dt[rows] += delta_time
+
+        intervals = self.intervals(archetype.view("position")[rows], camera)
+        due = rows[(self.tick + rows) % intervals == 0]
+        owed = lod_dt[due].copy()
+        lod_dt[due] = 0.0
+        return due, owed
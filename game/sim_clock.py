@@ -0,0 +1,50 @@
+class SimulationClock:
+    """Fixed timestep clock for the simulation.
+        Frame times go into an accumulator which gets spent in whole ticks of
+        `step` seconds, whatever is left over is how far the renderer should
+        interpolate between the last two ticks.
+    """
+    __slots__ = ("step", "max_steps", "accumulator", "tick", "time", "dropped_time")
+
+
+    def __init__(self, rate: float, max_steps: int = 5):
+        """ Parameters:
+                rate: simulation ticks per second
+                max_steps: most ticks run for a single frame, so a long hitch
+                    doesn't snowball into an even longer one (spiral of death)
+        """
+        self.step = 1.0 / rate
+        self.max_steps = max_steps
+
+        self.accumulator = 0.0
+        self.tick = 0
+        self.time = 0.0
+
+        # simulation time thrown away by the clamp, for telemetry
+        self.dropped_time = 0.0
+
+    def advance(self, frame_time: float) -> int:
+        """Add a frame's worth of real time, returns how many ticks are due"""
+
+        self.accumulator += frame_time
+        steps = int(self.accumulator // self.step)
+
+        if steps > self.max_steps:
+            # can't keep up, run the max and let the simulation fall behind real time
+            self.dropped_time += (steps - self.max_steps) * self.step
+            self.accumulator -= (steps - self.max_steps) * self.step
+            steps = self.max_steps
+
+        self.accumulator -= steps * self.step
+        return steps
+
+    def step_once(self) -> int:
+        """Book one tick as done, returns its number"""
+        self.tick += 1
+        self.time += self.step
+        return self.tick
+
+    @property
+    def alpha(self) -> float:
+        """How far between the previous and the current tick the renderer is (0-1)"""
+        return min(1.0, self.accumulator / self.step)
@@ -1,23 +1,31 @@
 from openal import oalInit, oalOpen, Listener
 import utils as utils
 
-oalInit()
+# filled in by init_audio, importing this module doesn't touch the audio device
+sounds = {}
+music = None
 
-sounds = {
-    # "step": oalOpen("assets/sfx/step.wav"),
-    # "shoot": oalOpen("assets/sfx/shoot.wav")
-    # "bg_music": oalOpen("res/sound/Shrek_Remix.wav")
-    "bg_music": oalOpen(utils.asset("res/sound/Shrek_Remix.wav"))
-}
+def init_audio():
+    """Open the audio device, load the sounds and start the music"""
+    global music
+
+    oalInit()
+
+    sounds.update({
+        # "step": oalOpen("assets/sfx/step.wav"),
+        # "shoot": oalOpen("assets/sfx/shoot.wav")
+        # "bg_music": oalOpen("res/sound/Shrek_Remix.wav")
+        "bg_music": oalOpen(utils.asset("res/sound/Shrek_Remix.wav"))
+    })
+
+    # music.set_relative(True)  # sound moves *with* the listener
+    # music.set_position((0, 0, 0))  # same place as listener
+
+    music = oalOpen(utils.asset("res/sound/Shrek_Remix.wav"))
+    # music.set_relative(True)
+    music.set_looping(True)
+    music.play()
 
 def update_listener(camera):
     Listener.set_position(tuple(camera.position))
     Listener.set_orientation(at=tuple(camera.forwards), up=tuple(camera.up))
-
-# music.set_relative(True)  # sound moves *with* the listener
-# music.set_position((0, 0, 0))  # same place as listener
-
-music = oalOpen(utils.asset("res/sound/Shrek_Remix.wav"))
-# music.set_relative(True)
-music.set_looping(True)
-music.play()
\ No newline at end of file
@@ -0,0 +1,211 @@
+import numpy as np
+
+from game.model_classes.entity import Entity
+
+
+class SpatialHash:
+    """Uniform grid over the world for the collision broadphase.
+
+        Every collider's AABB is filed under each cell it touches, a query only
+        looks at the cells its sphere / box touches and then checks the AABBs
+        of what it found there. Moving an object only touches the cell lists
+        when it crosses into different cells.
+
+        Results come back in the order the colliders were inserted, so the
+        (order dependent) collision response is the same from run to run.
+    """
+    __slots__ = ("cell_size", "cells", "handles", "free", "lower", "upper", "first", "last",
+                 "serials", "next_serial", "queries", "candidates", "hits")
+
+
+    def __init__(self, cell_size: float, capacity: int = 16):
+        self.cell_size = float(cell_size)
+        # cell -> the entities in it, a dict as an insertion ordered set
+        self.cells: dict[tuple[int, int, int], dict[Entity, None]] = {}
+        # entity -> its row in the arrays below, rows of removed ones get reused
+        self.handles: dict[Entity, int] = {}
+        self.free: list[int] = list(range(capacity - 1, -1, -1))
+        # per handle, its AABB and the first / last cells it spans, as arrays
+        # so update_many can tell which ones changed cells in one go
+        self.lower = np.zeros((capacity, 3), dtype=np.float32)
+        self.upper = np.zeros((capacity, 3), dtype=np.float32)
+        self.first = np.zeros((capacity, 3), dtype=np.int64)
+        self.last = np.zeros((capacity, 3), dtype=np.int64)
+        self.serials: dict[Entity, int] = {}
+        self.next_serial = 0
+
+        # since the last reset_stats
+        self.queries = 0
+        self.candidates = 0 # entities pulled out of cells, before the exact test
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self.handles)
+
+    def __contains__(self, entity: Entity) -> bool:
+        return entity in self.handles
+
+    def _grow(self) -> None:
+        capacity = len(self.lower)
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+        for name in ("lower", "upper", "first", "last"):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+
+    def _range(self, handle: int) -> tuple[tuple[int, ...], tuple[int, ...]]:
+        return tuple(self.first[handle].tolist()), tuple(self.last[handle].tolist())
+
+    def _cell_range(self, box_min: np.ndarray, box_max: np.ndarray) -> tuple[tuple[int, ...], tuple[int, ...]]:
+        first = tuple(int(i) for i in np.floor(np.asarray(box_min) / self.cell_size))
+        last = tuple(int(i) for i in np.floor(np.asarray(box_max) / self.cell_size))
+        return first, last
+
+    @staticmethod
+    def _covers(cell_range: tuple[tuple[int, ...], tuple[int, ...]], key: tuple[int, int, int]) -> bool:
+        first, last = cell_range
+        return (first[0] <= key[0] <= last[0] and first[1] <= key[1] <= last[1]
+                and first[2] <= key[2] <= last[2])
+
+    @staticmethod
+    def _keys(first: tuple[int, ...], last: tuple[int, ...]):
+        for x in range(first[0], last[0] + 1):
+            for y in range(first[1], last[1] + 1):
+                for z in range(first[2], last[2] + 1):
+                    yield x, y, z
+
+    ################################   UPDATES   ######################################
+
+    def insert(self, entity: Entity, aabb: tuple[np.ndarray, np.ndarray] | None = None) -> None:
+        """File the entity under the cells its AABB (get_aabb() by default) covers"""
+
+        if entity in self.handles:
+            raise ValueError("entity is already in the spatial hash")
+
+        box_min, box_max = aabb if aabb is not None else entity.get_aabb()
+        cell_range = self._cell_range(box_min, box_max)
+        for key in self._keys(*cell_range):
+            self.cells.setdefault(key, {})[entity] = None
+
+        if not self.free:
+            self._grow()
+        handle = self.free.pop()
+        self.handles[entity] = handle
+        self.lower[handle], self.upper[handle] = box_min, box_max
+        self.first[handle], self.last[handle] = cell_range
+        self.serials[entity] = self.next_serial
+        self.next_serial += 1
+
+    def remove(self, entity: Entity) -> None:
+        handle = self.handles.pop(entity)
+        for key in self._keys(*self._range(handle)):
+            cell = self.cells[key]
+            del cell[entity]
+            if not cell:
+                del self.cells[key]
+        self.free.append(handle)
+        del self.serials[entity]
+
+    def update(self, entity: Entity, aabb: tuple[np.ndarray, np.ndarray] | None = None) -> None:
+        """The entity moved, refile it if it's in different cells now"""
+
+        box_min, box_max = aabb if aabb is not None else entity.get_aabb()
+        handle = self.handles[entity]
+        self.lower[handle], self.upper[handle] = box_min, box_max
+        self._refile(entity, handle, self._cell_range(box_min, box_max))
+
+    def update_many(self, entities: list[Entity], aabb_min: np.ndarray, aabb_max: np.ndarray) -> None:
+        """update() for a batch, with their AABBs stacked (N, 3). The cell
+            ranges are compared for all of them at once, only the ones that
+            are in different cells now touch the cell lists.
+        """
+
+        handles = np.fromiter((self.handles[entity] for entity in entities), dtype=np.int64, count=len(entities))
+        self.lower[handles] = aabb_min
+        self.upper[handles] = aabb_max
+
+        firsts = np.floor(np.asarray(aabb_min) / self.cell_size).astype(np.int64)
+        lasts = np.floor(np.asarray(aabb_max) / self.cell_size).astype(np.int64)
+        changed = np.flatnonzero(
+            np.any(self.first[handles] != firsts, axis=1) | np.any(self.last[handles] != lasts, axis=1))
+        for i, first, last in zip(changed.tolist(), firsts[changed].tolist(), lasts[changed].tolist()):
+            self._refile(entities[i], int(handles[i]), (tuple(first), tuple(last)))
+
+    def _refile(self, entity: Entity, handle: int, new_range: tuple[tuple[int, ...], tuple[int, ...]]) -> None:
+        old_range = self._range(handle)
+        if new_range == old_range:
+            return
+
+        # only the cells it left / came into, usually a row of them on one axis
+        for key in self._keys(*old_range):
+            if not self._covers(new_range, key):
+                cell = self.cells[key]
+                del cell[entity]
+                if not cell:
+                    del self.cells[key]
+        for key in self._keys(*new_range):
+            if not self._covers(old_range, key):
+                self.cells.setdefault(key, {})[entity] = None
+        self.first[handle], self.last[handle] = new_range
+
+    ################################   QUERIES   ######################################
+
+    def _gather(self, box_min: np.ndarray, box_max: np.ndarray) -> dict[Entity, None]:
+        self.queries += 1
+        found: dict[Entity, None] = {}
+        for key in self._keys(*self._cell_range(box_min, box_max)):
+            cell = self.cells.get(key)
+            if cell:
+                found.update(cell)
+        self.candidates += len(found)
+        return found
+
+    def _finish(self, hits: list[Entity]) -> list[Entity]:
+        hits.sort(key=self.serials.__getitem__)
+        self.hits += len(hits)
+        return hits
+
+    def query_box(self, box_min: np.ndarray, box_max: np.ndarray) -> list[Entity]:
+        """Colliders whose AABB overlaps the box"""
+
+        box_min = np.asarray(box_min, dtype=np.float32)
+        box_max = np.asarray(box_max, dtype=np.float32)
+        hits = []
+        for entity in self._gather(box_min, box_max):
+            handle = self.handles[entity]
+            aabb_min, aabb_max = self.lower[handle], self.upper[handle]
+            if np.all(aabb_min <= box_max) and np.all(aabb_max >= box_min):
+                hits.append(entity)
+        return self._finish(hits)
+
+    def query_sphere(self, center: np.ndarray, radius: float) -> list[Entity]:
+        """Colliders whose AABB the sphere touches"""
+
+        center = np.asarray(center, dtype=np.float32)
+        hits = []
+        for entity in self._gather(center - radius, center + radius):
+            handle = self.handles[entity]
+            aabb_min, aabb_max = self.lower[handle], self.upper[handle]
+            # same closest point test as Collision, but <= so it never misses one
+            closest = np.maximum(aabb_min, np.minimum(center, aabb_max))
+            if np.sum((center - closest) ** 2) <= radius ** 2:
+                hits.append(entity)
+        return self._finish(hits)
+
+    ################################   STATS   ######################################
+
+    @property
+    def stats(self) -> dict[str, float]:
+        return {
+            "colliders": len(self.handles),
+            "cells": len(self.cells),
+            "queries": self.queries,
+            "candidates": self.candidates,
+            "hits": self.hits,
+            "candidates_per_query": self.candidates / self.queries if self.queries else 0.0,
+            "hits_per_query": self.hits / self.queries if self.queries else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        self.queries = 0
+        self.candidates = 0
+        self.hits = 0
@@ -0,0 +1,347 @@
+from itertools import chain
+from typing import Callable
+
+import numpy as np
+
+from game.model_classes.entity import Entity
+
+
+ContactCallback = Callable[[Entity, Entity], None]
+
+
+class SweepAndPrune:
+    """Sweep and prune broadphase, keeps every overlapping pair of the things in it.
+
+        Each sorted axis has a list of all the AABBs' min and max endpoints in
+        order. Two boxes overlap on an axis when one's min sits before the
+        other's max and the other way round, so overlapping pairs only start
+        and stop when an endpoint passes another. Things move a little per
+        tick, the lists stay almost sorted, and an insertion sort puts them
+        back with one swap per endpoint passed; the swaps are where pairs
+        begin (after a full overlap test) and end. When nothing moved no axis
+        has an endpoint out of order, which is one numpy compare per axis.
+
+        Only `axes` are sorted, by default the ground plane ones: props sit
+        at about the same height, their endpoints on the up axis are all
+        bunched together and every little move would swap past dozens of
+        them. Pairs overlapping on the sorted axes are candidates, and are
+        pairs when they overlap on the other axes too, which is tested for
+        the candidates of whatever moved. Exactly touching boxes count as
+        apart when they meet and as overlapping until they separate.
+
+        on_begin / on_end are called with the two entities of a pair that
+        started / stopped overlapping, once the whole update is done, so
+        they're free to move things (for the next update to pick up).
+    """
+    __slots__ = ("axes", "others", "on_begin", "on_end", "handles", "entities", "free", "alive", "lower", "upper",
+                 "values", "owners", "is_min", "where", "pairs_by_handle", "partners",
+                 "began", "ended", "updates", "swaps", "begins", "ends")
+
+
+    def __init__(self, axes: tuple[int, ...] = (0, 2),
+                 on_begin: ContactCallback | None = None, on_end: ContactCallback | None = None,
+                 capacity: int = 16):
+        self.axes = tuple(axes)
+        self.others = tuple(axis for axis in range(3) if axis not in self.axes)
+        self.on_begin = on_begin
+        self.on_end = on_end
+
+        self.handles: dict[Entity, int] = {}
+        self.entities: list[Entity | None] = [None] * capacity
+        self.free: list[int] = list(range(capacity - 1, -1, -1))
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.lower = np.zeros((capacity, 3), dtype=np.float64)
+        self.upper = np.zeros((capacity, 3), dtype=np.float64)
+
+        # per sorted axis: endpoint values in order, whose they are, min or max
+        self.values = [np.empty(0, dtype=np.float64) for _ in self.axes]
+        self.owners = [np.empty(0, dtype=np.int64) for _ in self.axes]
+        self.is_min = [np.empty(0, dtype=bool) for _ in self.axes]
+        # handle -> index of its (min, max) endpoint, per sorted axis
+        self.where = np.zeros((capacity, len(self.axes), 2), dtype=np.int64)
+
+        # overlapping (smaller handle, larger handle), and
+        # handle -> its candidates -> whether they're overlapping
+        self.pairs_by_handle: set[tuple[int, int]] = set()
+        self.partners: dict[int, dict[int, bool]] = {}
+        # pairs that changed during the current update
+        self.began: set[tuple[int, int]] = set()
+        self.ended: set[tuple[int, int]] = set()
+
+        # since the last reset_stats
+        self.updates = 0
+        self.swaps = 0
+        self.begins = 0
+        self.ends = 0
+
+    def __len__(self) -> int:
+        return len(self.handles)
+
+    def __contains__(self, entity: Entity) -> bool:
+        return entity in self.handles
+
+    @property
+    def pairs(self) -> set[tuple[Entity, Entity]]:
+        """Every overlapping pair right now"""
+        return {(self.entities[a], self.entities[b]) for a, b in self.pairs_by_handle}
+
+    def overlapping(self, entity: Entity) -> list[Entity]:
+        """What the entity overlaps right now"""
+        handle = self.handles[entity]
+        return [self.entities[other] for other, touching in sorted(self.partners[handle].items()) if touching]
+
+    def _grow(self) -> None:
+        capacity = len(self.entities)
+        self.entities.extend([None] * capacity)
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+        self.alive = np.concatenate([self.alive, np.zeros_like(self.alive)])
+        self.lower = np.concatenate([self.lower, np.zeros_like(self.lower)])
+        self.upper = np.concatenate([self.upper, np.zeros_like(self.upper)])
+        self.where = np.concatenate([self.where, np.zeros_like(self.where)])
+
+    ################################   UPDATES   ######################################
+
+    def insert(self, entity: Entity, aabb: tuple[np.ndarray, np.ndarray] | None = None) -> None:
+        """Add the entity with its AABB (get_aabb() by default), pairs it starts in begin"""
+
+        if entity in self.handles:
+            raise ValueError("entity is already in the sweep and prune")
+
+        if not self.free:
+            self._grow()
+        handle = self.free.pop()
+        box_min, box_max = aabb if aabb is not None else entity.get_aabb()
+        self.entities[handle] = entity
+        self.handles[entity] = handle
+        self.lower[handle] = box_min
+        self.upper[handle] = box_max
+        self.partners[handle] = {}
+
+        for slot, axis in enumerate(self.axes):
+            # a min goes after equal endpoints and a max before them, touching isn't overlapping
+            values = self.values[slot]
+            low = int(np.searchsorted(values, self.lower[handle, axis], side="right"))
+            self._insert_endpoint(slot, low, self.lower[handle, axis], handle, True)
+            high = int(np.searchsorted(self.values[slot], self.upper[handle, axis], side="left"))
+            self._insert_endpoint(slot, max(high, low + 1), self.upper[handle, axis], handle, False)
+
+        # what it lands in on the sorted axes, tested against everything at once
+        axes = list(self.axes)
+        hits = np.flatnonzero(self.alive & np.all(
+            (self.lower[:, axes] < self.upper[handle, axes]) &
+            (self.lower[handle, axes] < self.upper[:, axes]), axis=1))
+        self.alive[handle] = True
+        for other in hits.tolist():
+            self._begin(handle, other)
+        self._notify()
+
+    def _insert_endpoint(self, slot: int, index: int, value: float, handle: int, is_min: bool) -> None:
+        # free handles' rows get shifted too, they're overwritten when reused
+        where = self.where[:, slot]
+        where[where >= index] += 1
+        self.values[slot] = np.insert(self.values[slot], index, value)
+        self.owners[slot] = np.insert(self.owners[slot], index, handle)
+        self.is_min[slot] = np.insert(self.is_min[slot], index, is_min)
+        where[handle, 0 if is_min else 1] = index
+
+    def remove(self, entity: Entity) -> None:
+        """Take the entity out, its pairs end"""
+
+        handle = self.handles[entity]
+        for other in list(self.partners[handle]):
+            self._end(handle, other)
+        self._notify()
+
+        for slot in range(len(self.axes)):
+            keep = self.owners[slot] != handle
+            self.values[slot] = self.values[slot][keep]
+            self.owners[slot] = self.owners[slot][keep]
+            self.is_min[slot] = self.is_min[slot][keep]
+            self._reindex(slot)
+
+        del self.handles[entity]
+        del self.partners[handle]
+        self.alive[handle] = False
+        self.entities[handle] = None
+        self.free.append(handle)
+
+    def update(self, entity: Entity, aabb: tuple[np.ndarray, np.ndarray] | None = None) -> None:
+        """The entity moved"""
+        box_min, box_max = aabb if aabb is not None else entity.get_aabb()
+        self.update_many([entity], np.asarray(box_min)[None], np.asarray(box_max)[None])
+
+    def update_many(self, entities: list[Entity], aabb_min: np.ndarray, aabb_max: np.ndarray) -> None:
+        """A batch moved, with their AABBs stacked (N, 3). All of them are
+            moved first and every axis is sorted once after, so the begin
+            tests see where everything ended up.
+        """
+
+        self.updates += 1
+        if len(entities):
+            handles = np.array([self.handles[entity] for entity in entities], dtype=np.int64)
+            self.lower[handles] = aabb_min
+            self.upper[handles] = aabb_max
+            for slot, axis in enumerate(self.axes):
+                where = self.where[handles, slot]
+                self.values[slot][where[:, 0]] = self.lower[handles, axis]
+                self.values[slot][where[:, 1]] = self.upper[handles, axis]
+
+        for slot in range(len(self.axes)):
+            self._sort(slot)
+        if self.others and len(entities):
+            self._retest(handles)
+        self._notify()
+
+    def _retest(self, handles: np.ndarray) -> None:
+        """The candidates of what moved may have come apart / together on
+            the other axes, tested all at once, only the changes go through
+            _contact
+        """
+
+        moved = handles.tolist()
+        firsts = np.repeat(handles, [len(self.partners[handle]) for handle in moved])
+        if not len(firsts):
+            return
+        seconds = np.fromiter(chain.from_iterable(self.partners[handle] for handle in moved),
+                              dtype=np.int64, count=len(firsts))
+        was = np.fromiter(chain.from_iterable(self.partners[handle].values() for handle in moved),
+                          dtype=bool, count=len(firsts))
+
+        others = list(self.others)
+        touching = np.all(
+            (self.lower[firsts][:, others] < self.upper[seconds][:, others]) &
+            (self.lower[seconds][:, others] < self.upper[firsts][:, others]), axis=1)
+
+        changed = touching != was
+        for a, b in zip(firsts[changed].tolist(), seconds[changed].tolist()):
+            self._contact(a, b)
+
+    def _sort(self, slot: int) -> None:
+        """Insertion sort of an axis' endpoints, only starting at the ones out of order"""
+
+        values = self.values[slot]
+        descents = np.flatnonzero(values[1:] < values[:-1]) + 1
+        if not len(descents):
+            return
+
+        values = values.tolist()
+        owners = self.owners[slot].tolist()
+        is_min = self.is_min[slot].tolist()
+        count = len(values)
+        descents = descents.tolist()
+
+        # sinking the endpoint at i leaves [0, i] sorted, the only new descent
+        # it can make is at i + 1, the ones after that are where they were
+        next_descent = 0
+        i = descents[0]
+        while True:
+            value, owner, kind = values[i], owners[i], is_min[i]
+            j = i
+            while j > 0 and values[j - 1] > value:
+                other, other_kind = owners[j - 1], is_min[j - 1]
+                if kind and not other_kind:
+                    # its min goes below the other's max, they may overlap now
+                    self._begin(owner, other, test=True)
+                elif not kind and other_kind:
+                    # its max goes below the other's min, apart on this axis
+                    self._end(owner, other)
+                values[j], owners[j], is_min[j] = values[j - 1], other, other_kind
+                j -= 1
+            values[j], owners[j], is_min[j] = value, owner, kind
+            self.swaps += i - j
+
+            if i + 1 < count and values[i + 1] < values[i]:
+                i += 1
+                continue
+            while next_descent < len(descents) and descents[next_descent] <= i:
+                next_descent += 1
+            if next_descent == len(descents):
+                break
+            i = descents[next_descent]
+
+        self.values[slot] = np.array(values, dtype=np.float64)
+        self.owners[slot] = np.array(owners, dtype=np.int64)
+        self.is_min[slot] = np.array(is_min, dtype=bool)
+        self._reindex(slot)
+
+    def _reindex(self, slot: int) -> None:
+        self.where[self.owners[slot], slot, np.where(self.is_min[slot], 0, 1)] = np.arange(len(self.owners[slot]))
+
+    ################################   PAIRS   ######################################
+
+    def _overlaps(self, a: int, b: int, axes: tuple[int, ...]) -> bool:
+        lower, upper = self.lower, self.upper
+        return all(lower[a, axis] < upper[b, axis] and lower[b, axis] < upper[a, axis] for axis in axes)
+
+    def _begin(self, a: int, b: int, test: bool = False) -> None:
+        """a and b may overlap on the sorted axes now, a candidate if they do"""
+        if a == b or b in self.partners[a] or (test and not self._overlaps(a, b, self.axes)):
+            return
+        self.partners[a][b] = self.partners[b][a] = False
+        self._contact(a, b)
+
+    def _end(self, a: int, b: int) -> None:
+        """a and b came apart on a sorted axis"""
+        if b not in self.partners[a]:
+            return
+        del self.partners[a][b], self.partners[b][a]
+        self._separate((a, b) if a < b else (b, a))
+
+    def _contact(self, a: int, b: int) -> None:
+        """A candidate's a pair if it overlaps on the other axes as well"""
+        pair = (a, b) if a < b else (b, a)
+        if self.others and not self._overlaps(a, b, self.others):
+            self._separate(pair)
+        elif pair not in self.pairs_by_handle:
+            self.pairs_by_handle.add(pair)
+            self.partners[a][b] = self.partners[b][a] = True
+            if pair in self.ended:
+                self.ended.discard(pair)
+            else:
+                self.began.add(pair)
+
+    def _separate(self, pair: tuple[int, int]) -> None:
+        if pair not in self.pairs_by_handle:
+            return
+        self.pairs_by_handle.discard(pair)
+        a, b = pair
+        if b in self.partners[a]:
+            self.partners[a][b] = self.partners[b][a] = False
+        if pair in self.began:
+            self.began.discard(pair)
+        else:
+            self.ended.add(pair)
+
+    def _notify(self) -> None:
+        began, ended = sorted(self.began), sorted(self.ended)
+        self.began.clear()
+        self.ended.clear()
+        self.begins += len(began)
+        self.ends += len(ended)
+        if self.on_end is not None:
+            for a, b in ended:
+                self.on_end(self.entities[a], self.entities[b])
+        if self.on_begin is not None:
+            for a, b in began:
+                self.on_begin(self.entities[a], self.entities[b])
+
+    ################################   STATS   ######################################
+
+    @property
+    def stats(self) -> dict[str, float]:
+        return {
+            "bodies": len(self.handles),
+            "candidates": sum(len(partners) for partners in self.partners.values()) // 2,
+            "pairs": len(self.pairs_by_handle),
+            "updates": self.updates,
+            "swaps": self.swaps,
+            "begins": self.begins,
+            "ends": self.ends,
+            "swaps_per_update": self.swaps / self.updates if self.updates else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        self.updates = 0
+        self.swaps = 0
+        self.begins = 0
+        self.ends = 0
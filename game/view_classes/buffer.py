@@ -1,44 +1,141 @@
 from OpenGL.GL import *
 from OpenGL.GLU import *
+import ctypes
 import numpy as np
 import pyrr
 
 class Buffer:
-    """Storage buffer, holds arbitrary homogenous data"""
+    """Streaming buffer, holds arbitrary homogenous data that changes every frame.
+
+        The GL buffer is split into a few equally sized regions (triple buffered
+        by default). Each frame the CPU writes the next region straight through a
+        numpy view over mapped memory while the GPU is still reading the older ones,
+        a fence per region stops us writing over data the GPU hasn't used yet.
+
+        Usage, once per frame:
+            data = buffer.begin_frame()      # or record_element(i, element)
+            ...write into data...
+            buffer.read_from()               # bind it for the draw calls
+            ...draw...
+            buffer.end_frame()
+    """
 
     __slots__ = (
-        "size", "binding", "element_count", 
-        "dtype", "host_memory", "device_memory", 
-        "elements_updated")
-    
+        "size", "binding", "element_count", "dtype", "target",
+        "region_count", "region_bytes", "device_memory", "persistent",
+        "mapping", "host_memory", "fences", "region", "elements_updated")
+
+    # glBindBufferRange offsets have to be aligned, 256 covers every driver
+    REGION_ALIGNMENT = 256
 
-    def __init__(self, size: int, binding: int, element_count: int, dtype: np.dtype):
+    def __init__(self, size: int, binding: int, element_count: int, dtype: np.dtype,
+                 target: int = GL_SHADER_STORAGE_BUFFER, regions: int = 3):
         """ Parameters:
                 size: number of entries on the buffer.
                 binding: binding index
                 element_count: number of elements per entry
+                dtype: numpy type of the elements
+                target: what the buffer gets bound as (storage, uniform, array buffer...)
+                regions: how many frames worth of data it holds
         """
 
         self.size = size
         self.binding = binding
         self.element_count = element_count
-        self.dtype = dtype
+        self.dtype = np.dtype(dtype)
+        self.target = target
+        self.region_count = regions
+
+        # persistent mapping needs GL 4.4 / ARB_buffer_storage
+        self.persistent = bool(glBufferStorage)
+
+        self.fences: list = [None] * regions
+        self.region = 0
+        self.elements_updated = 0
+        self.host_memory: np.ndarray | None = None
+
+        self._allocate()
+
+    @property
+    def offset(self) -> int:
+        """Byte offset of the region being written this frame"""
+        return self.region * self.region_bytes
+
+    def _allocate(self) -> None:
+        """Create the GL buffer, with storage for every region"""
 
-        self.host_memory = np.zeros(element_count * size, dtype=dtype)
+        entry_bytes = self.element_count * self.dtype.itemsize
+        alignment = self.REGION_ALIGNMENT
+        self.region_bytes = (self.size * entry_bytes + alignment - 1) // alignment * alignment
+        total_bytes = self.region_bytes * self.region_count
 
         self.device_memory = glGenBuffers(1)
-        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.device_memory)
-        glBufferStorage(
-            GL_SHADER_STORAGE_BUFFER, self.host_memory.nbytes, 
-            self.host_memory, GL_DYNAMIC_STORAGE_BIT)
-        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, binding, self.device_memory)
+        glBindBuffer(self.target, self.device_memory)
+
+        self.mapping = None
+        if self.persistent:
+            # map once and keep it mapped for the life of the buffer, coherent
+            # so writes show up for the GPU without any flushing
+            flags = GL_MAP_WRITE_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_COHERENT_BIT
+            glBufferStorage(self.target, total_bytes, None, flags)
+            self.mapping = self._map(0, total_bytes, flags)
+        else:
+            glBufferData(self.target, total_bytes, None, GL_STREAM_DRAW)
+
+        glBindBuffer(self.target, 0)
+
+    def _map(self, offset: int, nbytes: int, flags: int) -> np.ndarray:
+        """Map a range of the bound buffer, returns a numpy view over it.
+            The memory is write combined, write to it but never read from it.
+        """
+        pointer = glMapBufferRange(self.target, offset, nbytes, flags)
+        address = ctypes.cast(pointer, ctypes.c_void_p).value
+        if not address:
+            raise RuntimeError("glMapBufferRange failed")
+        raw = (ctypes.c_byte * nbytes).from_address(address)
+        return np.frombuffer(raw, dtype=self.dtype)
+
+    def _wait_for_region(self, region: int) -> None:
+        """Block until the GPU is done with the given region"""
+
+        fence = self.fences[region]
+        if fence is None:
+            return
+
+        while glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, 1_000_000) == GL_TIMEOUT_EXPIRED:
+            pass
+        glDeleteSync(fence)
+        self.fences[region] = None
+
+    def begin_frame(self) -> np.ndarray:
+        """Get the region for this frame ready for writing,
+            returns a flat view with room for size * element_count elements.
+        """
+
+        self._wait_for_region(self.region)
+
+        count = self.size * self.element_count
+        if self.persistent:
+            start = self.offset // self.dtype.itemsize
+            self.host_memory = self.mapping[start : start + count]
+        else:
+            # the fence already made sure the GPU is done with this range,
+            # so let the driver skip its own syncing and throw the old contents away
+            glBindBuffer(self.target, self.device_memory)
+            flags = GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_RANGE_BIT | GL_MAP_UNSYNCHRONIZED_BIT
+            self.host_memory = self._map(self.offset, self.region_bytes, flags)[:count]
+
         self.elements_updated = 0
-    
+        return self.host_memory
+
     def record_element(self, i: int, element: np.ndarray) -> None:
         """ Record the given element in position i, if this exceeds the buffer size,
             the buffer is resized.
         """
 
+        if self.host_memory is None:
+            self.begin_frame()
+
         if i >= self.size:
             self.resize()
 
@@ -46,31 +143,60 @@ class Buffer:
         self.host_memory[index : index + self.element_count] = element[:]
 
         self.elements_updated += 1
-    
+
     def resize(self) -> None:
-        """Resize the buffer, uses doubling strategy"""
+        """Resize the buffer, uses doubling strategy.
+            Whatever was written this frame is carried over.
+        """
 
-        self.destroy()
-        new_size = self.size * 2
+        written = np.array(self.host_memory) if self.host_memory is not None else None
+        elements_updated = self.elements_updated
 
-        host_memory = np.zeros(self.element_count * new_size, dtype=self.dtype)
-        host_memory[0:self.element_count * self.size] = self.host_memory[:]
-        self.host_memory = host_memory
-        self.size = new_size
+        # the old buffer may still be in use, let all of it finish first
+        glFinish()
+        self.destroy()
+        self.size *= 2
+        self.region = 0
+        self._allocate()
 
-        self.device_memory = glGenBuffers(1)
-        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.device_memory)
-        glBufferStorage(
-            GL_SHADER_STORAGE_BUFFER, self.host_memory.nbytes, 
-            self.host_memory, GL_DYNAMIC_STORAGE_BIT)
+        self.begin_frame()
+        if written is not None:
+            self.host_memory[:written.size] = written
+        self.elements_updated = elements_updated
 
     def read_from(self) -> None:
-        """Upload the CPU data to the buffer, then arm it for reading"""
+        """Finish writing this frame's region, then arm it for reading"""
+
+        if self.host_memory is None:
+            self.begin_frame()
+
+        glBindBuffer(self.target, self.device_memory)
+        if not self.persistent:
+            glUnmapBuffer(self.target)
+        self.host_memory = None
+
+        if self.target in (GL_SHADER_STORAGE_BUFFER, GL_UNIFORM_BUFFER):
+            glBindBufferRange(
+                self.target, self.binding, self.device_memory,
+                self.offset, self.region_bytes)
+
+    def end_frame(self) -> None:
+        """Call after the draw calls reading this region have been issued"""
+
+        self.fences[self.region] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self.region = (self.region + 1) % self.region_count
 
-        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.device_memory)
-        glBufferSubData(GL_SHADER_STORAGE_BUFFER, 0, self.element_count * 4 * self.elements_updated, self.host_memory)
-        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, self.binding, self.device_memory)
-        self.elements_updated = 0
-    
     def destroy(self) -> None:
-        glDeleteBuffers(1, (self.device_memory,))
\ No newline at end of file
+        for region in range(self.region_count):
+            if self.fences[region] is not None:
+                glDeleteSync(self.fences[region])
+                self.fences[region] = None
+
+        if self.mapping is not None or self.host_memory is not None:
+            glBindBuffer(self.target, self.device_memory)
+            glUnmapBuffer(self.target)
+            glBindBuffer(self.target, 0)
+        self.mapping = None
+        self.host_memory = None
+
+        glDeleteBuffers(1, (self.device_memory,))
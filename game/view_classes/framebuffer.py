@@ -0,0 +1,138 @@
+from OpenGL.GL import *
+from OpenGL.GLU import *
+
+
+class Framebuffer:
+    """An offscreen render target, a colour texture with a depth renderbuffer.
+        With samples > 0 the colour goes into a multisampled renderbuffer
+        instead, and has to be resolved (blit_to) before anything can read it.
+    """
+    __slots__ = ("fbo", "color_texture", "color_buffer", "depth_buffer", "samples", "width", "height")
+
+
+    def __init__(self, width: int, height: int, samples: int = 0):
+
+        self.samples = samples
+        self.fbo = glGenFramebuffers(1)
+        if samples > 0:
+            self.color_texture = None
+            self.color_buffer = glGenRenderbuffers(1)
+        else:
+            self.color_texture = glGenTextures(1)
+            self.color_buffer = None
+        self.depth_buffer = glGenRenderbuffers(1)
+
+        self.width = 0
+        self.height = 0
+        self.resize(width, height)
+
+    def resize(self, width: int, height: int) -> None:
+        """(Re)allocate the attachments, does nothing if the size is the same"""
+
+        width, height = max(1, int(width)), max(1, int(height))
+        if (width, height) == (self.width, self.height):
+            return
+        self.width, self.height = width, height
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+
+        if self.samples > 0:
+            glBindRenderbuffer(GL_RENDERBUFFER, self.color_buffer)
+            glRenderbufferStorageMultisample(GL_RENDERBUFFER, self.samples, GL_RGBA8, width, height)
+            glFramebufferRenderbuffer(
+                GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color_buffer)
+        else:
+            glBindTexture(GL_TEXTURE_2D, self.color_texture)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+            glBindTexture(GL_TEXTURE_2D, 0)
+            glFramebufferTexture2D(
+                GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.color_texture, 0)
+
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth_buffer)
+        if self.samples > 0:
+            glRenderbufferStorageMultisample(
+                GL_RENDERBUFFER, self.samples, GL_DEPTH24_STENCIL8, width, height)
+        else:
+            glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH24_STENCIL8, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        glFramebufferRenderbuffer(
+            GL_FRAMEBUFFER, GL_DEPTH_STENCIL_ATTACHMENT, GL_RENDERBUFFER, self.depth_buffer)
+
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(
+                f"Framebuffer {width}x{height} ({self.samples} samples) is incomplete: {status:#x}")
+
+    def bind(self) -> None:
+        """Render into this target from now on"""
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, self.width, self.height)
+
+    def blit_to(self, target_fbo: int, width: int, height: int, filter: int = GL_LINEAR) -> None:
+        """Copy (and stretch) the colour attachment into another framebuffer.
+            A multisampled target can only be resolved into one of the same size.
+        """
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, target_fbo)
+        glBlitFramebuffer(
+            0, 0, self.width, self.height,
+            0, 0, width, height,
+            GL_COLOR_BUFFER_BIT, filter)
+        glBindFramebuffer(GL_FRAMEBUFFER, target_fbo)
+
+    def destroy(self) -> None:
+        """Free any allocated memory"""
+        glDeleteFramebuffers(1, (self.fbo,))
+        if self.color_texture is not None:
+            glDeleteTextures(1, (self.color_texture,))
+        if self.color_buffer is not None:
+            glDeleteRenderbuffers(1, (self.color_buffer,))
+        glDeleteRenderbuffers(1, (self.depth_buffer,))
+
+
+class ScreenPass:
+    """Runs a fragment shader over the whole screen, reading from one texture"""
+    __slots__ = ("shader", "vao", "uniforms")
+
+
+    def __init__(self, shader: int):
+        self.shader = shader
+
+        # the vertex shader makes the triangle up from gl_VertexID,
+        # core profile still wants some vao bound though
+        self.vao = glGenVertexArrays(1)
+
+        glUseProgram(shader)
+        glUniform1i(glGetUniformLocation(shader, "screenTexture"), 0)
+        self.uniforms: dict[str, int] = {}
+
+    def _location(self, name: str) -> int:
+        if name not in self.uniforms:
+            self.uniforms[name] = glGetUniformLocation(self.shader, name)
+        return self.uniforms[name]
+
+    def draw(self, texture: int, source_size: tuple[int, int], **floats: float) -> None:
+        """Draw the texture over the currently bound framebuffer,
+            extra keyword arguments are sent over as float uniforms.
+        """
+        glUseProgram(self.shader)
+        glUniform2f(self._location("uTexelSize"), 1.0 / source_size[0], 1.0 / source_size[1])
+        for name, value in floats.items():
+            glUniform1f(self._location(name), value)
+
+        glDisable(GL_DEPTH_TEST)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, texture)
+        glBindVertexArray(self.vao)
+        glDrawArrays(GL_TRIANGLES, 0, 3)
+        glBindVertexArray(0)
+        glEnable(GL_DEPTH_TEST)
+
+    def destroy(self) -> None:
+        glDeleteVertexArrays(1, (self.vao,))
+        glDeleteProgram(self.shader)
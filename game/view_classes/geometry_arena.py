@@ -0,0 +1,230 @@
+from OpenGL.GL import *
+from OpenGL.GLU import *
+
+import ctypes
+import numpy as np
+
+
+class MeshRange:
+    """Where a mesh lives inside a GeometryArena"""
+    __slots__ = ("first_vertex", "vertex_count", "first_index", "index_count")
+
+
+    def __init__(self, first_vertex: int, vertex_count: int,
+                 first_index: int = 0, index_count: int = 0):
+        self.first_vertex = first_vertex
+        self.vertex_count = vertex_count
+        # index_count 0 means the mesh is drawn without indices
+        self.first_index = first_index
+        self.index_count = index_count
+
+
+class _FreeList:
+    """First fit sub-allocator over a range of slots, hands out (start, count)"""
+    __slots__ = ("capacity", "blocks")
+
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        # sorted list of free (start, count)
+        self.blocks: list[tuple[int, int]] = [(0, capacity)]
+
+    def allocate(self, count: int) -> int | None:
+        for i, (start, size) in enumerate(self.blocks):
+            if size < count:
+                continue
+            if size == count:
+                del self.blocks[i]
+            else:
+                self.blocks[i] = (start + count, size - count)
+            return start
+        return None
+
+    def free(self, start: int, count: int) -> None:
+        self.blocks.append((start, count))
+        self.blocks.sort()
+
+        # merge neighbours back together
+        merged = [self.blocks[0]]
+        for block_start, block_count in self.blocks[1:]:
+            last_start, last_count = merged[-1]
+            if last_start + last_count == block_start:
+                merged[-1] = (last_start, last_count + block_count)
+            else:
+                merged.append((block_start, block_count))
+        self.blocks = merged
+
+    def grow(self, new_capacity: int) -> None:
+        self.free(self.capacity, new_capacity - self.capacity)
+        self.capacity = new_capacity
+
+
+class GeometryArena:
+    """One big VBO/EBO pair that static meshes are sub-allocated from.
+        Everything shares the usual vertex layout
+        (x, y, z, s, t, nx, ny, nz -> 8 floats, 32 bytes), so a single VAO
+        covers all of it and many meshes can go out in one multi-draw call.
+    """
+    __slots__ = ("vao", "vbo", "ebo", "vertices", "indices")
+
+    FLOATS_PER_VERTEX = 8
+    VERTEX_BYTES = 32
+    INDEX_BYTES = 4
+
+
+    def __init__(self, vertex_capacity: int = 1 << 16, index_capacity: int = 1 << 16):
+        """ Parameters:
+                vertex_capacity: how many vertices fit before the arena has to grow
+                index_capacity: same for indices
+        """
+
+        self.vertices = _FreeList(vertex_capacity)
+        self.indices = _FreeList(index_capacity)
+
+        self.vao = glGenVertexArrays(1)
+        self.vbo = self._create_buffer(GL_ARRAY_BUFFER, vertex_capacity * self.VERTEX_BYTES)
+        self.ebo = self._create_buffer(GL_ELEMENT_ARRAY_BUFFER, index_capacity * self.INDEX_BYTES)
+        self._set_up_vertex_array()
+
+    def _create_buffer(self, target: int, nbytes: int) -> int:
+        # don't disturb whatever vao is bound, the ebo binding lives in it
+        glBindVertexArray(0)
+        buffer = glGenBuffers(1)
+        glBindBuffer(target, buffer)
+        glBufferData(target, nbytes, None, GL_STATIC_DRAW)
+        glBindBuffer(target, 0)
+        return buffer
+
+    def _set_up_vertex_array(self) -> None:
+        glBindVertexArray(self.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+
+        #position
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(0))
+        #texture / uv's
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(12))
+        #normal
+        glEnableVertexAttribArray(2)
+        glVertexAttribPointer(2, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(20))
+
+        # the element buffer binding is part of the vao state
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def _grow(self, buffer: int, target: int, old_bytes: int, new_bytes: int) -> int:
+        """Move the contents over to a bigger buffer, returns the new one"""
+
+        # the ebo binding lives in the vao, keep whichever is bound out of it
+        glBindVertexArray(0)
+        new_buffer = self._create_buffer(target, new_bytes)
+        glBindBuffer(GL_COPY_READ_BUFFER, buffer)
+        glBindBuffer(GL_COPY_WRITE_BUFFER, new_buffer)
+        glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, 0, 0, old_bytes)
+        glBindBuffer(GL_COPY_READ_BUFFER, 0)
+        glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+        glDeleteBuffers(1, (buffer,))
+        return new_buffer
+
+    def _reserve(self, free_list: _FreeList, count: int, is_vertices: bool) -> int:
+        """Find room for count slots, doubling the buffer until it fits"""
+
+        start = free_list.allocate(count)
+        while start is None:
+            old_capacity = free_list.capacity
+            new_capacity = max(old_capacity * 2, old_capacity + count)
+            if is_vertices:
+                self.vbo = self._grow(
+                    self.vbo, GL_ARRAY_BUFFER,
+                    old_capacity * self.VERTEX_BYTES, new_capacity * self.VERTEX_BYTES)
+            else:
+                self.ebo = self._grow(
+                    self.ebo, GL_ELEMENT_ARRAY_BUFFER,
+                    old_capacity * self.INDEX_BYTES, new_capacity * self.INDEX_BYTES)
+            self._set_up_vertex_array()
+            free_list.grow(new_capacity)
+            start = free_list.allocate(count)
+        return start
+
+    def allocate(self, vertices: np.ndarray, indices: np.ndarray | None = None) -> MeshRange:
+        """Upload a mesh into the arena.
+            Parameters:
+                vertices: flat float32 array, 8 floats per vertex
+                indices: optional, relative to the mesh's own first vertex
+            Returns:
+                the range the mesh ended up in
+        """
+
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        vertex_count = vertices.size // self.FLOATS_PER_VERTEX
+        first_vertex = self._reserve(self.vertices, vertex_count, True)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferSubData(GL_ARRAY_BUFFER, first_vertex * self.VERTEX_BYTES, vertices.nbytes, vertices)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        mesh_range = MeshRange(first_vertex, vertex_count)
+
+        if indices is not None:
+            indices = np.ascontiguousarray(indices, dtype=np.uint32)
+            first_index = self._reserve(self.indices, indices.size, False)
+
+            # don't disturb whatever vao is bound, the ebo binding lives in it
+            glBindVertexArray(0)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+            glBufferSubData(GL_ELEMENT_ARRAY_BUFFER, first_index * self.INDEX_BYTES, indices.nbytes, indices)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+            mesh_range.first_index = first_index
+            mesh_range.index_count = indices.size
+
+        return mesh_range
+
+    def free(self, mesh_range: MeshRange) -> None:
+        """Hand a range back so it can be reused"""
+        self.vertices.free(mesh_range.first_vertex, mesh_range.vertex_count)
+        if mesh_range.index_count:
+            self.indices.free(mesh_range.first_index, mesh_range.index_count)
+
+    def arm_for_drawing(self) -> None:
+        glBindVertexArray(self.vao)
+
+    def draw(self, mesh_range: MeshRange) -> None:
+        """Draw a single mesh, the arena has to be armed"""
+
+        if mesh_range.index_count:
+            glDrawElementsBaseVertex(
+                GL_TRIANGLES, mesh_range.index_count, GL_UNSIGNED_INT,
+                ctypes.c_void_p(mesh_range.first_index * self.INDEX_BYTES),
+                mesh_range.first_vertex)
+        else:
+            glDrawArrays(GL_TRIANGLES, mesh_range.first_vertex, mesh_range.vertex_count)
+
+    def draw_many(self, mesh_ranges: list[MeshRange]) -> None:
+        """Draw a bunch of meshes with (at most) two multi-draw calls,
+            they all get the same uniforms and textures.
+        """
+
+        arrays = [r for r in mesh_ranges if not r.index_count]
+        if arrays:
+            firsts = np.array([r.first_vertex for r in arrays], dtype=np.int32)
+            counts = np.array([r.vertex_count for r in arrays], dtype=np.int32)
+            glMultiDrawArrays(GL_TRIANGLES, firsts, counts, len(arrays))
+
+        elements = [r for r in mesh_ranges if r.index_count]
+        if elements:
+            counts = np.array([r.index_count for r in elements], dtype=np.int32)
+            offsets = (ctypes.c_void_p * len(elements))(
+                *[r.first_index * self.INDEX_BYTES for r in elements])
+            base_vertices = np.array([r.first_vertex for r in elements], dtype=np.int32)
+            glMultiDrawElementsBaseVertex(
+                GL_TRIANGLES, counts, GL_UNSIGNED_INT, offsets, len(elements), base_vertices)
+
+    def destroy(self) -> None:
+        """Free any allocated memory"""
+        glDeleteVertexArrays(1, (self.vao,))
+        glDeleteBuffers(1, (self.vbo,))
+        glDeleteBuffers(1, (self.ebo,))
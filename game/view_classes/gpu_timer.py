@@ -0,0 +1,51 @@
+from OpenGL.GL import *
+from OpenGL.GLU import *
+
+import ctypes
+import numpy as np
+
+
+class GpuTimer:
+    """Measures GPU time with GL_TIME_ELAPSED queries.
+        Keeps a small ring of queries so a result is only read back
+        a few frames after it was issued, and reading never stalls.
+    """
+    __slots__ = ("queries", "pending", "index", "last_time", "_result")
+
+
+    def __init__(self, depth: int = 3):
+        self.queries = glGenQueries(depth)
+        self.pending = [False] * depth
+        self.index = 0
+
+        # seconds of GPU time the most recently finished query took
+        self.last_time = 0.0
+        # PyOpenGL has no array type for 64 bit unsigned results, read into a plain ctypes one
+        self._result = ctypes.c_uint64()
+
+    def begin(self) -> None:
+        if self.pending[self.index]:
+            # wrapped around to a query that's still out, this waits for it
+            self._read(self.index)
+        glBeginQuery(GL_TIME_ELAPSED, self.queries[self.index])
+
+    def end(self) -> None:
+        glEndQuery(GL_TIME_ELAPSED)
+        self.pending[self.index] = True
+        self.index = (self.index + 1) % len(self.queries)
+
+        # pick up the oldest result if the GPU got to it already
+        oldest = self.index
+        if self.pending[oldest]:
+            available = np.zeros(1, dtype=np.int32)
+            glGetQueryObjectiv(self.queries[oldest], GL_QUERY_RESULT_AVAILABLE, available)
+            if available[0]:
+                self._read(oldest)
+
+    def _read(self, index: int) -> None:
+        glGetQueryObjectui64v(self.queries[index], GL_QUERY_RESULT, ctypes.byref(self._result))
+        self.last_time = float(self._result.value) * 1e-9
+        self.pending[index] = False
+
+    def destroy(self) -> None:
+        glDeleteQueries(len(self.queries), self.queries)
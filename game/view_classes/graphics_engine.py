@@ -18,6 +18,12 @@ from game.scene import Scene
 from OpenGL.GL.shaders import compileProgram,compileShader
 
 from game.view_classes.skybox import Skybox
+from game.view_classes.geometry_arena import GeometryArena
+from game.view_classes.framebuffer import Framebuffer, ScreenPass
+from game.view_classes.gpu_timer import GpuTimer
+from game.view_classes.resolution_scaler import ResolutionScaler
+from game.render_snapshot import RenderSnapshot
+from game.profiler import profiler
 
 #####
 from game.model_classes.plane import Plane
@@ -45,8 +51,21 @@ def create_shader(vertex_filepath: str, fragment_filepath: str) -> int:
 
 class GraphicsEngine:
 
-    def __init__(self, scene: Scene):
+    def __init__(self, scene: Scene, frame_budget: float = 1.0 / GLOBAL.FPS,
+                 output_size: tuple[int, int] | None = None):
+        """ Parameters:
+                scene: the scene to draw
+                frame_budget: seconds a frame may take, dynamic resolution aims for this
+                output_size: (width, height) to render into an FBO of that size
+                    instead of the window, for offscreen contexts (see offscreen.py)
+        """
         self.scene = scene
+        self.width, self.height = output_size or (GLOBAL.WIDTH, GLOBAL.HEIGHT)
+
+        # where finished frames end up, None is the window's back buffer
+        self.output: Framebuffer | None = None
+        if output_size is not None:
+            self.output = Framebuffer(*output_size)
         
         ### initiate OpenGL
 
@@ -56,10 +75,11 @@ class GraphicsEngine:
         glEnable(GL_DEPTH_TEST)
         # glEnable(GL_CULL_FACE)
         # glCullFace(GL_BACK)
-        glEnable(GL_BLEND) # enable alpha transperancy 
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA) # enable alpha transperancy 
+        # alpha transperancy, only switched on for the transparent pass
+        glDisable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
-        # antialiasing - not pixelated
+        # antialiasing - not pixelated, only does something on multisampled targets
         glEnable(GL_MULTISAMPLE)
 
         self._create_assets()
@@ -79,44 +99,57 @@ class GraphicsEngine:
         self.current_fov = 45.0
         self.projection_transform = pyrr.matrix44.create_perspective_projection(
             fovy = self.current_fov,
-            aspect = GLOBAL.WIDTH/GLOBAL.HEIGHT,
+            aspect = self.width/self.height,
             near = 0.1, 
             far = 1000, 
             dtype=np.float32
         )
-        # then send that over to the shader
-        glUniformMatrix4fv(
-            glGetUniformLocation(self.shader,"projection"),
-            1, GL_FALSE, self.projection_transform
-        )
+        # then send that over to the shaders
+        for shader in (self.shader_light, self.shader_normals, self.shader_depth):
+            glUseProgram(shader)
+            glUniformMatrix4fv(
+                glGetUniformLocation(shader,"projection"),
+                1, GL_FALSE, self.projection_transform
+            )
+        glUseProgram(self.shader)
         
         
         self._get_uniform_locations()
+        self._set_up_render_target(frame_budget)
+
+        # counters for the last frame, see benchmarks/scaling.py
+        self.stats = {"draw_calls": 0, "triangles": 0}
     
     def _create_assets(self) -> None:
 
+        # every static mesh shares one big vertex buffer, so there's a single vao to bind
+        self.geometry: GeometryArena | None = GeometryArena() if GLOBAL.GEOMETRY_ARENA else None
+        arena = self.geometry
+
         # this is a dict containing all the obj meshes, (each one has its own folder plz)
         self.objects: dict[int, CoolObjMesh] = {
             GLOBAL.ENTITY_TYPE["MAXWELL"]: CoolObjMesh(
                 utils.asset("res/3D_models/maxwell/maxwell.54d410c0.obj"), 
                 utils.asset("res/3D_models/maxwell/maxwell.54d410c0.mtl"),
+                arena = arena,
                 ),
             GLOBAL.ENTITY_TYPE["AIRPLANE"]: CoolObjMesh(
                 utils.asset("res/3D_models/airplane/11805_airplane_v2_L2.obj"), 
                 utils.asset("res/3D_models/airplane/11805_airplane_v2_L2.mtl"),
+                arena = arena,
                 ),
         }
 
         # meshes that dont use objs
         self.meshes: dict[int, Mesh] = {
-            # GLOBAL.ENTITY_TYPE["GROUND"]: GroundMesh(w = GLOBAL.GROUND_W, h = GLOBAL.GROUND_H),
-            GLOBAL.ENTITY_TYPE["3D_WALL"]: CubeMesh(w= GLOBAL.GROUND_W / GLOBAL.GRID_SIZE, h= GLOBAL.WALL_D, d= GLOBAL.WALL_H),
-            GLOBAL.ENTITY_TYPE["POINTLIGHT"]: CubeMesh(w= 0.2, d= 0.2, h= 0.2),
-            GLOBAL.ENTITY_TYPE["MAXLIGHT"]: CubeMesh(w= 0.2, d= 0.2, h= 0.2),
+            # GLOBAL.ENTITY_TYPE["GROUND"]: GroundMesh(w = GLOBAL.GROUND_W, h = GLOBAL.GROUND_H, arena = arena),
+            GLOBAL.ENTITY_TYPE["3D_WALL"]: CubeMesh(w= GLOBAL.GROUND_W / GLOBAL.GRID_SIZE, h= GLOBAL.WALL_D, d= GLOBAL.WALL_H, arena= arena),
+            GLOBAL.ENTITY_TYPE["POINTLIGHT"]: CubeMesh(w= 0.2, d= 0.2, h= 0.2, arena= arena),
+            GLOBAL.ENTITY_TYPE["MAXLIGHT"]: CubeMesh(w= 0.2, d= 0.2, h= 0.2, arena= arena),
         }
 
         if GLOBAL.ENTITY_TYPE.get("BILLBOARD") is not None:
-            self.meshes[GLOBAL.ENTITY_TYPE["BILLBOARD"]] = RectMesh(w=4.60, h=2.13)
+            self.meshes[GLOBAL.ENTITY_TYPE["BILLBOARD"]] = RectMesh(w=4.60, h=2.13, arena=arena)
 
         # non obj meshes need to be bound to textures
         self.materials: dict[int, Material] = {
@@ -136,6 +169,7 @@ class GraphicsEngine:
 
         self.shader_light = create_shader(utils.asset("res/shaders/vertex.vert"), utils.asset("res/shaders/fragment.frag"))
         self.shader_normals = create_shader(utils.asset("res/shaders/vertex.vert"), utils.asset("res/shaders/normal_frag.frag"))
+        self.shader_depth = create_shader(utils.asset("res/shaders/vertex.vert"), utils.asset("res/shaders/depth.frag"))
         
         # Skybox
         self.skybox_shader = create_shader(utils.asset("res/shaders/skybox.vert"), utils.asset("res/shaders/skybox.frag"))
@@ -143,10 +177,87 @@ class GraphicsEngine:
         self.skybox = Skybox(
             self.skybox_shader,
             utils.asset("res/images/cubemap_sky_night.png"),
-            utils.asset("res/images/cubemap_sky_day.png")
+            utils.asset("res/images/cubemap_sky_day.png"),
+            arena = arena,
         )
+
+        # (draw calls, triangles) it takes to draw one entity of each type
+        self.draw_costs: dict[int, tuple[int, int]] = {}
+        for entity_type, obj in self.objects.items():
+            triangles = sum(submesh["vertex_count"] for submesh in obj.submeshes) // 3
+            calls = len(obj.draw_groups) if obj.arena is not None else len(obj.submeshes)
+            self.draw_costs[entity_type] = (calls, triangles)
+        for entity_type, mesh in self.meshes.items():
+            self.draw_costs[entity_type] = (1, mesh.vertex_count // 3)
         
 
+    def _set_up_render_target(self, frame_budget: float) -> None:
+        """Offscreen targets, used for dynamic resolution and anti-aliasing"""
+
+        self.gpu_timer = GpuTimer()
+        self.resolution_scaler: ResolutionScaler | None = None
+        if GLOBAL.DYNAMIC_RES:
+            self.resolution_scaler = ResolutionScaler(
+                target_frame_time = frame_budget,
+                min_scale = GLOBAL.DYNAMIC_RES_MIN,
+                max_scale = GLOBAL.DYNAMIC_RES_MAX,
+            )
+
+        self.scene_target: Framebuffer | None = None
+        self.resolve_target: Framebuffer | None = None
+        self.final_pass: ScreenPass | None = None
+        self.set_anti_aliasing(GLOBAL.AA_MODE, GLOBAL.MSAA_SAMPLES)
+
+    def set_anti_aliasing(self, mode: str, samples: int = 4) -> None:
+        """Rebuild the offscreen targets for the given anti-aliasing mode.
+            mode:
+                "none": no anti-aliasing
+                "msaa": draw into a multisampled target with the given sample count,
+                        resolved before it hits the window
+                "fxaa": one full-screen FXAA pass over the finished image
+        """
+        if mode not in ("none", "msaa", "fxaa"):
+            raise ValueError(f"Unknown anti-aliasing mode: {mode}")
+
+        self._destroy_render_targets()
+        self.aa_mode = mode
+
+        if mode == "none" and self.resolution_scaler is None:
+            # nothing to do offscreen, draw straight into the window (or output)
+            return
+
+        scale = self.render_scale
+        width, height = self.width * scale, self.height * scale
+
+        if mode == "msaa":
+            self.scene_target = Framebuffer(width, height, samples=samples)
+            self.resolve_target = Framebuffer(width, height)
+        else:
+            self.scene_target = Framebuffer(width, height)
+
+        # fxaa also takes care of the upscale, it samples with bilinear filtering
+        if mode == "fxaa":
+            self.final_pass = ScreenPass(
+                create_shader(utils.asset("res/shaders/screen.vert"), utils.asset("res/shaders/fxaa.frag")))
+        elif self.resolution_scaler is not None and GLOBAL.UPSCALE_FILTER == "sharpen":
+            self.final_pass = ScreenPass(
+                create_shader(utils.asset("res/shaders/screen.vert"), utils.asset("res/shaders/sharpen.frag")))
+
+    def _destroy_render_targets(self) -> None:
+        for target in (self.scene_target, self.resolve_target, self.final_pass):
+            if target is not None:
+                target.destroy()
+        self.scene_target = None
+        self.resolve_target = None
+        self.final_pass = None
+
+    @property
+    def render_scale(self) -> float:
+        """Current resolution scale, 1.0 when rendering straight to the window"""
+        if self.resolution_scaler is None:
+            return 1.0
+        return self.resolution_scaler.render_scale
+
     def _get_uniform_locations(self) -> None:
         """Query and store the locations of shader uniforms"""
 
@@ -164,6 +275,12 @@ class GraphicsEngine:
                 self.shader, "uIsBillboard"
             ),
         }
+        self.tex_repeat_location = glGetUniformLocation(self.shader, "uTexRepeat")
+
+        self.depth_locations: dict[int, int] = {
+            GLOBAL.UNIFORM_TYPE["MODEL"]: glGetUniformLocation(self.shader_depth, "model"),
+            GLOBAL.UNIFORM_TYPE["VIEW"]: glGetUniformLocation(self.shader_depth, "view"),
+        }
 
         self.light_locations: dict[int, list[int]] = {
             GLOBAL.UNIFORM_TYPE["LIGHT_COLOR"]: [
@@ -182,11 +299,38 @@ class GraphicsEngine:
 
 
 
-    def render(self, camera: Camera, renderables: dict[int, list[Entity]]) -> None:
+    def render(self, camera: Camera, renderables: dict[int, list[Entity]], alpha: float = 1.0) -> None:
+        """Draw a frame straight from the scene.
+            alpha: how far (0-1) between the previous and the latest simulation
+                tick to draw the entities
+        """
+        self.render_snapshot(
+            RenderSnapshot.capture(camera, renderables, alpha, self.scene.sky_mix))
+
+    def render_snapshot(self, snapshot: RenderSnapshot) -> None:
+        """Draw a frame from a snapshot, doesn't touch the scene at all"""
+
+        frame_start = time.perf_counter()
+        self.gpu_timer.begin()
+        self.stats["draw_calls"] = 0
+        self.stats["triangles"] = 0
+
+        if self.scene_target is not None:
+            self.scene_target.bind()
+        elif self.output is not None:
+            self.output.bind()
 
         #refresh screen
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
+        view_transform = snapshot.view
+        with profiler.scope("render/collect"):
+            opaque, transparent = self._collect_draw_items(snapshot)
+
+        if GLOBAL.DEPTH_PREPASS:
+            with profiler.scope("render/depth_prepass", gpu=True):
+                self._depth_prepass(snapshot, opaque)
+
         if GLOBAL.DEBUG_NORMAL:
             glUseProgram(self.shader_normals)
             self.shader = self.shader_normals
@@ -195,7 +339,7 @@ class GraphicsEngine:
             self.shader = self.shader_light
 
         # skybox gradient + ambient light
-        sky_mix = (np.sin(time.time() * 0.2) * 0.5) + 0.5
+        sky_mix = snapshot.sky_mix
 
         ambient_strength = 0.2 + (0.45 * sky_mix)
         ambient_location = self.uniform_locations.get(
@@ -208,127 +352,288 @@ class GraphicsEngine:
         # set camera uniforms
         glUniformMatrix4fv(
             self.uniform_locations[GLOBAL.UNIFORM_TYPE["VIEW"]], 
-            1, GL_FALSE, camera.get_view_transform()
+            1, GL_FALSE, view_transform
         )
         glUniform3fv(
             self.uniform_locations[GLOBAL.UNIFORM_TYPE["CAMERA_POS"]],
-            1, camera.position
+            1, snapshot.camera_position
         )
 
-        billboard_flag = self.uniform_locations.get(
-            GLOBAL.UNIFORM_TYPE["IS_BILLBOARD"], -1
-        )
+        self._upload_lights(snapshot)
 
-        if billboard_flag != -1:
-            glUniform1i(billboard_flag, 0)
- 
+        ######### opaque pass, front to back so early-z throws away hidden fragments
+        if GLOBAL.DEPTH_PREPASS:
+            # depth is already there, only shade what made it through
+            glDepthFunc(GL_LEQUAL)
+            glDepthMask(GL_FALSE)
 
-        # draw all the entities
-        for entity_type, entities in renderables.items():
-            if entity_type not in self.meshes:
-                continue
+        with profiler.scope("render/opaque", gpu=True):
+            self._draw_items(snapshot, opaque)
 
-            mesh = self.meshes[entity_type]
-            material = self.materials[entity_type]
-            mesh.arm_for_drawing()
-            # material.use() # bind material and texture
+        if GLOBAL.DEPTH_PREPASS:
+            glDepthFunc(GL_LESS)
+            glDepthMask(GL_TRUE)
 
-            # set texture repeat for this material type
-            tex_repeat_loc = glGetUniformLocation(self.shader, "uTexRepeat")
-            if isinstance(material, RepeatingMaterial):
-                glUniform2f(tex_repeat_loc, *material.texture_repeat)
+        # skybox after the opaque pass so it only fills what's still at the far
+        # plane, and before the transparent one, which doesn't write depth
+        glDepthMask(GL_FALSE)
+        view = view_transform.copy()
+        view[:3, 3] = 0.0
+        view[3, :3] = 0.0
+        view[3, 3] = 1.0
+
+        self.skybox.mix_value = sky_mix
+
+        self.skybox.draw(view, self.projection_transform)
+        self._count_draws(1, self.skybox.vertex_count // 3)
+        glDepthMask(GL_TRUE)
+
+        ######### transparent pass, back to front with blending
+        if transparent:
+            glUseProgram(self.shader) # the skybox left its own bound
+            glEnable(GL_BLEND)
+            glDepthMask(GL_FALSE)
+            with profiler.scope("render/transparent", gpu=True):
+                self._draw_items(snapshot, transparent)
+            glDepthMask(GL_TRUE)
+            glDisable(GL_BLEND)
+
+        if self.scene_target is not None:
+            with profiler.scope("render/upscale", gpu=True):
+                self._upscale()
+
+        self.gpu_timer.end()
+
+        if self.resolution_scaler is not None:
+            # gpu time lags a couple frames behind, take whichever side is slower
+            cpu_time = time.perf_counter() - frame_start
+            scale = self.resolution_scaler.update(max(cpu_time, self.gpu_timer.last_time))
+            for target in (self.scene_target, self.resolve_target):
+                if target is not None:
+                    target.resize(self.width * scale, self.height * scale)
+
+    def _upscale(self) -> None:
+        """Resolve the scene target and put it on the window,
+            through the fxaa / sharpen pass if there is one.
+        """
+
+        target = self.scene_target
+        if self.resolve_target is not None:
+            target.blit_to(self.resolve_target.fbo, target.width, target.height, GL_NEAREST)
+            target = self.resolve_target
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self.output_fbo)
+        glViewport(0, 0, self.width, self.height)
+
+        if self.aa_mode == "fxaa":
+            self.final_pass.draw(target.color_texture, (target.width, target.height))
+            self._count_draws(1, 1)
+        elif self.final_pass is not None and target.width < self.width:
+            self.final_pass.draw(
+                target.color_texture, (target.width, target.height),
+                uSharpness = GLOBAL.UPSCALE_SHARPNESS)
+            self._count_draws(1, 1)
+        else:
+            target.blit_to(self.output_fbo, self.width, self.height)
+
+    @property
+    def output_fbo(self) -> int:
+        return self.output.fbo if self.output is not None else 0
+
+    def read_pixels(self, x: int = 0, y: int = 0,
+                    width: int | None = None, height: int | None = None) -> np.ndarray:
+        """Read back (part of) the last finished frame, for pixel regression checks.
+            Returns a (height, width, 4) uint8 RGBA array, top row first.
+            Stalls until the GPU is done, keep it out of anything timed.
+        """
+
+        width = self.width - x if width is None else width
+        height = self.height - y if height is None else height
+
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.output_fbo)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(x, y, width, height, GL_RGBA, GL_UNSIGNED_BYTE)
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, 0)
+
+        # gl rows start at the bottom
+        pixels = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 4)
+        return pixels[::-1].copy()
+
+    def _count_draws(self, calls: int, triangles: int) -> None:
+        self.stats["draw_calls"] += calls
+        self.stats["triangles"] += triangles
+
+    def _collect_draw_items(self, snapshot: RenderSnapshot) -> tuple[list[tuple[int, int]], list[tuple[int, int]]]:
+        """Split everything drawable into opaque and transparent lists of
+            (entity type, index into the type's batch).
+            Opaque comes back sorted front to back, transparent back to front.
+        """
+        opaque = ([], [], [])
+        transparent = ([], [], [])
+
+        for entity_type, batch in snapshot.batches.items():
+            if entity_type in self.objects:
+                is_transparent = False
+            elif entity_type in self.meshes:
+                is_transparent = self.materials[entity_type].transparent
             else:
-                glUniform2f(tex_repeat_loc, 1.0, 1.0)
-
-            for entity in entities:
-
-                # if isinstance(entity, Billboard):
-                #     entity.update(camera.position)
-
-                if billboard_flag != -1:
-                    is_billboard = isinstance(entity, Billboard) or (
-                        entity_type == GLOBAL.ENTITY_TYPE.get("BILLBOARD")
-                    )
-                    glUniform1i(billboard_flag, int(is_billboard))
-
-                if isinstance(material, ImageSequenceMaterial):
-                    frame_index = getattr(entity, "current_frame", None)
-                    material.use(frame_index)
-                else:
-                    material.use()  # bind material and texture
-
-                glUniformMatrix4fv(
-                    self.uniform_locations[GLOBAL.UNIFORM_TYPE["MODEL"]],
-                    1, GL_FALSE, entity.get_model_transform()
-                )
-                # if entity.id != "MAXWELL":
-                #     normal_matrix_loc = glGetUniformLocation(self.shader, "normalMatrix")
-                #     glUniformMatrix3fv(normal_matrix_loc, 1, GL_TRUE, entity.get_normal_matrix())
-               
-                
-                mesh.draw()
-
-        if billboard_flag != -1:
-            glUniform1i(billboard_flag, 0)
+                continue
 
-        
-        ######### draw obj meshes
-        for entity_type, entities in renderables.items():
-            if entity_type not in self.objects:
+            if not len(batch):
                 continue
 
-            object = self.objects[entity_type]
+            offsets = batch.positions - snapshot.camera_position
+            types, indices, depths = transparent if is_transparent else opaque
+            types.append(np.full(len(batch), entity_type, dtype=np.int32))
+            indices.append(np.arange(len(batch), dtype=np.int32))
+            depths.append(np.einsum("ij,ij->i", offsets, offsets))
 
-            glUniformMatrix4fv(
-                self.uniform_locations[GLOBAL.UNIFORM_TYPE["MODEL"]],
-                1, GL_FALSE, renderables[entity_type][0].get_model_transform()
-            )
-            object.draw()
+        return self._sort_items(opaque, False), self._sort_items(transparent, True)
 
+    def _sort_items(self, items: tuple[list, list, list], back_to_front: bool) -> list[tuple[int, int]]:
+        types, indices, depths = items
+        if not types:
+            return []
 
-        ######### lighting
-        for i in range(len(renderables[GLOBAL.ENTITY_TYPE["POINTLIGHT"]])):
-            if i == 0:
-                light: Light = renderables[GLOBAL.ENTITY_TYPE["MAXLIGHT"]][0]
-            else:
-                light: Light = renderables[GLOBAL.ENTITY_TYPE["POINTLIGHT"]][i]
+        types, indices, depths = np.concatenate(types), np.concatenate(indices), np.concatenate(depths)
+        order = np.argsort(depths, kind="stable")
+        if back_to_front:
+            order = order[::-1]
+        return list(zip(types[order].tolist(), indices[order].tolist()))
+
+    def _upload_lights(self, snapshot: RenderSnapshot) -> None:
+        """Send the point lights over to the shader"""
 
+        light_count = min(
+            len(snapshot.light_strengths),
+            len(self.light_locations[GLOBAL.UNIFORM_TYPE["LIGHT_POS"]])
+        )
+        for i in range(light_count):
             glUniform3fv(
                 self.light_locations[GLOBAL.UNIFORM_TYPE["LIGHT_POS"]][i], 
-                1, light.position
+                1, snapshot.light_positions[i]
             )
             glUniform3fv(
                 self.light_locations[GLOBAL.UNIFORM_TYPE["LIGHT_COLOR"]][i], 
-                1, light.color
+                1, snapshot.light_colors[i]
             )
             glUniform1f(
                 self.light_locations[GLOBAL.UNIFORM_TYPE["LIGHT_STRENGTH"]][i], 
-                light.strength
+                snapshot.light_strengths[i]
             )
 
-        
-        # draw skybox last
-        glDepthMask(GL_FALSE)
-        view = camera.get_view_transform().copy()
-        view[:3, 3] = 0.0
-        view[3, :3] = 0.0
-        view[3, 3] = 1.0
+    def _depth_prepass(self, snapshot: RenderSnapshot, opaque: list[tuple[int, int]]) -> None:
+        """Fill the depth buffer with the opaque items, no colour writes"""
 
-        self.skybox.mix_value = sky_mix
+        glUseProgram(self.shader_depth)
+        glUniformMatrix4fv(
+            self.depth_locations[GLOBAL.UNIFORM_TYPE["VIEW"]],
+            1, GL_FALSE, snapshot.view
+        )
+        glColorMask(GL_FALSE, GL_FALSE, GL_FALSE, GL_FALSE)
+
+        model_location = self.depth_locations[GLOBAL.UNIFORM_TYPE["MODEL"]]
+        bound_vao = None
+        calls = triangles = 0
+        for entity_type, index in opaque:
+            glUniformMatrix4fv(model_location, 1, GL_FALSE, snapshot.batches[entity_type].models[index])
+            cost = self.draw_costs[entity_type]
+            calls += cost[0]
+            triangles += cost[1]
+
+            if entity_type in self.objects:
+                self.objects[entity_type].draw()
+                bound_vao = self.objects[entity_type].vao
+                continue
 
-        self.skybox.draw(view, self.projection_transform)
-        glDepthMask(GL_TRUE)
+            mesh = self.meshes[entity_type]
+            if mesh.vao != bound_vao:
+                mesh.arm_for_drawing()
+                bound_vao = mesh.vao
+            mesh.draw()
 
+        glColorMask(GL_TRUE, GL_TRUE, GL_TRUE, GL_TRUE)
+        self._count_draws(calls, triangles)
 
-        glFlush()
+    def _draw_items(self, snapshot: RenderSnapshot, items: list[tuple[int, int]]) -> None:
+        """Draw a sorted list of draw items with the current shader,
+            only touching GL state when it actually changes between items.
+        """
+
+        billboard_flag = self.uniform_locations.get(
+            GLOBAL.UNIFORM_TYPE["IS_BILLBOARD"], -1
+        )
+        model_location = self.uniform_locations[GLOBAL.UNIFORM_TYPE["MODEL"]]
+
+        bound_vao = None
+        is_billboard_set = None
+        tex_repeat_set = None
+        calls = triangles = 0
+
+        for entity_type, index in items:
+            batch = snapshot.batches[entity_type]
+            cost = self.draw_costs[entity_type]
+            calls += cost[0]
+            triangles += cost[1]
+
+            is_billboard = bool(batch.billboard[index])
+            if billboard_flag != -1 and is_billboard != is_billboard_set:
+                glUniform1i(billboard_flag, int(is_billboard))
+                is_billboard_set = is_billboard
+
+            glUniformMatrix4fv(model_location, 1, GL_FALSE, batch.models[index])
+
+            # set texture repeat for this material type
+            material = self.materials.get(entity_type)
+            if isinstance(material, RepeatingMaterial):
+                tex_repeat = tuple(material.texture_repeat)
+            else:
+                tex_repeat = (1.0, 1.0)
+            if tex_repeat != tex_repeat_set:
+                glUniform2f(self.tex_repeat_location, *tex_repeat)
+                tex_repeat_set = tex_repeat
+
+            ######### obj meshes bind their own vao + textures
+            if entity_type in self.objects:
+                self.objects[entity_type].draw()
+                bound_vao = self.objects[entity_type].vao
+                continue
+
+            # with the geometry arena this is the same vao for everything
+            mesh = self.meshes[entity_type]
+            if mesh.vao != bound_vao:
+                mesh.arm_for_drawing()
+                bound_vao = mesh.vao
+
+            if isinstance(material, ImageSequenceMaterial):
+                frame_index = int(batch.frames[index])
+                material.use(frame_index if frame_index >= 0 else None)
+            else:
+                material.use()  # bind material and texture
+
+            mesh.draw()
+
+        if billboard_flag != -1 and is_billboard_set:
+            glUniform1i(billboard_flag, 0)
+        self._count_draws(calls, triangles)
 
     def destroy(self) -> None:
         for mesh in self.meshes.values():
             mesh.destroy()
+        for object in self.objects.values():
+            object.destroy()
         for material in self.materials.values():
             material.destroy()
-        glDeleteProgram(self.shader)
+        glDeleteProgram(self.shader_light)
+        glDeleteProgram(self.shader_normals)
+        glDeleteProgram(self.shader_depth)
         self.skybox.destroy()
         glDeleteProgram(self.skybox_shader)
+        self.gpu_timer.destroy()
+        self._destroy_render_targets()
+        if self.output is not None:
+            self.output.destroy()
+        if self.geometry is not None:
+            self.geometry.destroy()
 
     
@@ -82,6 +82,9 @@ def _load_texture(filepath: str) -> int:
 class Material:
     __slots__ = ("texture",)
 
+    # transparent materials get drawn last, sorted back to front with blending on
+    transparent = False
+
     def __init__(self, filepath: str):
         self.texture = _load_texture(filepath)
 
@@ -108,6 +111,8 @@ class ImageSequenceMaterial(Material):
 
     __slots__ = ("textures", "frame_rate")
 
+    transparent = True
+
     def __init__(self, filepaths: Sequence[str], frame_rate: float = 1.0):
         self.textures = tuple(_load_texture(filepath) for filepath in filepaths)
         self.frame_rate = frame_rate
@@ -3,21 +3,41 @@ from OpenGL.GLU import *
 
 import numpy as np
 
+from game.view_classes.geometry_arena import GeometryArena, MeshRange
+
     
 class Mesh:
-    """A basic mesh which can hold data and be drawn"""
-    __slots__ = ("vbo", "vao", "vertex_count")
+    """A basic mesh which can hold data and be drawn.
+        Given a GeometryArena the vertices are sub-allocated from it,
+        otherwise the mesh gets its own VAO and VBO.
+    """
+    __slots__ = ("vbo", "vao", "vertex_count", "arena", "mesh_range")
+
+
+    def __init__(self, arena: GeometryArena | None = None):
+        self.arena = arena
+        self.vbo = None
+        self.vao = None
+        self.mesh_range: MeshRange | None = None
 
+    def _upload(self, vertices: np.ndarray) -> None:
+        """Send the vertices over to the GPU"""
 
-    def __init__(self):
-        
         # x, y, z, s, t, nx, ny, nz
+        self.vertex_count = vertices.size // 8
+
+        if self.arena is not None:
+            self.mesh_range = self.arena.allocate(vertices)
+            self.vao = self.arena.vao
+            return
+
         self.vao = glGenVertexArrays(1)
         glBindVertexArray(self.vao)
 
         #Vertices
         self.vbo = glGenBuffers(1)
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
        
         #position
         glEnableVertexAttribArray(0)
@@ -35,10 +55,17 @@ class Mesh:
     
     def draw(self) -> None:
         """Draw the triangle"""
-        glDrawArrays(GL_TRIANGLES, 0, self.vertex_count)
+        if self.mesh_range is not None:
+            self.arena.draw(self.mesh_range)
+        else:
+            glDrawArrays(GL_TRIANGLES, 0, self.vertex_count)
 
     def destroy(self) -> None:
         """Free any allocated memory"""
+        if self.mesh_range is not None:
+            self.arena.free(self.mesh_range)
+            self.mesh_range = None
+            return
         glDeleteVertexArrays(1,(self.vao,))
         glDeleteBuffers(1,(self.vbo,))
 
@@ -48,11 +75,11 @@ class GroundMesh(Mesh):
     __slots__ = tuple()
 
 
-    def __init__(self, w: float, h: float):
+    def __init__(self, w: float, h: float, arena: GeometryArena | None = None):
         """Initialize the rectangle mesh to the given
             width and height.
         """
-        super().__init__()
+        super().__init__(arena)
 
         # position: x, y, z,    uv: s(0:L, 1:R), t(0:T, 1:B)   normal: x, y, z,
         vertices = (
@@ -65,9 +92,7 @@ class GroundMesh(Mesh):
              w/2, 0,  h/2,  1, 0,  0, 1, 0
         )
         vertices = np.array(vertices, dtype=np.float32)
-        self.vertex_count = 6
-        
-        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        self._upload(vertices)
 
 
 
@@ -76,11 +101,11 @@ class RectMesh(Mesh):
     __slots__ = tuple()
 
 
-    def __init__(self, w: float, h: float):
+    def __init__(self, w: float, h: float, arena: GeometryArena | None = None):
         """Initialize the rectangle mesh to the given
             width and height.
         """
-        super().__init__()
+        super().__init__(arena)
 
         # position: x, y, z,    uv: s(0:L, 1:R), t(0:T, 1:B)   normal: x, y, z,
         # vertices = (
@@ -103,14 +128,12 @@ class RectMesh(Mesh):
             -w/2, -h/2, 0,       0, 0,    1, 0, 0    # bottom-left
         )
         vertices = np.array(vertices, dtype=np.float32)
-        self.vertex_count = 6
-        
-        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        self._upload(vertices)
 
 class CubeMesh(Mesh):
 
-    def __init__(self, w: float, h: float, d: float):
-        super().__init__()
+    def __init__(self, w: float, h: float, d: float, arena: GeometryArena | None = None):
+        super().__init__(arena)
 
         # position: x, y, z,    texture: s(0:L, 1:R), t(0:T, 1:B)   normal: x, y, z,
         vertices = (
@@ -164,7 +187,6 @@ class CubeMesh(Mesh):
             -w/2,  h/2, -d/2,  0, 0,   0, 0, -1,
         )
         vertices = np.array(vertices, dtype=np.float32)
-        self.vertex_count = 36
-        
-        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        self._upload(vertices)
+
 
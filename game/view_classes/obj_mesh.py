@@ -7,6 +7,8 @@ import numpy as np
 
 from PIL import Image    # pip install pillow
 
+from game.view_classes.geometry_arena import GeometryArena
+
 # Vertex layout: x,y,z, s,t, nx,ny,nz  -> 8 floats (32 bytes)
 
 def load_mtl(mtl_path: str) -> Dict[str, str]:
@@ -136,14 +138,19 @@ def create_texture_from_file(path: str) -> int:
     return tex
 
 class CoolObjMesh:
-    """Multi-submesh OBJ loader. Each submesh has its own VAO/VBO/texture."""
-    def __init__(self, obj_path: str, mtl_path: Optional[str] = None, base_dir: Optional[str] = None):
+    """Multi-submesh OBJ loader. Each submesh has its own texture, and either its
+    own VAO/VBO or a range in a shared GeometryArena."""
+    def __init__(self, obj_path: str, mtl_path: Optional[str] = None, base_dir: Optional[str] = None,
+                 arena: Optional[GeometryArena] = None):
         """
         obj_path: full path to .obj
         mtl_path: full path to .mtl (optional; if None tries to find .mtl next to obj)
         base_dir: optional base directory to resolve texture file paths (defaults to obj dir)
+        arena: optional shared geometry arena, submeshes get drawn with multi-draw calls then
         """
         self.submeshes = []  # list of dicts: {"vao", "vbo", "vertex_count", "tex_id" or None}
+        self.arena = arena
+        self.vao = arena.vao if arena is not None else None
         if base_dir is None:
             base_dir = os.path.dirname(obj_path)
 
@@ -158,6 +165,20 @@ class CoolObjMesh:
         for name, info in obj_data.items():
             arr = np.array(info["vertices"], dtype=np.float32)
             vertex_count = arr.size // 8
+            tex_id = self._load_submesh_texture(info.get("material"), materials, base_dir)
+
+            if arena is not None:
+                self.submeshes.append({
+                    "name": name,
+                    "vao": arena.vao,
+                    "vbo": None,
+                    "range": arena.allocate(arr),
+                    "vertex_count": vertex_count,
+                    "tex_id": tex_id,
+                    "mat_name": info.get("material")
+                })
+                continue
+
             # create VAO + VBO
             vao = glGenVertexArrays(1)
             vbo = glGenBuffers(1)
@@ -179,35 +200,54 @@ class CoolObjMesh:
             glBindVertexArray(0)
             glBindBuffer(GL_ARRAY_BUFFER, 0)
 
-            # texture: lookup from materials map by the 'material' stored
-            tex_id = None
-            mat_name = info.get("material")
-            if mat_name and materials.get(mat_name):
-                tex_file = materials[mat_name]
-                tex_path = tex_file
-                # If the map_Kd in mtl is relative, join with base_dir
-                if not os.path.isabs(tex_file):
-                    tex_path = os.path.join(base_dir, tex_file)
-                try:
-                    tex_id = create_texture_from_file(tex_path)
-                except Exception as e:
-                    print(f"[CoolObjMesh] failed to load texture '{tex_path}': {e}")
-                    tex_id = None
-
             self.submeshes.append({
                 "name": name,
                 "vao": vao,
                 "vbo": vbo,
+                "range": None,
                 "vertex_count": vertex_count,
                 "tex_id": tex_id,
-                "mat_name": mat_name
+                "mat_name": info.get("material")
             })
 
+        # submeshes sharing a texture go out together in one multi-draw
+        self.draw_groups: Dict[Optional[int], list] = {}
+        if arena is not None:
+            for sm in self.submeshes:
+                self.draw_groups.setdefault(sm["tex_id"], []).append(sm["range"])
+
+    def _load_submesh_texture(self, mat_name: Optional[str], materials: Dict[str, str], base_dir: str) -> Optional[int]:
+        """texture: lookup from materials map by the 'material' stored"""
+        if not mat_name or not materials.get(mat_name):
+            return None
+
+        tex_file = materials[mat_name]
+        tex_path = tex_file
+        # If the map_Kd in mtl is relative, join with base_dir
+        if not os.path.isabs(tex_file):
+            tex_path = os.path.join(base_dir, tex_file)
+        try:
+            return create_texture_from_file(tex_path)
+        except Exception as e:
+            print(f"[CoolObjMesh] failed to load texture '{tex_path}': {e}")
+            return None
+
     def arm_for_drawing(self):
-        # nothing global to bind (each submesh has own VAO)
-        pass
+        # nothing global to bind (each submesh has own VAO), unless they live in an arena
+        if self.arena is not None:
+            self.arena.arm_for_drawing()
 
     def draw(self):
+        if self.arena is not None:
+            self.arena.arm_for_drawing()
+            for tex_id, ranges in self.draw_groups.items():
+                if tex_id:
+                    glActiveTexture(GL_TEXTURE0)
+                    glBindTexture(GL_TEXTURE_2D, tex_id)
+                self.arena.draw_many(ranges)
+            glBindTexture(GL_TEXTURE_2D, 0)
+            return
+
         # draw each submesh
         for sm in self.submeshes:
             glBindVertexArray(sm["vao"])
@@ -220,8 +260,11 @@ class CoolObjMesh:
 
     def destroy(self):
         for sm in self.submeshes:
-            glDeleteVertexArrays(1, (sm["vao"],))
-            glDeleteBuffers(1, (sm["vbo"],))
+            if sm["range"] is not None:
+                self.arena.free(sm["range"])
+            else:
+                glDeleteVertexArrays(1, (sm["vao"],))
+                glDeleteBuffers(1, (sm["vbo"],))
             if sm["tex_id"]:
                 glDeleteTextures([sm["tex_id"]])
 
@@ -0,0 +1,175 @@
+import ctypes
+import os
+import sys
+
+# no OpenGL imports up here: PyOpenGL picks its platform (glx, egl, osmesa)
+# from PYOPENGL_PLATFORM the first time it gets imported, so that has to be
+# set before anything else pulls in OpenGL.GL.
+
+BACKENDS = ("egl", "osmesa")
+
+# from EGL_MESA_platform_surfaceless, which PyOpenGL doesn't wrap
+EGL_PLATFORM_SURFACELESS_MESA = 0x31DD
+
+
+def use_platform(backend: str) -> None:
+    """Point PyOpenGL at an offscreen platform, call before importing OpenGL"""
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown offscreen backend: {backend}")
+
+    current = os.environ.get("PYOPENGL_PLATFORM")
+    if "OpenGL.GL" in sys.modules and current != backend:
+        raise RuntimeError(
+            f"OpenGL was imported before the {backend} platform was selected, "
+            "call use_platform first thing")
+    os.environ["PYOPENGL_PLATFORM"] = backend
+
+
+class OffscreenContext:
+    """A GL 3.3 core context with no window, for display- and GPU-less machines.
+
+        egl: surfaceless (or a 1x1 pbuffer) EGL context, on the GPU if there
+            is one, Mesa's software rasterizer otherwise
+        osmesa: Mesa's off-screen software renderer (llvmpipe)
+
+        There's no default framebuffer worth drawing into, give the
+        GraphicsEngine an output_size so it renders into an FBO instead.
+    """
+    __slots__ = ("backend", "width", "height", "display", "surface", "context", "buffer")
+
+
+    def __init__(self, width: int, height: int, backend: str = "egl"):
+        use_platform(backend)
+
+        self.backend = backend
+        self.width = width
+        self.height = height
+        self.display = None
+        self.surface = None
+        self.buffer = None
+
+        if backend == "egl":
+            self._create_egl_context()
+        else:
+            self._create_osmesa_context()
+
+    def _create_egl_context(self) -> None:
+        from OpenGL import EGL
+
+        self.display = _egl_display()
+
+        config_attributes = _attribute_list(EGL.EGLint, [
+            EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RED_SIZE, 8,
+            EGL.EGL_GREEN_SIZE, 8,
+            EGL.EGL_BLUE_SIZE, 8,
+            EGL.EGL_ALPHA_SIZE, 8,
+            EGL.EGL_DEPTH_SIZE, 24,
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+            EGL.EGL_NONE,
+        ])
+        config = EGL.EGLConfig()
+        config_count = EGL.EGLint()
+        if not EGL.eglChooseConfig(
+                self.display, config_attributes, ctypes.pointer(config), 1, ctypes.pointer(config_count)) \
+                or not config_count.value:
+            raise RuntimeError("no EGL config supports desktop OpenGL")
+
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context_attributes = _attribute_list(EGL.EGLint, [
+            EGL.EGL_CONTEXT_MAJOR_VERSION, 3,
+            EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+            EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+            EGL.EGL_NONE,
+        ])
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, context_attributes)
+        if self.context == EGL.EGL_NO_CONTEXT:
+            raise RuntimeError("eglCreateContext failed")
+
+        # surfaceless needs EGL_KHR_surfaceless_context, fall back to a tiny pbuffer
+        self.surface = EGL.EGL_NO_SURFACE
+        if not EGL.eglMakeCurrent(self.display, self.surface, self.surface, self.context):
+            self.surface = EGL.eglCreatePbufferSurface(
+                self.display, config,
+                _attribute_list(EGL.EGLint, [EGL.EGL_WIDTH, 1, EGL.EGL_HEIGHT, 1, EGL.EGL_NONE]))
+            if not EGL.eglMakeCurrent(self.display, self.surface, self.surface, self.context):
+                raise RuntimeError("eglMakeCurrent failed")
+
+    def _create_osmesa_context(self) -> None:
+        from OpenGL import arrays, osmesa
+        from OpenGL.GL import GL_UNSIGNED_BYTE
+
+        attributes = _attribute_list(ctypes.c_int, [
+            osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA,
+            osmesa.OSMESA_DEPTH_BITS, 24,
+            osmesa.OSMESA_PROFILE, osmesa.OSMESA_CORE_PROFILE,
+            osmesa.OSMESA_CONTEXT_MAJOR_VERSION, 3,
+            osmesa.OSMESA_CONTEXT_MINOR_VERSION, 3,
+            0,
+        ])
+        self.context = osmesa.OSMesaCreateContextAttribs(attributes, None)
+        if not self.context:
+            raise RuntimeError("OSMesaCreateContextAttribs failed")
+
+        # osmesa always wants a buffer to call the default framebuffer
+        self.buffer = arrays.GLubyteArray.zeros((self.height, self.width, 4))
+        if not osmesa.OSMesaMakeCurrent(self.context, self.buffer, GL_UNSIGNED_BYTE, self.width, self.height):
+            raise RuntimeError("OSMesaMakeCurrent failed")
+
+    def destroy(self) -> None:
+        if self.backend == "egl":
+            from OpenGL import EGL
+
+            EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+            if self.surface != EGL.EGL_NO_SURFACE:
+                EGL.eglDestroySurface(self.display, self.surface)
+            EGL.eglDestroyContext(self.display, self.context)
+            EGL.eglTerminate(self.display)
+        else:
+            from OpenGL import osmesa
+
+            osmesa.OSMesaDestroyContext(self.context)
+            self.buffer = None
+
+
+def _egl_display():
+    """An initialized EGL display that doesn't need a window system.
+
+        The default display is whatever the window system hands out, which
+        on a headless machine is nothing that initializes. So ask for
+        Mesa's surfaceless platform first, then each EGL device (one per
+        GPU, and Mesa's software one), and only use the default display
+        when there is an X or Wayland display to back it.
+    """
+    from OpenGL import EGL
+    from OpenGL.EGL.EXT.device_enumeration import eglQueryDevicesEXT
+    from OpenGL.EGL.EXT.platform_device import EGL_PLATFORM_DEVICE_EXT
+
+    candidates = [lambda: EGL.eglGetPlatformDisplayEXT(EGL_PLATFORM_SURFACELESS_MESA, None, None)]
+    try:
+        devices = (EGL.EGLDeviceEXT * 16)()
+        device_count = EGL.EGLint()
+        if eglQueryDevicesEXT(len(devices), devices, ctypes.pointer(device_count)):
+            candidates += [lambda device=device: EGL.eglGetPlatformDisplayEXT(EGL_PLATFORM_DEVICE_EXT, device, None)
+                           for device in devices[:device_count.value]]
+    except (EGL.EGLError, AttributeError, TypeError):
+        pass # no EGL_EXT_device_enumeration
+    if os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"):
+        candidates.append(lambda: EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY))
+
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    for candidate in candidates:
+        try:
+            display = candidate()
+            if display != EGL.EGL_NO_DISPLAY \
+                    and EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+                return display
+        except (EGL.EGLError, AttributeError, TypeError):
+            continue # platform or extension missing, try the next one
+    raise RuntimeError("eglInitialize failed on every headless EGL display")
+
+
+def _attribute_list(int_type, values: list[int]):
+    """Attribute list (already terminated) as a C array"""
+    return (int_type * len(values))(*values)
@@ -0,0 +1,85 @@
+import time
+from collections import deque
+
+import glfw
+import numpy as np
+from OpenGL.GL import *
+
+
+class Presenter:
+    """Puts finished frames on the screen.
+        Swaps the window's buffers and drops a fence after every frame, once
+        more than `max_frames_in_flight` frames are queued up the CPU waits
+        for the oldest one to finish on the GPU. That's the back-pressure that
+        keeps input latency bounded.
+    """
+    __slots__ = (
+        "window", "max_frames_in_flight", "fences",
+        "latencies", "wait_times", "_input_time")
+
+
+    def __init__(self, window, swap_interval: int = 1, max_frames_in_flight: int = 2, history: int = 120):
+        """ Parameters:
+                window: the glfw window, with a current double buffered context
+                swap_interval: screen refreshes per swap, 0 turns vsync off
+                max_frames_in_flight: 1 = double buffered feel, 2 = triple buffered
+                history: how many frames the stats are taken over
+        """
+        self.window = window
+        self.max_frames_in_flight = max(1, max_frames_in_flight)
+        self.fences: deque = deque()
+
+        glfw.swap_interval(swap_interval)
+
+        # seconds from the first input of a frame until that frame got swapped
+        self.latencies: deque[float] = deque(maxlen=history)
+        # seconds the CPU was held back waiting for the GPU
+        self.wait_times: deque[float] = deque(maxlen=history)
+        self._input_time: float | None = None
+
+    def mark_input(self, timestamp: float | None = None) -> None:
+        """Note that input arrived (time.perf_counter() seconds),
+            the earliest one until the next present counts.
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        if self._input_time is None or timestamp < self._input_time:
+            self._input_time = timestamp
+
+    def present(self) -> None:
+        """Swap the finished frame onto the screen, then throttle if too far ahead"""
+
+        glfw.swap_buffers(self.window)
+        now = time.perf_counter()
+
+        if self._input_time is not None:
+            self.latencies.append(now - self._input_time)
+            self._input_time = None
+
+        self.fences.append(glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0))
+
+        wait_start = time.perf_counter()
+        while len(self.fences) > self.max_frames_in_flight:
+            fence = self.fences.popleft()
+            while glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, 1_000_000) == GL_TIMEOUT_EXPIRED:
+                pass
+            glDeleteSync(fence)
+        self.wait_times.append(time.perf_counter() - wait_start)
+
+    @property
+    def latency(self) -> float:
+        """Average input to present latency in seconds"""
+        if not self.latencies:
+            return 0.0
+        return float(np.mean(self.latencies))
+
+    @property
+    def wait_time(self) -> float:
+        """Average time per frame spent waiting on the GPU, in seconds"""
+        if not self.wait_times:
+            return 0.0
+        return float(np.mean(self.wait_times))
+
+    def destroy(self) -> None:
+        while self.fences:
+            glDeleteSync(self.fences.popleft())
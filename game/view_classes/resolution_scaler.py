@@ -0,0 +1,68 @@
+import numpy as np
+
+
+class ResolutionScaler:
+    """PID-style controller for the render resolution.
+        Feed it the measured frame time every frame and it nudges the scale
+        (fraction of the window size per axis) to keep frames inside the budget.
+    """
+    __slots__ = (
+        "target_frame_time", "min_scale", "max_scale", "scale", "step",
+        "kp", "ki", "kd", "frame_time",
+        "_integral", "_last_error")
+
+
+    def __init__(self,
+                 target_frame_time: float,
+                 min_scale: float = 0.5,
+                 max_scale: float = 1.0,
+                 step: float = 0.05,
+                 kp: float = 0.08, ki: float = 0.01, kd: float = 0.04):
+        """ Parameters:
+                target_frame_time: frame time budget in seconds
+                min_scale, max_scale: limits for the resolution scale
+                step: the scale handed out is snapped to this, so the
+                    render target doesn't get reallocated every frame
+                kp, ki, kd: controller gains
+        """
+
+        self.target_frame_time = target_frame_time
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.step = step
+        self.kp, self.ki, self.kd = kp, ki, kd
+
+        self.scale = max_scale
+        # smoothed frame time the controller is acting on, for telemetry
+        self.frame_time = target_frame_time
+
+        self._integral = 0.0
+        self._last_error = 0.0
+
+    @property
+    def render_scale(self) -> float:
+        """The current scale snapped to the step size"""
+        snapped = round(self.scale / self.step) * self.step
+        return float(np.clip(snapped, self.min_scale, self.max_scale))
+
+    def update(self, frame_time: float) -> float:
+        """Take in the last frame time in seconds, returns the new render scale"""
+
+        # smooth out single spikes, a hitch shouldn't drop the resolution
+        self.frame_time += (frame_time - self.frame_time) * 0.2
+
+        # positive error: there's headroom, negative: over budget
+        error = (self.target_frame_time - self.frame_time) / self.target_frame_time
+
+        derivative = error - self._last_error
+        self._last_error = error
+
+        output = self.kp * error + self.ki * self._integral + self.kd * derivative
+        scale = self.scale + output
+
+        # only integrate while not pinned at a limit (anti windup)
+        if self.min_scale < scale < self.max_scale:
+            self._integral = float(np.clip(self._integral + error, -10.0, 10.0))
+
+        self.scale = float(np.clip(scale, self.min_scale, self.max_scale))
+        return self.render_scale
@@ -7,6 +7,9 @@ import numpy as np
 from OpenGL.GL import *
 from PIL import Image
 
+from game.view_classes.geometry_arena import GeometryArena, MeshRange
+from game.profiler import profiler
+
 
 class Skybox:
     """Simple cube-map backed skybox renderer."""
@@ -19,15 +22,20 @@ class Skybox:
         "texture_a",
         "texture_b",
         "mix_value",
+        "arena",
+        "mesh_range",
     )
 
     def __init__(self, shader: int, 
                 cubemap_path_a: Union[str, Sequence[str]],
                 cubemap_path_b: Union[str, Sequence[str]] | None = None,
+                arena: GeometryArena | None = None,
     ):
         self.shader = shader
         self.vertex_count = 36
         self.mix_value = 0.0  # 0 = show A, 1 = show B
+        self.arena = arena
+        self.mesh_range: MeshRange | None = None
 
         self._create_buffers()
         self.texture_a = self._load_cubemap(cubemap_path_a)
@@ -90,6 +98,11 @@ class Skybox:
         )
         vertices = np.array(vertices, dtype=np.float32)
 
+        if self.arena is not None:
+            self.mesh_range = self.arena.allocate(vertices)
+            self.vao = self.arena.vao
+            self.vbo = None
+            return
 
         # x, y, z, s, t, nx, ny, nz
         self.vao = glGenVertexArrays(1)
@@ -196,6 +209,10 @@ class Skybox:
 
 
     def draw(self, view: np.ndarray, projection: np.ndarray) -> None:        
+        with profiler.scope("render/skybox", gpu=True):
+            self._draw(view, projection)
+
+    def _draw(self, view: np.ndarray, projection: np.ndarray) -> None:
         glUseProgram(self.shader)        
         glUniformMatrix4fv(glGetUniformLocation(self.shader, "view"), 1, GL_FALSE, view)        
         glUniformMatrix4fv(glGetUniformLocation(self.shader, "projection"), 1, GL_FALSE, projection)
@@ -212,11 +229,17 @@ class Skybox:
         glBindTexture(GL_TEXTURE_CUBE_MAP, self.texture_b)
 
         
-        glDrawArrays(GL_TRIANGLES, 0, self.vertex_count)
+        if self.mesh_range is not None:
+            self.arena.draw(self.mesh_range)
+        else:
+            glDrawArrays(GL_TRIANGLES, 0, self.vertex_count)
         glBindVertexArray(0)
         glDepthFunc(GL_LESS)
         
     def destroy(self) -> None:
-        glDeleteVertexArrays(1, (self.vao,))
-        glDeleteBuffers(1, (self.vbo,))
+        if self.mesh_range is not None:
+            self.arena.free(self.mesh_range)
+        else:
+            glDeleteVertexArrays(1, (self.vao,))
+            glDeleteBuffers(1, (self.vbo,))
         glDeleteTextures([self.texture_a, self.texture_b])
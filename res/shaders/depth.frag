@@ -0,0 +1,6 @@
+#version 330 core
+
+// depth pre-pass, only the depth buffer gets written
+void main()
+{
+}
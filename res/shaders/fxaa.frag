@@ -0,0 +1,66 @@
+#version 330 core
+
+// FXAA, the small console version of Timothy Lottes' algorithm.
+// finds the edge direction from luma and blurs along it.
+
+in vec2 fragmentTexCoord;
+
+uniform sampler2D screenTexture;
+uniform vec2 uTexelSize;   // 1 / size of the image being filtered
+
+out vec4 color;
+
+#define FXAA_REDUCE_MIN (1.0 / 128.0)
+#define FXAA_REDUCE_MUL (1.0 / 8.0)
+#define FXAA_SPAN_MAX 8.0
+
+float luma(vec3 rgb)
+{
+    return dot(rgb, vec3(0.299, 0.587, 0.114));
+}
+
+void main()
+{
+    vec2 uv = fragmentTexCoord;
+
+    vec3 rgbNW = texture(screenTexture, uv + vec2(-1.0, -1.0) * uTexelSize).rgb;
+    vec3 rgbNE = texture(screenTexture, uv + vec2( 1.0, -1.0) * uTexelSize).rgb;
+    vec3 rgbSW = texture(screenTexture, uv + vec2(-1.0,  1.0) * uTexelSize).rgb;
+    vec3 rgbSE = texture(screenTexture, uv + vec2( 1.0,  1.0) * uTexelSize).rgb;
+    vec3 rgbM  = texture(screenTexture, uv).rgb;
+
+    float lumaNW = luma(rgbNW);
+    float lumaNE = luma(rgbNE);
+    float lumaSW = luma(rgbSW);
+    float lumaSE = luma(rgbSE);
+    float lumaM  = luma(rgbM);
+
+    float lumaMin = min(lumaM, min(min(lumaNW, lumaNE), min(lumaSW, lumaSE)));
+    float lumaMax = max(lumaM, max(max(lumaNW, lumaNE), max(lumaSW, lumaSE)));
+
+    // edge direction
+    vec2 dir;
+    dir.x = -((lumaNW + lumaNE) - (lumaSW + lumaSE));
+    dir.y =  ((lumaNW + lumaSW) - (lumaNE + lumaSE));
+
+    float dirReduce = max(
+        (lumaNW + lumaNE + lumaSW + lumaSE) * (0.25 * FXAA_REDUCE_MUL),
+        FXAA_REDUCE_MIN);
+    float rcpDirMin = 1.0 / (min(abs(dir.x), abs(dir.y)) + dirReduce);
+    dir = clamp(dir * rcpDirMin, vec2(-FXAA_SPAN_MAX), vec2(FXAA_SPAN_MAX)) * uTexelSize;
+
+    vec3 rgbA = 0.5 * (
+        texture(screenTexture, uv + dir * (1.0 / 3.0 - 0.5)).rgb +
+        texture(screenTexture, uv + dir * (2.0 / 3.0 - 0.5)).rgb);
+    vec3 rgbB = rgbA * 0.5 + 0.25 * (
+        texture(screenTexture, uv + dir * -0.5).rgb +
+        texture(screenTexture, uv + dir *  0.5).rgb);
+
+    // the wide blur went past the local contrast range, fall back to the narrow one
+    float lumaB = luma(rgbB);
+    if (lumaB < lumaMin || lumaB > lumaMax) {
+        color = vec4(rgbA, 1.0);
+    } else {
+        color = vec4(rgbB, 1.0);
+    }
+}
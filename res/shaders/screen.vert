@@ -0,0 +1,11 @@
+#version 330 core
+
+out vec2 fragmentTexCoord;
+
+void main()
+{
+    // one big triangle covering the screen, no vertex buffer needed
+    vec2 pos = vec2((gl_VertexID << 1) & 2, gl_VertexID & 2);
+    fragmentTexCoord = pos;
+    gl_Position = vec4(pos * 2.0 - 1.0, 0.0, 1.0);
+}
@@ -0,0 +1,24 @@
+#version 330 core
+
+in vec2 fragmentTexCoord;
+
+uniform sampler2D screenTexture;
+uniform vec2 uTexelSize;   // 1 / size of the low res image
+uniform float uSharpness;  // 0 = plain bilinear upscale
+
+out vec4 color;
+
+void main()
+{
+    vec3 center = texture(screenTexture, fragmentTexCoord).rgb;
+
+    // cross shaped blur of the neighbours, then push away from it (unsharp mask)
+    vec3 blur = (
+        texture(screenTexture, fragmentTexCoord + vec2(uTexelSize.x, 0.0)).rgb +
+        texture(screenTexture, fragmentTexCoord - vec2(uTexelSize.x, 0.0)).rgb +
+        texture(screenTexture, fragmentTexCoord + vec2(0.0, uTexelSize.y)).rgb +
+        texture(screenTexture, fragmentTexCoord - vec2(0.0, uTexelSize.y)).rgb
+    ) * 0.25;
+
+    color = vec4(clamp(center + (center - blur) * uSharpness, 0.0, 1.0), 1.0);
+}
@@ -0,0 +1,23 @@
+import numpy as np
+
+import config as GLOBAL
+from game.scene import Scene
+from game.render_snapshot import RenderSnapshot
+
+
+def test_capture_real_scene():
+    scene = Scene(seed=0, audio=False)
+    snapshot = RenderSnapshot.capture(scene.player, scene.entities)
+
+    assert set(snapshot.batches) == set(scene.entities)
+    for entity_type, batch in snapshot.batches.items():
+        archetype = scene.entities[entity_type]
+        assert batch.models.shape == (len(archetype), 4, 4)
+        np.testing.assert_allclose(batch.positions, archetype.view("position"), atol=1e-5)
+
+    # only the animated billboards have a frame, everything else is -1
+    billboards = snapshot.batches[GLOBAL.ENTITY_TYPE["BILLBOARD"]]
+    assert np.all(billboards.frames >= 0)
+    assert np.all(billboards.billboard)
+    maxwells = snapshot.batches[GLOBAL.ENTITY_TYPE["MAXWELL"]]
+    assert np.all(maxwells.frames == -1)